@@ -0,0 +1,399 @@
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+
+# Configurable defaults
+DEFAULT_SEASONS = 3
+DEFAULT_FIRST_YEAR = 2001
+DEFAULT_PLAYERS = 1300
+DEFAULT_REPEAT = 5
+DEFAULT_SEED = 1
+DEFAULT_ROM_SIZE = 0x200000
+DEFAULT_FIRST_TEAM_OFFSET = 0x150000
+DEFAULT_HR_DERBY_OFFSET = 0x170000
+BENCHMARK_RESULTS_VERSION = 1
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Load the other scripts as modules (their file names aren't importable)
+def load_script(name, file_name):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(SCRIPT_DIR, file_name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+modifier = load_script("kgjr_rom_modifier", "ken_griffey_jr_presents_mlb-rom_modifier-by_johnz1.py")
+importer = load_script("kgjr_stats_importer", "ken_griffey_jr_presents_mlb-stats_importer-by_johnz1.py")
+ratings_generator = load_script("kgjr_ratings_generator", "ken_griffey_jr_presents_mlb-ratings_generator-by_johnz1.py")
+
+# Same as 'players' in the projects DB, without the year columns (the stats importer adds those per season)
+PLAYERS_TABLE_SQL = """CREATE TABLE IF NOT EXISTS "players" (
+	"player_id"	TEXT NOT NULL CHECK("player_id" = LOWER("player_id")) UNIQUE,
+	"first_name"	TEXT,
+	"last_name"	TEXT,
+	"position"	TEXT,
+	"handedness_batting"	TEXT CHECK("handedness_batting" IN ('L', 'R', 'B')),
+	"handedness_throwing"	TEXT CHECK("handedness_throwing" IN ('L', 'R')),
+	"throwing_style"	INTEGER CHECK("throwing_style" <= 15),
+	"appearance_bat_skin"	INTEGER CHECK("appearance_bat_skin" <= 9),
+	"appearance_bat_head"	INTEGER CHECK("appearance_bat_head" <= 9),
+	"appearance_bat_hair_color"	INTEGER CHECK("appearance_bat_hair_color" <= 9),
+	"appearance_bat_body"	INTEGER CHECK("appearance_bat_body" <= 9),
+	"appearance_bat_legs_size"	INTEGER CHECK("appearance_bat_legs_size" <= 9),
+	"appearance_bat_legs_stance"	INTEGER CHECK("appearance_bat_legs_stance" <= 9),
+	"appearance_bat_arms_stance"	INTEGER CHECK("appearance_bat_arms_stance" <= 2),
+	"confirmed_bat_appearance"	INTEGER CHECK("confirmed_bat_appearance" <= 1),
+	"appearance_pit_head"	INTEGER CHECK("appearance_pit_head" <= 4),
+	"appearance_pit_hair_color"	INTEGER CHECK("appearance_pit_hair_color" <= 4),
+	"appearance_pit_skin"	INTEGER CHECK("appearance_pit_skin" <= 9),
+	"appearance_pit_body"	INTEGER CHECK("appearance_pit_body" <= 2),
+	"height_in"	INTEGER CHECK("height_in" <= 99),
+	"weight_lb"	INTEGER CHECK("weight_lb" <= 500),
+	PRIMARY KEY("player_id")
+)"""
+
+TEAM_LINEUPS_TABLE_SQL = """CREATE TABLE IF NOT EXISTS "team_lineups_{year}" (
+	"league"	TEXT CHECK("league" IN ('AL', 'NL')),
+	"team_stock"	TEXT,
+	"team_{year}"	TEXT,
+	"roster_position"	INTEGER CHECK("roster_position" <= 25),
+	"position"	TEXT CHECK("position" IN ('P', 'C', '1B', '2B', 'SS', '3B', 'LF', 'CF', 'RF', 'DH', 'IF', 'OF')),
+	"player_id"	TEXT CHECK("player_id" = LOWER("player_id")) UNIQUE
+)"""
+
+HR_DERBY_LINEUPS_TABLE_SQL = """CREATE TABLE IF NOT EXISTS "home_run_derby_lineups_{year}" (
+	"league"	TEXT CHECK("league" IN ('AL', 'NL')),
+	"roster_position"	INTEGER CHECK("roster_position" <= 25),
+	"player_id"	TEXT CHECK("player_id" = LOWER("player_id")) UNIQUE
+)"""
+
+# Name parts for generated players.  Some last names are longer than 8 characters or have characters the game
+# can't show, like the real ones, so the name encoding is measured on the same kind of input.
+FIRST_NAMES = ["Alex", "Bobby", "Carlos", "Derek", "Eric", "Frank", "Greg", "Hideki", "Ivan", "Jose", "Ken", "Luis", "Mark", "Nomar", "Omar", "Pedro", "Rafael", "Sammy", "Tony", "Vladimir"]
+LAST_NAME_PARTS = ["al", "bar", "cor", "del", "er", "fer", "gon", "her", "ins", "jo", "ker", "lo", "mar", "nez", "or", "pet", "quin", "ro", "son", "ton", "van", "wil", "za"]
+LAST_NAME_PREFIXES = ["", "", "", "", "", "", "", "", "Mc", "O'", "De La "]
+BATTER_POSITIONS_AL = ["C", "1B", "2B", "SS", "3B", "LF", "CF", "RF", "DH"]
+BATTER_POSITIONS_NL = ["C", "1B", "2B", "SS", "3B", "LF", "CF", "RF"]
+BENCH_POSITIONS = ["C", "IF", "OF", "1B", "2B", "SS", "3B", "LF", "CF", "RF"]
+NULL_SHARE = 0.1  # share of optional 'players' columns left NULL, like the hand-filled projects DB
+
+def generate_players(rng, count):
+    # {player_id: players row (dict)} with unique lowercase IDs, 40% pitchers
+    players = {}
+    while len(players) < count:
+        first_name = rng.choice(FIRST_NAMES)
+        last_name = rng.choice(LAST_NAME_PREFIXES) + "".join(rng.choice(LAST_NAME_PARTS) for n in range(rng.randint(2, 4))).capitalize()
+        stem = "".join(ch for ch in last_name.lower() if ch.isalpha())[:5] + first_name[:2].lower()
+        n = 1
+        while f"{stem}{n:02d}" in players:
+            n += 1
+        player_id = f"{stem}{n:02d}"
+        pitcher = len(players) % 5 < 2
+
+        def optional(low, high):
+            return None if rng.random() < NULL_SHARE else rng.randint(low, high)
+
+        players[player_id] = {
+            "player_id": player_id,
+            "first_name": first_name,
+            "last_name": last_name,
+            "position": "P" if pitcher else rng.choice(BATTER_POSITIONS_AL[:-1]),
+            "handedness_batting": rng.choice("LRRB"),
+            "handedness_throwing": rng.choice("LRRR"),
+            "throwing_style": optional(0, 15) if pitcher else None,
+            "appearance_bat_skin": optional(0, 9),
+            "appearance_bat_head": optional(0, 9),
+            "appearance_bat_hair_color": optional(0, 9),
+            "appearance_bat_body": optional(0, 9),
+            "appearance_bat_legs_size": optional(0, 9),
+            "appearance_bat_legs_stance": optional(0, 9),
+            "appearance_bat_arms_stance": optional(0, 2),
+            "confirmed_bat_appearance": rng.randint(0, 1),
+            "appearance_pit_head": optional(0, 4) if pitcher else None,
+            "appearance_pit_hair_color": optional(0, 4) if pitcher else None,
+            "appearance_pit_skin": optional(0, 9) if pitcher else None,
+            "appearance_pit_body": optional(0, 2) if pitcher else None,
+            "height_in": rng.randint(68, 82),
+            "weight_lb": rng.randint(160, 260),
+        }
+    return players
+
+def generate_lineups(rng, players, year):
+    # 28 teams of 25 (starters, bench, 5 starting pitchers, 5 relievers) and 3 + 3 HR Derby batters.
+    # Returns (team_lineups rows, home_run_derby_lineups rows, {player_id: team_stock})
+    pitchers = [player_id for player_id, player in players.items() if player["position"] == "P"]
+    batters = [player_id for player_id, player in players.items() if player["position"] != "P"]
+    if len(pitchers) < 28 * 10 or len(batters) < 28 * 15:
+        raise Exception(f"ERROR: {len(players)} players are not enough for 28 rosters, use at least 700")
+    rng.shuffle(pitchers)
+    rng.shuffle(batters)
+
+    lineup_rows = []
+    teams = {}
+    lineup_batters = {"AL": [], "NL": []}
+    for idx, team_stock in enumerate(modifier.TEAMS_STOCK_ORDER):
+        league = "AL" if idx <= 13 else "NL"
+        starters = list(BATTER_POSITIONS_AL if league == "AL" else BATTER_POSITIONS_NL)
+        rng.shuffle(starters)
+        positions = starters + [rng.choice(BENCH_POSITIONS) for n in range(15 - len(starters))] + ["P"] * 10
+        roster = [batters.pop() for n in range(15)] + [pitchers.pop() for n in range(10)]
+        for roster_position, (position, player_id) in enumerate(zip(positions, roster), start=1):
+            lineup_rows.append((league, team_stock, team_stock, roster_position, position, player_id))
+            teams[player_id] = team_stock
+        lineup_batters[league] += roster[:len(starters)]
+
+    hr_derby_rows = []
+    for league in ("NL", "AL"):
+        for roster_position, player_id in enumerate(rng.sample(lineup_batters[league], 3), start=1):
+            hr_derby_rows.append((league, roster_position, player_id))
+    return lineup_rows, hr_derby_rows, teams
+
+def generate_stats(rng, player):
+    # {stats_$YEAR column: value} with the batting or pitching columns the tools read filled in
+    if player["position"] != "P":
+        g = rng.randint(20, 162)
+        ab = rng.randint(g, g * 4)
+        h = int(ab * rng.uniform(0.180, 0.340))
+        doubles, triples, hr = int(h * 0.2), int(h * 0.02), int(h * rng.uniform(0.0, 0.3))
+        bb, hbp, sf = int(ab * rng.uniform(0.04, 0.14)), rng.randint(0, 10), rng.randint(0, 8)
+        obp = (h + bb + hbp) / max(ab + bb + hbp + sf, 1)
+        slg = (h + doubles + 2 * triples + 3 * hr) / ab
+        return {
+            "g": g, "ab": ab, "h": h, "2b": doubles, "3b": triples, "hr": hr, "rbi": int(hr * 2.5 + h * 0.2),
+            "bb": bb, "hbp": hbp, "sf": sf, "so": int(ab * rng.uniform(0.1, 0.3)), "sb": rng.randint(0, 40), "cs": rng.randint(0, 10),
+            "avg": round(h / ab, 3), "obp": round(obp, 3), "slg": round(slg, 3), "obs": round(obp + slg, 3),
+        }
+    gp = rng.randint(5, 80)
+    starter = rng.random() < 0.4
+    ip = round(gp * (rng.uniform(5.0, 7.0) if starter else rng.uniform(0.7, 1.5)), 1)
+    er = int(ip * rng.uniform(0.25, 0.7))
+    ha, bba = int(ip * rng.uniform(0.7, 1.2)), int(ip * rng.uniform(0.2, 0.5))
+    return {
+        "gp": gp, "gs": gp if starter else 0, "ip": ip, "ipouts": int(ip * 3), "er": er, "ha": ha, "bba": bba,
+        "soa": int(ip * rng.uniform(0.5, 1.2)), "w": rng.randint(0, 20), "l": rng.randint(0, 15),
+        "sv": 0 if starter else rng.randint(0, 45), "era": round(er * 9 / max(ip, 1), 2), "whip": round((ha + bba) / max(ip, 1), 2),
+    }
+
+def generate_ratings(rng, player):
+    if player["position"] == "P":
+        return [None, None, None, None, rng.randint(1, 10), rng.randint(1, 10), rng.randint(1, 10)]
+    return [rng.randint(1, 10), rng.randint(1, 10), rng.randint(1, 10), rng.randint(1, 10), None, None, None]
+
+def generate_db(db_path, seasons, first_year, player_count, seed):
+    # Write a schema-valid projects DB: one 'players' pool, and every season's lineups, ratings and stats
+    # (every player in the pool gets a stats row each season, so the stats tables grow with --players)
+    rng = random.Random(seed)
+    players = generate_players(rng, player_count)
+    years = list(range(first_year, first_year + seasons))
+    conn = sqlite3.connect(db_path)
+    try:
+        cur = conn.cursor()
+        cur.execute(PLAYERS_TABLE_SQL)
+        columns = list(next(iter(players.values())))
+        cur.executemany(f"INSERT INTO players ({', '.join(columns)}) VALUES ({', '.join('?' for column in columns)})",
+                        [[player[column] for column in columns] for player in players.values()])
+        stats_columns = [name for name, column_type in importer.STATS_COLUMNS]
+        for year in years:
+            importer.create_season_tables(cur, year)
+            cur.execute(TEAM_LINEUPS_TABLE_SQL.format(year=year))
+            cur.execute(HR_DERBY_LINEUPS_TABLE_SQL.format(year=year))
+            ratings_generator.create_ratings_table(cur, year)
+
+            lineup_rows, hr_derby_rows, teams = generate_lineups(rng, players, year)
+            cur.executemany(f"INSERT INTO team_lineups_{year} VALUES (?, ?, ?, ?, ?, ?)", lineup_rows)
+            cur.executemany(f"INSERT INTO home_run_derby_lineups_{year} VALUES (?, ?, ?)", hr_derby_rows)
+            cur.executemany(f'UPDATE players SET "age_{year}" = ?, "team_{year}" = ?, "jersey_number_{year}" = ? WHERE player_id = ?',
+                            [(rng.randint(21, 40), teams.get(player_id), None if rng.random() < NULL_SHARE else rng.randint(0, 99), player_id) for player_id in players])
+            cur.executemany(f"INSERT INTO ratings_{year} VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                            [[player_id] + generate_ratings(rng, player) for player_id, player in players.items()])
+            stats_rows = []
+            for player_id, player in players.items():
+                stats = generate_stats(rng, player)
+                stats_rows.append([player_id] + [stats.get(column) for column in stats_columns[1:]])
+            cur.executemany(f"INSERT INTO stats_{year} VALUES ({', '.join('?' for column in stats_columns)})", stats_rows)
+        conn.commit()
+    finally:
+        conn.close()
+    return years
+
+def generate_rom(rom_size, first_team_offset, hr_derby_offset, seed, copier_header=False):
+    # Stand-in ROM image: random bytes with the first team and Home Run Derby markers right before the given offsets
+    # and a LoROM internal header with a valid checksum, so no copy of the game is needed
+    rng = random.Random(seed)
+    rom = bytearray(rng.randbytes(rom_size))
+    rom[first_team_offset - len(modifier.FIRST_TEAM_MARKER):first_team_offset] = modifier.FIRST_TEAM_MARKER
+    rom[hr_derby_offset - len(modifier.HR_DERBY_MARKER):hr_derby_offset] = modifier.HR_DERBY_MARKER
+
+    snes_header_offset = modifier.SNES_HEADER_CANDIDATES[0][0]
+    rom[snes_header_offset:snes_header_offset + modifier.SNES_HEADER_TITLE_LENGTH] = b"KGJR BENCHMARK".ljust(modifier.SNES_HEADER_TITLE_LENGTH)
+    rom[snes_header_offset + modifier.SNES_HEADER_MAP_MODE] = modifier.SNES_HEADER_CANDIDATES[0][1][0]
+    checksum = modifier.rom_checksum_sum(rom, 0, snes_header_offset)
+    struct.pack_into("<HH", rom, snes_header_offset + modifier.SNES_HEADER_CHECKSUM_COMPLEMENT, checksum ^ 0xFFFF, checksum)
+
+    if copier_header:
+        rom[0:0] = bytes(modifier.COPIER_HEADER_LENGTH)
+    layout = modifier.probe_rom_layout(rom)
+    if layout["first_team_offset"] != first_team_offset + len(rom) - rom_size or layout["snes_header_offset"] is None:
+        raise Exception("ERROR: Random ROM bytes happened to contain a marker sequence, try another --seed")
+    return bytes(rom)
+
+def measure(name, function, repeat, setup=None):
+    # Run function(setup()) once to warm up and then repeat times, timing only the function.  Returns the result entry.
+    samples = []
+    for n in range(repeat + 1):
+        state = setup() if setup else None
+        start = time.perf_counter()
+        function(state)
+        seconds = time.perf_counter() - start
+        if n:
+            samples.append(seconds)
+    result = {"min": min(samples), "median": statistics.median(samples), "mean": statistics.fmean(samples), "samples": samples}
+    print(f"  {name:28s} median {result['median'] * 1000:9.2f}ms  min {result['min'] * 1000:9.2f}ms")
+    return result
+
+def quietly(function, *args):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return function(*args)
+
+def run_benchmarks(db_path, rom_path, years, repeat, workdir):
+    rom = open(rom_path, "rb").read()
+    year = years[-1]
+    results = {}
+    conn = sqlite3.connect(db_path)
+    try:
+        cur = conn.cursor()
+        layout = modifier.probe_rom_layout(rom)
+        season = modifier.load_season(cur, year)
+        players = modifier.season_players(season)
+
+        results["layout_scan"] = measure("layout_scan", lambda state: modifier.probe_rom_layout(rom), repeat)
+        results["validation"] = measure("validation", lambda state: modifier.validate_seasons(cur, [year]), repeat)
+        results["validation_all_seasons"] = measure("validation_all_seasons", lambda state: modifier.validate_seasons(cur, years), repeat)
+        results["roster_fetch"] = measure("roster_fetch", lambda state: modifier.load_season_roster(cur, year), repeat)
+        results["name_encoding_cold"] = measure("name_encoding_cold", lambda state: modifier.encode_player_names(players), repeat, setup=lambda: modifier.encode_name.cache_clear())
+        results["name_encoding_warm"] = measure("name_encoding_warm", lambda state: modifier.encode_player_names(players), repeat)
+        results["name_diagnostics"] = measure("name_diagnostics", lambda state: modifier.diagnose_name_encoding(players, modifier.Diagnostics()), repeat)
+        results["encode_teams"] = measure("encode_teams", lambda rom_data: modifier.encode_teams(rom_data, layout["team_offsets"], season.team_rosters, modifier.Diagnostics()), repeat, setup=lambda: bytearray(rom))
+        results["encode_hr_derby"] = measure("encode_hr_derby", lambda rom_data: modifier.encode_hr_derby_players(rom_data, layout["first_hr_derby_player_offset"], season.hr_derby_players, modifier.Diagnostics()), repeat, setup=lambda: bytearray(rom))
+
+        built = bytearray(modifier.build_rom(rom, conn, year, layout=layout, season=season))
+        regions = modifier.rom_regions(layout)
+        results["checksum_update"] = measure("checksum_update", lambda state: modifier.update_rom_checksum(built, rom, layout), repeat)
+        results["ips_patch"] = measure("ips_patch", lambda state: modifier.build_ips_patch(rom, built, regions), repeat)
+        results["bps_patch"] = measure("bps_patch", lambda state: modifier.build_bps_patch(rom, built, regions), repeat)
+    finally:
+        conn.close()
+
+    # End to end through the command line entry point, in this process so interpreter start-up isn't counted
+    out_path = os.path.join(workdir, "benchmark_out.sfc")
+    argv = [rom_path, "--db", db_path, "--year", str(year), "--out", out_path, "--no-layout-cache"]
+    results["build_end_to_end"] = measure("build_end_to_end", lambda state: quietly(modifier.main, argv), repeat)
+    if len(years) > 1:
+        argv = [rom_path, "--db", db_path, "--year"] + [str(y) for y in years] + ["--out", os.path.join(workdir, "benchmark_out_{year}.sfc"), "--no-layout-cache"]
+        results["build_all_seasons"] = measure("build_all_seasons", lambda state: quietly(modifier.main, argv), repeat)
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=SCRIPT_DIR, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare_results(baseline, results, max_regression=None):
+    # Print the median of every benchmark against a baseline results file.  Returns the benchmarks that got slower
+    # by more than max_regression percent.
+    regressions = []
+    print(f"Compared with {baseline.get('commit') or 'baseline'}:")
+    for name, result in results.items():
+        old = baseline["results"].get(name)
+        if old is None:
+            print(f"  {name:28s} (new)")
+            continue
+        change = (result["median"] / old["median"] - 1) * 100 if old["median"] else 0.0
+        print(f"  {name:28s} {old['median'] * 1000:9.2f}ms -> {result['median'] * 1000:9.2f}ms ({change:+.1f}%)")
+        if max_regression is not None and change > max_regression:
+            regressions.append(name)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Ken Griffey Jr. Presents Major League Baseball ROM modifier on a generated DB and stand-in ROM.  Created by johnz1.")
+    parser.add_argument("--seasons", type=int, default=DEFAULT_SEASONS, help=f"Seasons to generate (default: {DEFAULT_SEASONS})")
+    parser.add_argument("--first-year", type=int, default=DEFAULT_FIRST_YEAR, help=f"First generated season (default: {DEFAULT_FIRST_YEAR})")
+    parser.add_argument("--players", type=int, default=DEFAULT_PLAYERS, help=f"Players in the DB, each with a stats row in every season (default: {DEFAULT_PLAYERS})")
+    parser.add_argument("--rom-size", type=lambda value: int(value, 0), default=DEFAULT_ROM_SIZE, help=f"Size of the stand-in ROM in bytes (default: {DEFAULT_ROM_SIZE:#x})")
+    parser.add_argument("--copier-header", action="store_true", help="Give the stand-in ROM a 512-byte copier header")
+    parser.add_argument("--export-tables", action="store_true", help="Build the rom_export_$YEAR tables (like --maintain-schema) before measuring")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help=f"Random seed, the same seed always generates the same DB and ROM (default: {DEFAULT_SEED})")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help=f"Timed runs of every benchmark, after one warm-up run (default: {DEFAULT_REPEAT})")
+    parser.add_argument("--workdir", help="Keep the generated DB, ROM and built ROMs in this directory (default: a temporary directory that is deleted)")
+    parser.add_argument("--output", help="Write the results to this JSON file")
+    parser.add_argument("--compare", help="Results JSON file of an earlier run to compare with")
+    parser.add_argument("--max-regression", type=float, help="With --compare, exit with status 1 if any benchmark's median got slower by more than this many percent")
+    args = parser.parse_args()
+    if args.seasons < 1 or args.repeat < 1:
+        parser.error("--seasons and --repeat must be at least 1")
+    if args.rom_size < DEFAULT_HR_DERBY_OFFSET + modifier.HR_DERBY_BATTER_COUNT * modifier.PLAYER_LENGTH:
+        parser.error(f"--rom-size must be at least {DEFAULT_HR_DERBY_OFFSET + modifier.HR_DERBY_BATTER_COUNT * modifier.PLAYER_LENGTH:#x}")
+
+    with contextlib.ExitStack() as stack:
+        workdir = args.workdir or stack.enter_context(tempfile.TemporaryDirectory())
+        os.makedirs(workdir, exist_ok=True)
+        db_path = os.path.join(workdir, "benchmark.db")
+        rom_path = os.path.join(workdir, "benchmark.sfc")
+        if os.path.exists(db_path):
+            os.remove(db_path)
+
+        started = time.perf_counter()
+        years = generate_db(db_path, args.seasons, args.first_year, args.players, args.seed)
+        if args.export_tables:
+            conn = sqlite3.connect(db_path)
+            try:
+                quietly(modifier.maintain_schema, conn, years)
+            finally:
+                conn.close()
+        with open(rom_path, "wb") as f:
+            f.write(generate_rom(args.rom_size, DEFAULT_FIRST_TEAM_OFFSET, DEFAULT_HR_DERBY_OFFSET, args.seed, args.copier_header))
+        print(f"Generated {args.seasons} season(s) of {args.players} players and a {args.rom_size // 1024}KB ROM in {time.perf_counter() - started:.2f}s ({workdir})")
+
+        results = run_benchmarks(db_path, rom_path, years, args.repeat, workdir)
+
+    report = {
+        "version": BENCHMARK_RESULTS_VERSION,
+        "commit": git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "numpy": modifier.np.__version__ if modifier.np is not None else None,
+        "platform": platform.platform(),
+        "config": {
+            "seasons": args.seasons, "players": args.players, "rom_size": args.rom_size, "copier_header": args.copier_header,
+            "export_tables": args.export_tables, "seed": args.seed, "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    if args.output:
+        modifier.write_file_atomic(args.output, json.dumps(report, indent=1).encode("utf-8"))
+        print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != report["config"]:
+            print("WARNING: The baseline was run with different settings, the numbers may not be comparable")
+        regressions = compare_results(baseline, results, args.max_regression)
+        if regressions:
+            print(f"Slower by more than {args.max_regression}%: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import sqlite3
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Configurable defaults
+DEFAULT_DB_PATH = ""
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+MODIFIER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ken_griffey_jr_presents_mlb-rom_modifier-by_johnz1.py")
+
+# Load the ROM modifier script as a module (its file name isn't importable)
+spec = importlib.util.spec_from_file_location("kgjr_rom_modifier", MODIFIER_PATH)
+modifier = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(modifier)
+
+class BuildCache:
+    # Keeps the DB connection, every loaded season, and every base ROM + layout in memory between requests
+    def __init__(self, db_path):
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self.data_version = None
+        self.seasons = {}
+        self.roms = {}
+
+    def check_data_version(self):
+        # PRAGMA data_version changes whenever another connection commits to the DB
+        data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self.data_version:
+            if self.seasons:
+                print(f"DB changed (data_version {self.data_version} -> {data_version}), dropping {len(self.seasons)} cached season(s)")
+            self.seasons = {}
+            self.data_version = data_version
+
+    def season(self, year):
+        with self.lock:
+            self.check_data_version()
+            if year not in self.seasons:
+                self.seasons[year] = modifier.load_season(self.conn.cursor(), year)
+            return self.seasons[year]
+
+    def rom(self, rom_path):
+        # (ROM bytes, layout), reloaded if the file changed on disk
+        stat = os.stat(rom_path)
+        key = (os.path.abspath(rom_path), stat.st_mtime_ns, stat.st_size)
+        with self.lock:
+            if key not in self.roms:
+                with open(rom_path, "rb") as f:
+                    rom = f.read()
+                self.roms = {k: v for k, v in self.roms.items() if k[0] != key[0]}
+                self.roms[key] = (rom, modifier.probe_rom_layout(rom))
+            return self.roms[key]
+
+    def status(self):
+        with self.lock:
+            return {
+                "data_version": self.data_version,
+                "seasons": sorted(self.seasons),
+                "roms": sorted(key[0] for key in self.roms),
+            }
+
+OUTPUT_FORMATS = ("rom", "ips", "bps")
+
+class BadRequest(Exception):
+    # A problem with the request itself (answered with 400); anything else that goes wrong is a 500
+    pass
+
+def check_request(request):
+    # Check everything build() takes from the request before any work is done
+    if not isinstance(request, dict):
+        raise BadRequest("ERROR: The request body must be a JSON object")
+    if not isinstance(request.get("year"), int) or isinstance(request.get("year"), bool):
+        raise BadRequest(f"ERROR: \"year\" must be a whole number, got {request.get('year')!r}")
+    if not isinstance(request.get("rom"), str):
+        raise BadRequest(f"ERROR: \"rom\" must be the path of a ROM file, got {request.get('rom')!r}")
+    if not os.path.isfile(request["rom"]):
+        raise BadRequest(f"ERROR: ROM file {request['rom']} not found")
+    if request.get("format", "rom") not in OUTPUT_FORMATS:
+        raise BadRequest(f"ERROR: Unknown format {request['format']!r}, use one of {', '.join(OUTPUT_FORMATS)}")
+    try:
+        modifier.check_overrides(request.get("overrides") or {})
+    except Exception as e:
+        raise BadRequest(str(e))
+
+def build(cache, request):
+    # request: {"year": 2007, "rom": "<path>", "overrides": {player_id: {field: value}}, "format": "rom" | "ips" | "bps"}
+    check_request(request)
+    year = request["year"]
+    rom, layout = cache.rom(request["rom"])
+    season = cache.season(year)
+    if request.get("overrides"):
+        season = modifier.override_season(season, request["overrides"])
+    built = modifier.build_rom(rom, None, year, layout=layout, season=season)
+
+    output_format = request.get("format", "rom")
+    if output_format == "ips":
+        return modifier.build_ips_patch(rom, built, modifier.rom_regions(layout))
+    elif output_format == "bps":
+        return modifier.build_bps_patch(rom, built, modifier.rom_regions(layout))
+    return built
+
+class BuildRequestHandler(BaseHTTPRequestHandler):
+    # POST /build with a JSON body returns the built ROM or patch, GET /status returns what is cached
+    cache = None
+
+    def send(self, code, body, content_type):
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != "/status":
+            self.send(404, b"Not found\n", "text/plain")
+            return
+        self.send(200, json.dumps(self.cache.status()).encode("utf-8"), "application/json")
+
+    def do_POST(self):
+        if self.path != "/build":
+            self.send(404, b"Not found\n", "text/plain")
+            return
+        try:
+            try:
+                length = int(self.headers.get("Content-Length", 0))
+                request = json.loads(self.rfile.read(length))
+            except ValueError as e:
+                raise BadRequest(f"ERROR: Couldn't read a JSON body from the request ({e})")
+            body = build(self.cache, request)
+        except BadRequest as e:
+            self.send(400, f"{e}\n".encode("utf-8"), "text/plain")
+            return
+        except Exception as e:
+            # The request was fine but the build failed (a ROM without the markers, a DB problem, ...)
+            self.send(500, f"{e}\n".encode("utf-8"), "text/plain")
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-SHA256", hashlib.sha256(body).hexdigest())
+        self.end_headers()
+        self.wfile.write(body)
+
+def main():
+    parser = argparse.ArgumentParser(description="Local build server for Ken Griffey Jr. Presents Major League Baseball SNES ROMs, keeping the DB and seasons warm between builds.  Created by johnz1.")
+    parser.add_argument("--db", help=f"Path to the SQLite database (default: {DEFAULT_DB_PATH})", default=DEFAULT_DB_PATH)
+    parser.add_argument("--host", help=f"Address to listen on (default: {DEFAULT_HOST})", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, help=f"Port to listen on (default: {DEFAULT_PORT})", default=DEFAULT_PORT)
+    parser.add_argument("--preload", type=int, nargs="*", default=[], help="Years to load before accepting requests")
+    args = parser.parse_args()
+    if not args.db:
+        parser.error("--db is required (or set DEFAULT_DB_PATH at the top of the script)")
+
+    BuildRequestHandler.cache = BuildCache(args.db)
+    for year in args.preload:
+        BuildRequestHandler.cache.season(year)
+        print(f"Loaded {year}")
+
+    server = ThreadingHTTPServer((args.host, args.port), BuildRequestHandler)
+    print(f"Listening on http://{args.host}:{args.port}/build")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        BuildRequestHandler.cache.conn.close()
+
+if __name__ == "__main__":
+    main()
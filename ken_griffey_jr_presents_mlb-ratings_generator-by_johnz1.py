@@ -0,0 +1,222 @@
+import argparse
+import re
+import sqlite3
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Configurable defaults
+DEFAULT_DB_PATH = ""
+
+# Roster groups, by roster_position in 'team_lineups_$YEAR', and the stock distribution each one is mapped onto
+ROSTER_GROUPS = [
+    ("batters_starters", 1, 9, "ratings_distribution_stock_batters_starters"),
+    ("batters_bench", 10, 15, "ratings_distribution_stock_batters_bench"),
+    ("pitchers_starters", 16, 20, "ratings_distribution_stock_pitchers_starters"),
+    ("pitchers_relievers", 21, 25, "ratings_distribution_stock_pitchers_relievers"),
+]
+
+# Rating column -> (roster groups, stock distribution column, stat SQL, sample size SQL, sample size that counts as
+# half the evidence, True if a lower stat is better).  These are the stats in the view_stats_$YEAR_* views.
+# Small samples are pulled toward the group average before ranking, so a call-up with 50 AB doesn't get a 10.
+# DEF has no stat in 'stats_$YEAR', so it is left alone.
+RATING_SOURCES = {
+    "rating_bat_bat": (("batters_starters", "batters_bench"), "bat", "st.obp", "st.ab", 100, False),
+    "rating_bat_pow": (("batters_starters", "batters_bench"), "pow", "st.slg", "st.ab", 100, False),
+    "rating_bat_spd": (("batters_starters", "batters_bench"), "spd", "CAST(st.sb AS REAL) / st.g", "st.g", 20, False),
+    "rating_pit_spd": (("pitchers_starters", "pitchers_relievers"), "spd", "st.era", "st.ip", 30, True),
+    "rating_pit_con": (("pitchers_starters", "pitchers_relievers"), "con", "st.whip", "st.ip", 30, True),
+    "rating_pit_fat": (("pitchers_starters", "pitchers_relievers"), "fat", "st.ip / st.gp", "st.gp", 5, False),
+}
+
+RATINGS_COLUMNS = [
+    "rating_bat_bat", "rating_bat_pow", "rating_bat_spd", "rating_bat_def",
+    "rating_pit_spd", "rating_pit_con", "rating_pit_fat",
+]
+
+def detect_seasons(cur):
+    # Every year with both team_lineups_$YEAR and stats_$YEAR
+    cur.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    names = {row[0] for row in cur.fetchall()}
+    years = []
+    for name in names:
+        match = re.fullmatch(r"team_lineups_(\d{4})", name)
+        if match and f"stats_{match.group(1)}" in names:
+            years.append(int(match.group(1)))
+    return sorted(years)
+
+def load_stock_distributions(cur):
+    # {(roster group, distribution column): cumulative share of players at or below each rating, index 0 = rating 1}
+    distributions = {}
+    for group, first, last, table in ROSTER_GROUPS:
+        cur.execute(f"SELECT * FROM {table} ORDER BY rating")
+        columns = [description[0] for description in cur.description]
+        counts = np.array(cur.fetchall(), dtype=np.float64)
+        if counts.shape[0] != 10 or not np.array_equal(counts[:, 0], np.arange(1, 11)):
+            raise Exception(f"ERROR: '{table}' must have one row for every rating from 1 to 10")
+        for i, column in enumerate(columns[1:], start=1):
+            total = counts[:, i].sum()
+            if total:
+                distributions[(group, column)] = np.cumsum(counts[:, i]) / total
+    return distributions
+
+def load_season_stats(cur, years):
+    # One row per rostered player for every season, in a single query:
+    # (year, player_id, roster_position, stat and sample size for every RATING_SOURCES column, ...)
+    stat_columns = ", ".join(f"{stat}, {sample}" for groups, column, stat, sample, prior, lower_is_better in RATING_SOURCES.values())
+    query = " UNION ALL ".join(f"""
+        SELECT {year}, tl.player_id, tl.roster_position, {stat_columns}
+        FROM team_lineups_{year} tl
+        LEFT JOIN stats_{year} st ON st.rowid = (SELECT MIN(rowid) FROM stats_{year} WHERE player_id = tl.player_id)""" for year in years)
+    cur.execute(query)
+    rows = cur.fetchall()
+
+    years_column = np.array([row[0] for row in rows], dtype=np.int64)
+    player_ids = [row[1] for row in rows]
+    roster_positions = np.array([row[2] if row[2] is not None else 0 for row in rows], dtype=np.int64)
+    # NULL stats (no stats row, or 0 G/GP) become NaN
+    values = np.array([[value if isinstance(value, (int, float)) else np.nan for value in row[3:]] for row in rows], dtype=np.float64).reshape(len(rows), len(RATING_SOURCES) * 2)
+    return years_column, player_ids, roster_positions, values
+
+def midranks(keys, values):
+    # Rank of each value among the values with the same key (0-based, ties share the average of their ranks)
+    order = np.lexsort((values, keys))
+    sorted_keys = keys[order]
+    sorted_values = values[order]
+    new_run = np.ones(len(order), dtype=bool)
+    new_run[1:] = (sorted_keys[1:] != sorted_keys[:-1]) | (sorted_values[1:] != sorted_values[:-1])
+    new_group = np.ones(len(order), dtype=bool)
+    new_group[1:] = sorted_keys[1:] != sorted_keys[:-1]
+
+    positions = np.arange(len(order))
+    group_start = np.maximum.accumulate(np.where(new_group, positions, 0))
+    run_ids = np.cumsum(new_run) - 1
+    run_start = positions[new_run]
+    run_length = np.bincount(run_ids)
+    ranks = np.empty(len(order), dtype=np.float64)
+    ranks[order] = run_start[run_ids] + (run_length[run_ids] - 1) / 2 - group_start
+    return ranks
+
+def generate_ratings(years_column, roster_positions, values, distributions):
+    # Quantile-map every stat onto its stock distribution, separately for every (season, roster group).
+    # Returns {rating column: int array, 0 where there was no stat to rate}
+    group_index = np.full(len(roster_positions), -1, dtype=np.int64)
+    for i, (group, first, last, table) in enumerate(ROSTER_GROUPS):
+        group_index[(roster_positions >= first) & (roster_positions <= last)] = i
+
+    ratings = {}
+    for n, (column, (groups, distribution_column, stat, sample, prior, lower_is_better)) in enumerate(RATING_SOURCES.items()):
+        stat_values = values[:, n * 2]
+        sample_sizes = np.nan_to_num(values[:, n * 2 + 1])
+        in_groups = np.isin(group_index, [i for i, group in enumerate(ROSTER_GROUPS) if group[0] in groups])
+        valid = in_groups & np.isfinite(stat_values)
+        key = years_column * len(ROSTER_GROUPS) + group_index
+
+        # Pull small samples toward the (season, group) average: (stat * n + average * prior) / (n + prior)
+        keys, inverse = np.unique(key[valid], return_inverse=True)
+        averages = np.bincount(inverse, weights=stat_values[valid] * sample_sizes[valid]) / np.maximum(np.bincount(inverse, weights=sample_sizes[valid]), 1e-9)
+        adjusted = (stat_values[valid] * sample_sizes[valid] + averages[inverse] * prior) / (sample_sizes[valid] + prior)
+        if lower_is_better:
+            adjusted = -adjusted
+
+        # Share of the group below each player -> rating where the stock cumulative share reaches it
+        counts = np.bincount(inverse)
+        quantiles = (midranks(inverse, adjusted) + 0.5) / counts[inverse]
+        result = np.zeros(len(roster_positions), dtype=np.int64)
+        mapped = np.zeros(len(quantiles), dtype=np.int64)
+        valid_groups = group_index[valid]
+        for i, (group, first, last, table) in enumerate(ROSTER_GROUPS):
+            if group not in groups:
+                continue
+            cumulative = distributions.get((group, distribution_column))
+            if cumulative is None:
+                raise Exception(f"ERROR: '{table}' has no '{distribution_column}' ratings")
+            in_group = valid_groups == i
+            mapped[in_group] = np.minimum(np.searchsorted(cumulative, quantiles[in_group] - 1e-9), 9) + 1
+        result[valid] = mapped
+        ratings[column] = result
+    return ratings
+
+def create_ratings_table(cur, year):
+    checks = ",\n\t".join(f'"{column}"\tINTEGER CHECK("{column}" <= 10)' for column in RATINGS_COLUMNS)
+    cur.execute(f'CREATE TABLE IF NOT EXISTS "ratings_{year}" (\n\t"player_id"\tTEXT NOT NULL UNIQUE,\n\t{checks},\n\tPRIMARY KEY("player_id")\n)')
+
+def write_ratings(conn, years, years_column, player_ids, ratings, overwrite=False):
+    # Upsert the generated ratings into ratings_$YEAR.  Only NULL ratings are filled in unless overwrite is True, and
+    # 0 (no stat) never overwrites anything.
+    cur = conn.cursor()
+    columns = list(ratings)
+    values = np.stack([ratings[column] for column in columns], axis=1)
+    for year in years:
+        create_ratings_table(cur, year)
+        rows = [
+            [player_ids[i]] + [int(value) if value else None for value in values[i]]
+            for i in np.flatnonzero(years_column == year)
+        ]
+        if overwrite:
+            assignments = ", ".join(f'"{column}" = COALESCE(excluded."{column}", "{column}")' for column in columns)
+        else:
+            assignments = ", ".join(f'"{column}" = COALESCE("{column}", excluded."{column}")' for column in columns)
+        column_list = ", ".join(["player_id"] + [f'"{column}"' for column in columns])
+        placeholders = ", ".join("?" for n in range(len(columns) + 1))
+        cur.executemany(f"INSERT INTO ratings_{year} ({column_list}) VALUES ({placeholders}) ON CONFLICT (player_id) DO UPDATE SET {assignments}", rows)
+    conn.commit()
+
+def print_distributions(years, years_column, roster_positions, ratings):
+    # Rating histogram (10 down to 1) of every generated column and roster group, per season
+    for year in years:
+        print(f"{year}:")
+        for column, (groups, distribution_column, stat, sample, prior, lower_is_better) in RATING_SOURCES.items():
+            for group, first, last, table in ROSTER_GROUPS:
+                if group not in groups:
+                    continue
+                selected = (years_column == year) & (roster_positions >= first) & (roster_positions <= last)
+                counts = np.bincount(ratings[column][selected], minlength=11)
+                histogram = " ".join(f"{count:3d}" for count in counts[10:0:-1])
+                print(f"  {column:15s} {group:19s} {histogram}  (no stat: {counts[0]})")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate 'ratings_$YEAR' from 'stats_$YEAR' for the Ken Griffey Jr. Presents Major League Baseball ROM modifier, matching the stock rating distributions.  Created by johnz1.")
+    parser.add_argument("--db", help=f"Path to the SQLite database (default: {DEFAULT_DB_PATH})", default=DEFAULT_DB_PATH)
+    parser.add_argument("--year", type=int, nargs="+", help="Seasons to rate (default: every season with team_lineups_$YEAR and stats_$YEAR)")
+    existing = parser.add_mutually_exclusive_group()
+    existing.add_argument("--keep-existing", dest="overwrite", action="store_false", help="Only fill in ratings that are NULL, keep the ones that are already set (the default)")
+    existing.add_argument("--overwrite", dest="overwrite", action="store_true", help="Replace every rating that has a stat, including hand-set ones")
+    parser.add_argument("--dry-run", action="store_true", help="Print the generated distributions without writing anything")
+    parser.set_defaults(overwrite=False)
+    args = parser.parse_args(argv)
+    if not args.db:
+        parser.error("--db is required (or set DEFAULT_DB_PATH at the top of the script)")
+    if np is None:
+        parser.error("NumPy is required for the ratings generator (pip install numpy)")
+
+    conn = sqlite3.connect(args.db)
+    try:
+        cur = conn.cursor()
+        years = args.year or detect_seasons(cur)
+        if not years:
+            raise Exception("ERROR: No seasons with both team_lineups_$YEAR and stats_$YEAR were found")
+        distributions = load_stock_distributions(cur)
+
+        started = time.perf_counter()
+        years_column, player_ids, roster_positions, values = load_season_stats(cur, years)
+        loaded = time.perf_counter()
+        ratings = generate_ratings(years_column, roster_positions, values, distributions)
+        generated = time.perf_counter()
+
+        print_distributions(years, years_column, roster_positions, ratings)
+        if not args.dry_run:
+            write_ratings(conn, years, years_column, player_ids, ratings, args.overwrite)
+        print(f"Rated {len(player_ids)} players in {len(years)} season(s): loaded in {(loaded - started) * 1000:.1f}ms, generated in {(generated - loaded) * 1000:.1f}ms")
+    except Exception as e:
+        print(e)
+        sys.exit(1)
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import argparse
+import collections
+import hashlib
+import importlib.util
+import os
+import sqlite3
+import sys
+
+# Configurable defaults
+DEFAULT_DB_PATH = ""
+DEFAULT_TABLE = "rom_extract"
+DEFAULT_MAX_DIFFERENCES = 20
+MODIFIER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ken_griffey_jr_presents_mlb-rom_modifier-by_johnz1.py")
+
+# Load the ROM modifier script as a module (its file name isn't importable)
+spec = importlib.util.spec_from_file_location("kgjr_rom_modifier", MODIFIER_PATH)
+modifier = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(modifier)
+
+def create_extract_table(cur, table):
+    columns = ",\n\t".join(f'"{field}"' for field in modifier.ROM_PLAYER_FIELDS)
+    cur.execute(f'CREATE TABLE IF NOT EXISTS "{table}" (\n\t"rom_sha256"\tTEXT NOT NULL,\n\t"rom_file"\tTEXT,\n\t{columns}\n)')
+    cur.execute(f'CREATE INDEX IF NOT EXISTS "idx_{table}_rom_sha256" ON "{table}" (rom_sha256)')
+
+def extract_rom(cur, table, rom_path, rom, layout):
+    # Replace the rows of this ROM (by SHA-256) with its decoded roster and Home Run Derby records
+    sha256 = hashlib.sha256(rom).hexdigest()
+    rows = modifier.decode_rom_players(rom, layout)
+    cur.execute(f'DELETE FROM "{table}" WHERE rom_sha256 = ?', (sha256,))
+    placeholders = ", ".join("?" for n in range(len(modifier.ROM_PLAYER_FIELDS) + 2))
+    cur.executemany(f'INSERT INTO "{table}" VALUES ({placeholders})', [(sha256, os.path.basename(rom_path)) + row for row in rows])
+    return len(rows)
+
+def print_differences(rom_path, differences, max_differences):
+    if not differences:
+        print(f"{rom_path}: matches the DB")
+        return
+    fields = collections.Counter(difference[4] for difference in differences)
+    slots = len({difference[:3] for difference in differences})
+    print(f"{rom_path}: {len(differences)} difference(s) in {slots} slot(s) ({', '.join(f'{field} x{count}' for field, count in fields.most_common())})")
+    for slot_type, team_stock, slot, player_id, field, actual, expected in differences[:max_differences]:
+        where = f"{team_stock} #{slot}" if slot_type == "team" else f"HR Derby #{slot}"
+        print(f"  {where} ({player_id}): {field} is {actual!r} in the ROM, {expected!r} from the DB")
+    if len(differences) > max_differences:
+        print(f"  ... and {len(differences) - max_differences} more")
+
+def main():
+    parser = argparse.ArgumentParser(description="Decode the rosters of Ken Griffey Jr. Presents Major League Baseball SNES ROMs into the SQLite DB, or check built ROMs against it.  Created by johnz1.")
+    parser.add_argument("romfile", nargs="+", help="ROM files to decode or verify")
+    parser.add_argument("--db", help=f"Path to the SQLite database (default: {DEFAULT_DB_PATH})", default=DEFAULT_DB_PATH)
+    parser.add_argument("--table", default=DEFAULT_TABLE, help=f"Table for the decoded records (default: {DEFAULT_TABLE})")
+    parser.add_argument("--verify", action="store_true", help="Compare each ROM field by field with what the DB would build for --year, instead of extracting")
+    parser.add_argument("--year", type=int, help="Season to verify against")
+    parser.add_argument("--snapshot", help="With --verify, take the season from this --export-snapshot file ({year} is replaced with --year) instead of the DB.  --db is then optional; if it's given, a stale snapshot is an error")
+    parser.add_argument("--fill-stats", action="store_true", help="With --verify, expect NULL avg/era filled in from other seasons, like the ROM modifier's --fill-stats")
+    parser.add_argument("--max-differences", type=int, default=DEFAULT_MAX_DIFFERENCES, help=f"Differences to print per ROM (default: {DEFAULT_MAX_DIFFERENCES})")
+    args = parser.parse_args()
+    if args.snapshot and not args.verify:
+        parser.error("--snapshot only works with --verify")
+    if not args.db and not (args.snapshot and not args.fill_stats):
+        parser.error("--db is required (or set DEFAULT_DB_PATH at the top of the script)")
+    if args.verify and args.year is None:
+        parser.error("--verify needs --year")
+
+    # A --verify against a snapshot doesn't need the DB
+    conn = sqlite3.connect(args.db) if args.db else None
+    failed = False
+    try:
+        cur = conn.cursor() if conn is not None else None
+        if args.verify:
+            season = modifier.load_build_season(cur, args, args.year)
+        else:
+            create_extract_table(cur, args.table)
+
+        for rom_path in args.romfile:
+            with open(rom_path, "rb") as f:
+                rom = f.read()
+            try:
+                layout = modifier.probe_rom_layout(rom)
+            except Exception as e:
+                print(f"{rom_path}: {e}")
+                failed = True
+                continue
+
+            if args.verify:
+                differences = modifier.verify_rom(rom, layout, season)
+                print_differences(rom_path, differences, args.max_differences)
+                failed = failed or bool(differences)
+            else:
+                count = extract_rom(cur, args.table, rom_path, rom, layout)
+                print(f"{rom_path}: {count} player records extracted into {args.table}")
+        if conn is not None:
+            conn.commit()
+    except Exception as e:
+        print(e)
+        failed = True
+    finally:
+        if conn is not None:
+            conn.close()
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
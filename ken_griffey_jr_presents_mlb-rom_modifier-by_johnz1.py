@@ -1,41 +1,74 @@
 import argparse
+import array
+import concurrent.futures
+import contextlib
+import cProfile
+import functools
+import hashlib
+import io
+import json
+import math
+import mmap
+import os
+import re
+import shutil
 import sqlite3
+import struct
 import sys
+import time
+import urllib.request
+import zlib
 
-# Configurable defaults
-#DEFAULT_DB_PATH = ""
-
-# Parse arguments
-parser = argparse.ArgumentParser(description="Update Ken Griffey Jr. Presents Major League Baseball SNES ROM with stats from a SQLite DB.  Created by johnz1.")
-parser.add_argument("romfile", help="Ken Griffey Jr. Presents Major League Baseball SNES ROM file to update (will be overwritten!)")
-parser.add_argument("--db", help=f"Path to the SQLite database (default: {DEFAULT_DB_PATH})", default=DEFAULT_DB_PATH)
-parser.add_argument("--year", required=True, type=int, help="Year of stats to use")
-args = parser.parse_args()
+try:
+    import numpy as np
+except ImportError:
+    np = None  # only needed for ROM decoding (--verify, --extract) and the faster checksum
 
-# Set variables for tables
-hr_derby_table = f"home_run_derby_lineups_{args.year}"
-lineup_table = f"team_lineups_{args.year}"
-ratings_table = f"ratings_{args.year}"
-stats_table = f"stats_{args.year}"
-
-# Connect to the DB
-conn = sqlite3.connect(args.db)
-cur = conn.cursor()
+# Configurable defaults
+DEFAULT_DB_PATH = ""
+DEFAULT_LAYOUT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "ken_griffey_jr_presents_mlb-rom_layouts.json")
+DEFAULT_WATCH_POLL_INTERVAL = 0.2
+DEFAULT_WATCH_DEBOUNCE = 0.3
 
 # Team and ROM structure info
-cur.execute(f"SELECT DISTINCT team_stock, team_{args.year} FROM {lineup_table}")
-teams = cur.fetchall()
 TEAMS_STOCK_ORDER = [
     "BAL", "BOS", "CAL", "CHW", "CLE", "DET", "KC", "MIL", "MIN", "NYY", "OAK", "SEA", "TEX", "TOR",
     "ATL", "CHC", "CIN", "HOU", "LAD", "MON", "NYM", "PIT", "STL", "SD", "SF", "PHI", "COL", "FLA"
 ]
-TEAM_OFFSETS = {}
 PLAYER_LENGTH = 0x20
 TEAM_LENGTH = 0x320
 AL_TO_NL_GAP = 0xB40
 FIRST_TEAM_MARKER = bytes([0x81, 0x81, 0x81, 0x81, 0x9F, 0x9F, 0x90, 0x90, 0x90, 0x90, 0x90, 0x90, 0xF0, 0xF0])
 HR_DERBY_MARKER = bytes([0x02, 0x2E, 0x37, 0x27, 0x00, 0x0A, 0x23, 0x3B, 0x35, 0xFF])
 HR_DERBY_BATTER_COUNT = 6
+COPIER_HEADER_LENGTH = 0x200
+LAYOUT_CACHE_VERSION = 2
+LAYOUT_CACHE_MAX_ENTRIES = 64
+BUILD_MANIFEST_VERSION = 2
+IPS_MAX_RECORD_LENGTH = 0xFFFF
+IPS_MAX_OFFSET = 0xFFFFFF
+IPS_EOF_OFFSET = 0x454F46  # "EOF", a record can't start here
+PATCH_MERGE_GAP = 5  # unchanged bytes between two changed runs that are cheaper to resend than to start a new record
+
+# SNES internal header: where it can be (ROM offsets, without a copier header) and the map mode each place goes with
+SNES_HEADER_CANDIDATES = [
+    (0x7FC0, (0x20, 0x22, 0x23, 0x30, 0x32, 0x33)),  # LoROM
+    (0xFFC0, (0x21, 0x31)),                          # HiROM
+    (0x40FFC0, (0x25, 0x35)),                        # ExHiROM
+]
+SNES_HEADER_TITLE_LENGTH = 21
+SNES_HEADER_MAP_MODE = 0x15
+SNES_HEADER_CHECKSUM_COMPLEMENT = 0x1C  # 2 bytes, little endian, then the checksum itself (2 bytes)
+
+# Season snapshot files (see export_season_snapshot): fixed header, then 8-byte aligned columns, the string table and
+# a JSON description of it all.  The CRC-32 covers everything after the header.
+SNAPSHOT_MAGIC = b"KGJRSNAP"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct("<8sIIQQI")  # magic, version, year, metadata offset, metadata length, CRC-32
+SNAPSHOT_DATA_START = 64
+SNAPSHOT_NULL_INT = -0x80000000
+SNAPSHOT_NULL_INDEX = 0xFFFFFFFF
+SNAPSHOT_TYPECODES = {"i": "i", "d": "d", "s": "I", "v": "I"}  # int32, float64, string index, JSON value index
 
 # Character mapping
 CHAR_MAP = {
@@ -72,138 +105,1050 @@ HAND_MAP = {
     "B": 0x20,
 }
 
-# Ensure there are exactly 700 rows in team_lineups_$YEAR
-cur.execute(f"SELECT COUNT(*) FROM {lineup_table}")
-count = cur.fetchone()[0]
-if count != 700:
-    print(f"ERROR: The {lineup_table} has {count} rows.  It should have exactly 700 rows (28 teams, each with 25 players).  Aborting.")
-    conn.close()
-    sys.exit(1)
-
-# Ensure every team has exactly 25 players in team_lineups_$YEAR
-for team_stock in TEAMS_STOCK_ORDER:
-    cur.execute(f"SELECT COUNT(*) FROM {lineup_table} WHERE team_stock = ?", (team_stock,))
-    count = cur.fetchone()[0]
-    if count != 25:
-        print(f"ERROR: Team {team_stock} has {count} players in {lineup_table} (should be 25). Aborting.")
-        conn.close()
-        sys.exit(1)
+# Inverse mappings, for decoding ROM records
+CHAR_MAP_INVERSE = {code: char for char, code in CHAR_MAP.items()}
+POS_MAP_INVERSE = {code: pos for pos, code in POS_MAP.items()}
+HAND_MAP_INVERSE = {code: hand for hand, code in HAND_MAP.items()}
 
-def find_first_team_offset(data):
-    idx = data.find(FIRST_TEAM_MARKER)
-    if idx == -1:
+def compute_team_offsets(first_team_offset):
+    # AL teams are back to back, then there is a gap before the NL teams
+    team_offsets = {}
+    for idx, team_stock in enumerate(TEAMS_STOCK_ORDER):
+        if idx <= 13:  # AL
+            offset = first_team_offset + idx * TEAM_LENGTH
+        else:  # NL
+            offset = first_team_offset + 14 * TEAM_LENGTH + AL_TO_NL_GAP + (idx - 14) * TEAM_LENGTH
+        team_offsets[team_stock] = offset
+    return team_offsets
+
+def probe_rom_layout(data):
+    # Detect a copier header and find both marker sequences (bytes.find is much faster than any single-pass regex).
+    # Offsets are file offsets, so they already include the header if there is one.
+    header_size = COPIER_HEADER_LENGTH if len(data) % 0x400 == COPIER_HEADER_LENGTH else 0
+    first_team_offset = data.find(FIRST_TEAM_MARKER)
+    if first_team_offset == -1:
         raise Exception("ERROR: First team marker sequence not found!")
-    return idx + len(FIRST_TEAM_MARKER)
-
-def find_first_hr_derby_player_offset(data):
-    idx = data.find(HR_DERBY_MARKER)
-    if idx == -1:
+    first_team_offset += len(FIRST_TEAM_MARKER)
+    first_hr_derby_player_offset = data.find(HR_DERBY_MARKER)
+    if first_hr_derby_player_offset == -1:
         raise Exception("ERROR: Home Run Derby marker sequence not found!")
-    return idx + len(HR_DERBY_MARKER)
+    first_hr_derby_player_offset += len(HR_DERBY_MARKER)
+    snes_header_offset = find_snes_header(data, header_size)
+    return {
+        "version": LAYOUT_CACHE_VERSION,
+        "rom_size": len(data),
+        "header_size": header_size,
+        "first_team_offset": first_team_offset,
+        "first_hr_derby_player_offset": first_hr_derby_player_offset,
+        "team_offsets": compute_team_offsets(first_team_offset),
+        "snes_header_offset": snes_header_offset,
+        "checksum_sum": None if snes_header_offset is None else rom_checksum_sum(data, header_size, snes_header_offset),
+    }
+
+def find_snes_header(data, header_size):
+    # File offset of the SNES internal header, or None if there isn't a believable one.
+    # A candidate counts if its checksum and complement add up, or if its map mode and title both look right.
+    best_offset, best_score = None, 1
+    for rom_offset, map_modes in SNES_HEADER_CANDIDATES:
+        offset = header_size + rom_offset
+        if offset + 0x20 > len(data):
+            continue
+        complement, checksum = struct.unpack_from("<HH", data, offset + SNES_HEADER_CHECKSUM_COMPLEMENT)
+        title = data[offset:offset+SNES_HEADER_TITLE_LENGTH]
+        score = 0
+        if complement ^ checksum == 0xFFFF:
+            score += 2
+        if data[offset + SNES_HEADER_MAP_MODE] in map_modes:
+            score += 1
+        if all(0x20 <= char < 0x7F for char in title):
+            score += 1
+        if score > best_score:
+            best_offset, best_score = offset, score
+    return best_offset
+
+def checksum_weights(rom_size):
+    # The checksum covers a power-of-two sized image.  If the ROM is bigger than the largest power of two
+    # that fits, the rest is mirrored to fill it, so each byte past that point counts several times.
+    # Returns (start of the mirrored part, how many times its bytes count)
+    base = 1 << (rom_size.bit_length() - 1)
+    if base == rom_size:
+        return rom_size, 1
+    return base, max(base // (rom_size - base), 1)
+
+def rom_checksum_sum(data, header_size, snes_header_offset):
+    # Full 16-bit SNES checksum of data (with the checksum and complement counted as 0x0000/0xFFFF, like the
+    # game's own build tools do), vectorized with NumPy if it's installed.
+    rom = memoryview(data)[header_size:]
+    mirror_start, mirror_count = checksum_weights(len(rom))
+    if np is not None:
+        rom_array = np.frombuffer(rom, dtype=np.uint8)
+        total = int(rom_array[:mirror_start].sum(dtype=np.uint64)) + int(rom_array[mirror_start:].sum(dtype=np.uint64)) * mirror_count
+    else:
+        total = sum(rom[:mirror_start]) + sum(rom[mirror_start:]) * mirror_count
+    field = snes_header_offset + SNES_HEADER_CHECKSUM_COMPLEMENT
+    total -= sum(data[field:field+4]) * (mirror_count if field - header_size >= mirror_start else 1)
+    return (total + 0xFF + 0xFF) & 0xFFFF
+
+def checksum_region(layout):
+    # (offset, length) of the checksum complement and checksum, or None if the ROM has no SNES header
+    if layout.get("snes_header_offset") is None:
+        return None
+    return (layout["snes_header_offset"] + SNES_HEADER_CHECKSUM_COMPLEMENT, 4)
+
+def update_rom_checksum(rom_data, base_rom_data, layout, regions=None):
+    # Set the checksum of rom_data from the base ROM's checksum (worked out once in probe_rom_layout) plus the
+    # byte deltas of the regions that can differ from the base, instead of summing the whole ROM again.
+    region = checksum_region(layout)
+    if region is None:
+        return None
+    mirror_start, mirror_count = checksum_weights(layout["rom_size"] - layout["header_size"])
+    total = layout["checksum_sum"]
+    for offset, length in (player_regions(layout) if regions is None else regions):
+        delta = sum(rom_data[offset:offset+length]) - sum(base_rom_data[offset:offset+length])
+        total += delta * (mirror_count if offset - layout["header_size"] >= mirror_start else 1)
+    checksum = total & 0xFFFF
+    struct.pack_into("<HH", rom_data, region[0], checksum ^ 0xFFFF, checksum)
+    return checksum
+
+def load_rom_layout(data, cache_path=None):
+    # probe_rom_layout(), but remembered in a small JSON file keyed by the ROM's SHA-256
+    if not cache_path:
+        return probe_rom_layout(data)
+    rom_hash = hashlib.sha256(data).hexdigest()
+    try:
+        with open(cache_path, "r") as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        cache = {}
+    layout = cache.get(rom_hash)
+    if layout and layout.get("version") == LAYOUT_CACHE_VERSION and layout.get("rom_size") == len(data):
+        return layout
+
+    layout = probe_rom_layout(data)
+    cache.pop(rom_hash, None)
+    cache[rom_hash] = layout
+    while len(cache) > LAYOUT_CACHE_MAX_ENTRIES:
+        del cache[next(iter(cache))]
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(cache, f)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"WARNING: Could not write layout cache {cache_path}: {e}")
+    return layout
+
+def player_regions(layout):
+    # (offset, length) of every team roster slot and Home Run Derby slot the modifier writes
+    regions = []
+    for team_stock in TEAMS_STOCK_ORDER:
+        for idx in range(25):
+            regions.append((layout["team_offsets"][team_stock] + idx * PLAYER_LENGTH, PLAYER_LENGTH))
+    for idx in range(HR_DERBY_BATTER_COUNT):
+        regions.append((layout["first_hr_derby_player_offset"] + idx * PLAYER_LENGTH, PLAYER_LENGTH))
+    return regions
+
+def rom_regions(layout):
+    # Every region a build can change: the player records and the SNES header checksum
+    region = checksum_region(layout)
+    return player_regions(layout) + ([region] if region else [])
+
+def recover_rom_journal(target_path):
+    # Roll back an --in-place write that was interrupted before it finished
+    journal_path = target_path + ".journal"
+    if not os.path.exists(journal_path):
+        return False
+    try:
+        with open(journal_path, "r") as f:
+            journal = [(offset, bytes.fromhex(original)) for offset, original in json.load(f)["regions"]]
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        # The journal is written to a temp file and renamed into place before the target is touched, so one that
+        # can't be read was never finished, and the target still has its old bytes
+        os.remove(journal_path)
+        print(f"WARNING: Removed an unreadable journal for {target_path} ({e}), the target was not touched")
+        return False
+    with open(target_path, "r+b") as f:
+        for offset, original in journal:
+            f.seek(offset)
+            f.write(original)
+        f.flush()
+        os.fsync(f.fileno())
+    os.remove(journal_path)
+    print(f"WARNING: Rolled back an unfinished write to {target_path}")
+    return True
+
+def patch_regions(mm, rom_data, regions):
+    # Copy only the regions whose bytes differ from what is already in the target
+    changed = []
+    for offset, length in regions:
+        if mm[offset:offset+length] != rom_data[offset:offset+length]:
+            changed.append((offset, length))
+    for offset, length in changed:
+        mm[offset:offset+length] = rom_data[offset:offset+length]
+    return changed
+
+def write_rom(source_path, target_path, rom_data, regions, in_place=False):
+    # Write rom_data to target_path, touching only the changed regions.
+    # Default: copy source_path next to the target, patch the copy through mmap, then rename it
+    # over the target, so a crash never leaves a half-written ROM.
+    # in_place: patch the target through mmap directly, with a journal of the original bytes
+    # so recover_rom_journal() can roll back an interrupted write.
+    # Returns the list of (offset, length) regions that were changed.
+    recover_rom_journal(target_path)
+
+    if in_place and os.path.exists(target_path) and os.path.getsize(target_path) == len(rom_data):
+        with open(target_path, "r+b") as f, mmap.mmap(f.fileno(), 0) as mm:
+            changed = [(offset, length) for offset, length in regions
+                       if mm[offset:offset+length] != rom_data[offset:offset+length]]
+            if not changed:
+                return changed
+            journal_path = target_path + ".journal"
+            journal = {"regions": [(offset, mm[offset:offset+length].hex()) for offset, length in changed]}
+            write_file_atomic(journal_path, json.dumps(journal).encode())
+            patch_regions(mm, rom_data, changed)
+            mm.flush()
+        os.remove(journal_path)
+        return changed
+    elif in_place:
+        print(f"WARNING: {target_path} is missing or a different size, writing a new copy instead of patching in place")
+
+    target_dir = os.path.dirname(os.path.abspath(target_path))
+    tmp_path = os.path.join(target_dir, f".{os.path.basename(target_path)}.{os.getpid()}.tmp")
+    try:
+        shutil.copyfile(source_path, tmp_path)
+        if os.path.getsize(tmp_path) != len(rom_data):
+            raise Exception(f"ERROR: {source_path} changed size while the ROM was being built")
+        with open(tmp_path, "r+b") as f:
+            with mmap.mmap(f.fileno(), 0) as mm:
+                changed = patch_regions(mm, rom_data, regions)
+                mm.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, target_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return changed
+
+def team_slot_key(team_stock, idx):
+    return f"{team_stock}/{idx + 1}"
+
+def hr_derby_slot_key(idx):
+    return f"HR/{idx + 1}"
+
+def player_source_hash(player, *extra):
+    # Hash of everything that goes into encoding one slot
+    values = tuple(getattr(player, field) for field in PLAYER_RECORD_FIELDS) + extra
+    return hashlib.sha1(repr(values).encode("utf-8")).hexdigest()
+
+def build_slot_hashes(rom_data, layout, team_rosters, hr_derby_players):
+    # {slot key: (offset, player_id, source hash)} for every slot the build will write.
+    # The slot's current ROM bytes are part of the hash because encoding keeps some of them.
+    slot_hashes = {}
+    for team_stock in TEAMS_STOCK_ORDER:
+        for idx, player in enumerate(team_rosters.get(team_stock, [])[:25]):
+            offset = layout["team_offsets"][team_stock] + idx * PLAYER_LENGTH
+            source_hash = player_source_hash(player, idx, rom_data[offset:offset+PLAYER_LENGTH].hex())
+            slot_hashes[team_slot_key(team_stock, idx)] = (offset, player.player_id, source_hash)
+    for idx, (league, roster_position, player) in enumerate(hr_derby_players):
+        offset = layout["first_hr_derby_player_offset"] + idx * PLAYER_LENGTH
+        source_hash = player_source_hash(player, league, roster_position)
+        slot_hashes[hr_derby_slot_key(idx)] = (offset, player.player_id, source_hash)
+    return slot_hashes
+
+def load_build_manifest(manifest_path, year):
+    # Slots from the last build, or {} if there is no usable manifest (full rebuild)
+    try:
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get("version") != BUILD_MANIFEST_VERSION or manifest.get("year") != year:
+        return {}
+    return manifest.get("slots", {})
+
+def apply_build_manifest(rom_data, manifest_slots, slot_hashes, diagnostics):
+    # Copy the last build's bytes and diagnostics into every slot whose inputs haven't changed, return the slot keys
+    # that need encoding
+    dirty = set()
+    for key, (offset, player_id, source_hash) in slot_hashes.items():
+        entry = manifest_slots.get(key)
+        if entry and entry.get("source_hash") == source_hash:
+            rom_data[offset:offset+PLAYER_LENGTH] = bytes.fromhex(entry["bytes"])
+            diagnostics.saved_slots[key] = entry["issues"]
+        else:
+            dirty.add(key)
+    return dirty
+
+def save_build_manifest(manifest_path, year, rom_data, slot_hashes, slot_issues):
+    # slot_issues: {slot key: [diagnostics issue]} (Diagnostics.slot_issues()), so the next build can report them
+    # for the slots it doesn't re-encode
+    slots = {}
+    for key, (offset, player_id, source_hash) in slot_hashes.items():
+        slots[key] = {
+            "player_id": player_id,
+            "source_hash": source_hash,
+            "bytes": rom_data[offset:offset+PLAYER_LENGTH].hex(),
+            "issues": slot_issues.get(key, []),
+        }
+    tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"version": BUILD_MANIFEST_VERSION, "year": year, "slots": slots}, f, indent=1)
+    os.replace(tmp_path, manifest_path)
+
+def diff_runs(source, target, regions):
+    # [(offset, changed bytes)] for the regions that differ between source and target.
+    # Runs closer together than PATCH_MERGE_GAP are merged, so they share one patch record.
+    runs = []
+    for offset, length in sorted(regions):
+        if source[offset:offset+length] == target[offset:offset+length]:
+            continue
+        for i in range(offset, offset + length):
+            if source[i] == target[i]:
+                continue
+            if runs and i - runs[-1][1] <= PATCH_MERGE_GAP:
+                runs[-1][1] = i + 1
+            else:
+                runs.append([i, i + 1])
+    return [(start, bytes(target[start:end])) for start, end in runs]
+
+def write_file_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def build_ips_patch(source, target, regions):
+    if len(source) != len(target):
+        raise Exception("ERROR: IPS patches need the source and target ROMs to be the same size")
+    patch = bytearray(b"PATCH")
+    for offset, data in diff_runs(source, target, regions):
+        if offset == IPS_EOF_OFFSET:
+            # Start one byte earlier so the record offset doesn't read as "EOF"
+            offset -= 1
+            data = target[offset:offset+1] + data
+        for start in range(0, len(data), IPS_MAX_RECORD_LENGTH):
+            chunk = data[start:start+IPS_MAX_RECORD_LENGTH]
+            record_offset = offset + start
+            if record_offset > IPS_MAX_OFFSET:
+                raise Exception(f"ERROR: Offset {record_offset:#x} is too large for an IPS patch, use --bps")
+            patch += record_offset.to_bytes(3, "big") + len(chunk).to_bytes(2, "big") + chunk
+    patch += b"EOF"
+    return bytes(patch)
+
+def bps_number(value):
+    # BPS variable-length number encoding
+    out = bytearray()
+    while True:
+        x = value & 0x7F
+        value >>= 7
+        if value == 0:
+            out.append(0x80 | x)
+            return out
+        out.append(x)
+        value -= 1
+
+def build_bps_patch(source, target, regions):
+    # Only SourceRead (0) and TargetRead (1) actions are needed since the ROM never changes size
+    if len(source) != len(target):
+        raise Exception("ERROR: BPS patches from this script need the source and target ROMs to be the same size")
+    patch = bytearray(b"BPS1")
+    patch += bps_number(len(source)) + bps_number(len(target)) + bps_number(0)
+    position = 0
+    for offset, data in diff_runs(source, target, regions):
+        if offset > position:
+            patch += bps_number(((offset - position - 1) << 2) | 0)
+        patch += bps_number(((len(data) - 1) << 2) | 1) + data
+        position = offset + len(data)
+    if position < len(target):
+        patch += bps_number(((len(target) - position - 1) << 2) | 0)
+    patch += struct.pack("<II", zlib.crc32(source), zlib.crc32(target))
+    patch += struct.pack("<I", zlib.crc32(patch))
+    return bytes(patch)
+
+# Columns pulled for every roster slot (see load_season_roster)
+PLAYER_RECORD_FIELDS = (
+    "player_id", "year", "team_stock", "roster_position", "position",
+    "has_player_row", "first_name", "last_name", "jersey_number",
+    "handedness_batting", "handedness_throwing", "throwing_style",
+    "appearance_bat_skin", "appearance_bat_head", "appearance_bat_hair_color", "appearance_bat_body",
+    "appearance_bat_legs_size", "appearance_bat_legs_stance", "appearance_bat_arms_stance",
+    "appearance_pit_head", "appearance_pit_hair_color", "appearance_pit_skin", "appearance_pit_body",
+    "rating_bat_bat", "rating_bat_pow", "rating_bat_spd", "rating_bat_def",
+    "rating_pit_spd", "rating_pit_con", "rating_pit_fat",
+    "has_stats_row", "avg", "hr", "rbi", "w", "l", "sv", "era",
+)
+
+class PlayerRecord:
+    # Compact in-memory copy of one player's players/ratings/stats/lineup columns
+    __slots__ = PLAYER_RECORD_FIELDS
+
+    def __init__(self, row):
+        for field, value in zip(PLAYER_RECORD_FIELDS, row):
+            setattr(self, field, value)
+
+def player_record_select(year, player_id_column="tl.player_id"):
+    # SELECT list matching PLAYER_RECORD_FIELDS, expects aliases tl/pl/rt/st
+    return f"""
+        {player_id_column}, {int(year)}, tl.team_stock, tl.roster_position, tl.position,
+        pl.player_id IS NOT NULL, pl.first_name, pl.last_name, pl.jersey_number_{year},
+        pl.handedness_batting, pl.handedness_throwing, pl.throwing_style,
+        pl.appearance_bat_skin, pl.appearance_bat_head, pl.appearance_bat_hair_color, pl.appearance_bat_body,
+        pl.appearance_bat_legs_size, pl.appearance_bat_legs_stance, pl.appearance_bat_arms_stance,
+        pl.appearance_pit_head, pl.appearance_pit_hair_color, pl.appearance_pit_skin, pl.appearance_pit_body,
+        rt.rating_bat_bat, rt.rating_bat_pow, rt.rating_bat_spd, rt.rating_bat_def,
+        rt.rating_pit_spd, rt.rating_pit_con, rt.rating_pit_fat,
+        st.player_id IS NOT NULL, st.avg, st.hr, st.rbi, st.w, st.l, st.sv, st.era"""
+
+def roster_from_rows(team_rows, hr_derby_rows):
+    # Turn PLAYER_RECORD_FIELDS rows (and (league, roster_position, *PLAYER_RECORD_FIELDS) HR Derby rows) into the
+    # ({team_stock: [PlayerRecord, ...]}, [(league, roster_position, PlayerRecord), ...]) that the encoders use.
+    # Only the first row for each player is kept.
+    team_rosters = {}
+    seen = set()
+    for row in team_rows:
+        player = PlayerRecord(row)
+        if player.player_id in seen:
+            continue
+        seen.add(player.player_id)
+        team_rosters.setdefault(player.team_stock, []).append(player)
+
+    hr_derby_players = []
+    seen = set()
+    for row in hr_derby_rows:
+        league, roster_position, player = row[0], row[1], PlayerRecord(row[2:])
+        if player.player_id in seen:
+            continue
+        seen.add(player.player_id)
+        hr_derby_players.append((league, roster_position, player))
+    return team_rosters, hr_derby_players
+
+def load_season_roster(cur, year):
+    # Pull the whole season in one joined pass instead of ~15 queries per player.
+    # Returns ({team_stock: [PlayerRecord, ...] ordered by roster_position}, [(league, roster_position, PlayerRecord), ...])
+    # Uses rom_export_$YEAR (see maintain_schema) when it exists and is up to date.
+    if rom_export_is_current(cur, year):
+        return load_rom_export(cur, year)
+
+    # stats_$YEAR has no key, so if a player has several stats rows only the first one is kept (same as fetchone() before)
+    cur.execute(f"""
+        SELECT {player_record_select(year)}
+        FROM team_lineups_{year} tl
+        LEFT JOIN players pl ON pl.player_id = tl.player_id
+        LEFT JOIN ratings_{year} rt ON rt.player_id = tl.player_id
+        LEFT JOIN stats_{year} st ON st.player_id = tl.player_id
+        ORDER BY tl.team_stock, tl.roster_position, st.rowid
+    """)
+    team_rows = cur.fetchall()
 
-def encode_player_name(first_name, last_name):
+    # Home Run Derby batters (position comes from their team lineup, if they have one)
+    cur.execute(f"""
+        SELECT hd.league, hd.roster_position, {player_record_select(year, "hd.player_id")}
+        FROM home_run_derby_lineups_{year} hd
+        LEFT JOIN team_lineups_{year} tl ON tl.player_id = hd.player_id
+        LEFT JOIN players pl ON pl.player_id = hd.player_id
+        LEFT JOIN ratings_{year} rt ON rt.player_id = hd.player_id
+        LEFT JOIN stats_{year} st ON st.player_id = hd.player_id
+        ORDER BY
+            CASE hd.league WHEN 'NL' THEN 0 WHEN 'AL' THEN 1 ELSE 2 END,
+            hd.roster_position,
+            st.rowid
+    """)
+    return roster_from_rows(team_rows, cur.fetchall())
+
+def table_exists(cur, name):
+    cur.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,))
+    return cur.fetchone() is not None
+
+def detect_seasons(cur):
+    # Every year that has a team_lineups_$YEAR or stats_$YEAR table
+    cur.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    years = set()
+    for (name,) in cur.fetchall():
+        match = re.fullmatch(r"(?:team_lineups|stats)_(\d{4})", name)
+        if match:
+            years.add(int(match.group(1)))
+    return sorted(years)
+
+def rom_export_select(year, player_ids=None):
+    # INSERT ... SELECT for rom_export_$YEAR, for every player or only the ones in the given subquery
+    stats_join = f"st.rowid = (SELECT MIN(rowid) FROM stats_{year} WHERE player_id = {{key}})"
+    team_filter = f"WHERE tl.player_id IN ({player_ids})" if player_ids else ""
+    hr_derby_filter = f"WHERE hd.player_id IN ({player_ids})" if player_ids else ""
+    return [
+        f"""INSERT INTO rom_export_{year}
+            SELECT 'team', NULL, NULL, {player_record_select(year)}
+            FROM team_lineups_{year} tl
+            LEFT JOIN players pl ON pl.player_id = tl.player_id
+            LEFT JOIN ratings_{year} rt ON rt.player_id = tl.player_id
+            LEFT JOIN stats_{year} st ON {stats_join.format(key="tl.player_id")}
+            {team_filter}""",
+        f"""INSERT INTO rom_export_{year}
+            SELECT 'hr_derby', hd.league, hd.roster_position, {player_record_select(year, "hd.player_id")}
+            FROM home_run_derby_lineups_{year} hd
+            LEFT JOIN team_lineups_{year} tl ON tl.player_id = hd.player_id
+            LEFT JOIN players pl ON pl.player_id = hd.player_id
+            LEFT JOIN ratings_{year} rt ON rt.player_id = hd.player_id
+            LEFT JOIN stats_{year} st ON {stats_join.format(key="hd.player_id")}
+            {hr_derby_filter}""",
+    ]
+
+def maintain_schema(conn, years):
+    # Add the indexes the season tables are missing, and build rom_export_$YEAR: one pre-joined row per roster and
+    # Home Run Derby slot with exactly the columns the encoder reads.  Triggers on the source tables record which
+    # players changed in rom_export_$YEAR_dirty, so refresh_rom_export() only rebuilds those rows.  Builds read the
+    # export table only while nothing is waiting in the dirty table, and never refresh it themselves.
+    cur = conn.cursor()
+    for year in years:
+        created = []
+        if table_exists(cur, f"stats_{year}"):
+            cur.execute(f"CREATE INDEX IF NOT EXISTS idx_stats_{year}_player_id ON stats_{year} (player_id)")
+            created.append(f"idx_stats_{year}_player_id")
+        if table_exists(cur, f"team_lineups_{year}"):
+            cur.execute(f"CREATE INDEX IF NOT EXISTS idx_team_lineups_{year}_team_stock ON team_lineups_{year} (team_stock, roster_position)")
+            created.append(f"idx_team_lineups_{year}_team_stock")
+
+        if not all(table_exists(cur, table) for table in season_tables(year)):
+            print(f"{year}: indexes {', '.join(created) or 'none'}; skipped rom_export_{year} (season tables are missing)")
+            continue
+
+        export_exists = table_exists(cur, f"rom_export_{year}")
+        tracked = rom_export_is_tracked(cur, year)
+        columns = ", ".join(f'"{field}"' for field in ("slot_type", "league", "hr_roster_position") + PLAYER_RECORD_FIELDS)
+        cur.execute(f"CREATE TABLE IF NOT EXISTS rom_export_{year} ({columns})")
+        cur.execute(f"CREATE INDEX IF NOT EXISTS idx_rom_export_{year}_player_id ON rom_export_{year} (player_id)")
+        cur.execute(f"CREATE TABLE IF NOT EXISTS rom_export_{year}_dirty (player_id TEXT PRIMARY KEY)")
+        for table in ["players"] + season_tables(year):
+            for event, rows in (("INSERT", ["NEW"]), ("UPDATE", ["OLD", "NEW"]), ("DELETE", ["OLD"])):
+                inserts = " ".join(f"INSERT OR IGNORE INTO rom_export_{year}_dirty (player_id) VALUES ({row}.player_id);" for row in rows)
+                cur.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS rom_export_{year}_{table}_{event.lower()}
+                    AFTER {event} ON {table}
+                    BEGIN {inserts} END""")
+
+        if export_exists and tracked:
+            refreshed = refresh_rom_export(cur, year)
+            print(f"{year}: indexes {', '.join(created)}; rom_export_{year} refreshed ({refreshed} changed player(s))")
+        else:
+            # New, or a source table was dropped and re-created (with its triggers) since the last refresh, so any
+            # of its rows may have changed without being recorded
+            cur.execute(f"DELETE FROM rom_export_{year}")
+            cur.execute(f"DELETE FROM rom_export_{year}_dirty")
+            for statement in rom_export_select(year):
+                cur.execute(statement)
+            action = "rebuilt (a source table had lost its triggers)" if export_exists else "built"
+            print(f"{year}: indexes {', '.join(created)}; rom_export_{year} {action}")
+        conn.commit()
+
+    cur.execute("CREATE TABLE IF NOT EXISTS stats_by_year (player_id TEXT NOT NULL, year INTEGER NOT NULL, PRIMARY KEY (player_id, year)) WITHOUT ROWID")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_stats_by_year_year ON stats_by_year (year)")
+    cur.execute("CREATE TABLE IF NOT EXISTS stats_by_year_dirty (year INTEGER, player_id TEXT, PRIMARY KEY (year, player_id))")
+    cur.execute("CREATE TABLE IF NOT EXISTS stats_by_year_seasons (year INTEGER PRIMARY KEY)")
+    refreshed = refresh_stats_by_year(cur)
+    cur.execute("SELECT COUNT(*) FROM stats_by_year")
+    row_count = cur.fetchone()[0]
+    cur.execute("SELECT COUNT(*) FROM stats_by_year_seasons")
+    season_count = cur.fetchone()[0]
+    print(f"stats_by_year: {row_count} player season(s) from {season_count} stats table(s), {refreshed} changed player(s) refreshed")
+    conn.commit()
+
+def rom_export_triggers(year):
+    # Names of the triggers maintain_schema() puts on the source tables of rom_export_$YEAR
+    return {f"rom_export_{year}_{table}_{event}" for table in ["players"] + season_tables(year) for event in ("insert", "update", "delete")}
+
+def rom_export_is_tracked(cur, year):
+    # True if every source table of rom_export_$YEAR still has its triggers.  Dropping and re-creating a table (a
+    # re-import, or a DB browser's "modify table") drops them too, and its changes are no longer recorded.
+    cur.execute(f"SELECT name FROM sqlite_master WHERE type = 'trigger' AND name GLOB 'rom_export_{int(year)}_*'")
+    return rom_export_triggers(year) <= {row[0] for row in cur.fetchall()}
+
+def rom_export_is_current(cur, year):
+    # True if rom_export_$YEAR exists, its triggers are all in place and no source rows changed since its last refresh
+    if not table_exists(cur, f"rom_export_{year}_dirty") or not rom_export_is_tracked(cur, year):
+        return False
+    cur.execute(f"SELECT EXISTS (SELECT 1 FROM rom_export_{year}_dirty)")
+    return not cur.fetchone()[0]
+
+def refresh_rom_export(cur, year):
+    # Rebuild the rom_export_$YEAR rows of players that changed since the last refresh (only --maintain-schema does
+    # this, so a build never writes to the DB).  Returns the number of players refreshed.
+    cur.execute(f"SELECT COUNT(*) FROM rom_export_{year}_dirty")
+    dirty_count = cur.fetchone()[0]
+    if dirty_count:
+        dirty = f"SELECT player_id FROM rom_export_{year}_dirty"
+        cur.execute(f"DELETE FROM rom_export_{year} WHERE player_id IN ({dirty})")
+        for statement in rom_export_select(year, dirty):
+            cur.execute(statement)
+        cur.execute(f"DELETE FROM rom_export_{year}_dirty")
+    return dirty_count
+
+def stats_table_columns(cur, year):
+    cur.execute(f'PRAGMA table_info("stats_{year}")')
+    return [row[1] for row in cur.fetchall() if row[1] != "player_id"]
+
+def stats_by_year_select(cur, year, player_ids=None):
+    # INSERT ... SELECT of one season into stats_by_year, for every player or only the ones in the given subquery.
+    # Like rom_export_$YEAR, only the first stats_$YEAR row of each player is used.
+    columns = ", ".join(f'"{column}"' for column in stats_table_columns(cur, year))
+    player_filter = f"AND player_id IN ({player_ids})" if player_ids else ""
+    return f"""INSERT INTO stats_by_year (player_id, year, {columns})
+        SELECT player_id, {year}, {columns} FROM stats_{year}
+        WHERE rowid IN (SELECT MIN(rowid) FROM stats_{year} WHERE player_id IS NOT NULL {player_filter} GROUP BY player_id)"""
+
+def add_stats_by_year_season(cur, year):
+    # (Re)load a whole season into stats_by_year and add the triggers that record its changed players
+    cur.execute("SELECT name FROM pragma_table_info('stats_by_year')")
+    existing = {row[0] for row in cur.fetchall()}
+    for column in stats_table_columns(cur, year):
+        if column not in existing:
+            cur.execute(f'ALTER TABLE stats_by_year ADD COLUMN "{column}"')
+    cur.execute("DELETE FROM stats_by_year WHERE year = ?", (year,))
+    cur.execute(stats_by_year_select(cur, year))
+    for event, rows in (("INSERT", ["NEW"]), ("UPDATE", ["OLD", "NEW"]), ("DELETE", ["OLD"])):
+        inserts = " ".join(f"INSERT OR IGNORE INTO stats_by_year_dirty (year, player_id) VALUES ({year}, {row}.player_id);" for row in rows)
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS stats_by_year_{year}_{event.lower()}
+            AFTER {event} ON stats_{year}
+            BEGIN {inserts} END""")
+    cur.execute("INSERT OR IGNORE INTO stats_by_year_seasons (year) VALUES (?)", (year,))
+
+def stats_by_year_state(cur):
+    # (years with a stats_$YEAR table, years with stats_by_year triggers, years loaded into stats_by_year)
+    cur.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB 'stats_[0-9][0-9][0-9][0-9]'")
+    years = {int(name[-4:]) for (name,) in cur.fetchall()}
+    cur.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name GLOB 'stats_by_year_[0-9][0-9][0-9][0-9]_insert'")
+    tracked = {int(name[14:18]) for (name,) in cur.fetchall()}
+    cur.execute("SELECT year FROM stats_by_year_seasons")
+    loaded = {row[0] for row in cur.fetchall()}
+    return years, tracked, loaded
+
+def stats_by_year_is_current(cur):
+    # True if stats_by_year exists and matches the stats_$YEAR tables: no changed rows waiting, no season table
+    # added, dropped or re-created since the last refresh
+    if not table_exists(cur, "stats_by_year_seasons"):
+        return False
+    cur.execute("SELECT EXISTS (SELECT 1 FROM stats_by_year_dirty)")
+    if cur.fetchone()[0]:
+        return False
+    years, tracked, loaded = stats_by_year_state(cur)
+    return years == tracked == loaded
+
+def refresh_stats_by_year(cur):
+    # Bring stats_by_year (one row per player and season) up to date: load the stats_$YEAR tables that are new (or
+    # were re-created and lost their triggers), drop the seasons whose table is gone, and rebuild the rows of the
+    # players that the triggers marked in stats_by_year_dirty.  Only --maintain-schema does this, so a build never
+    # writes to the DB.  Returns the number of changed players refreshed.
+    years, tracked, loaded = stats_by_year_state(cur)
+    current = tracked & loaded
+    for year in sorted(loaded - years):
+        cur.execute("DELETE FROM stats_by_year WHERE year = ?", (year,))
+        cur.execute("DELETE FROM stats_by_year_seasons WHERE year = ?", (year,))
+    for year in sorted(years - current):
+        add_stats_by_year_season(cur, year)
+    cur.execute("SELECT year, COUNT(*) FROM stats_by_year_dirty GROUP BY year")
+    dirty_counts = dict(cur.fetchall())
+    for year in sorted(set(dirty_counts) & current & years):
+        dirty = f"SELECT player_id FROM stats_by_year_dirty WHERE year = {year}"
+        cur.execute(f"DELETE FROM stats_by_year WHERE year = {year} AND player_id IN ({dirty})")
+        cur.execute(stats_by_year_select(cur, year, dirty))
+    cur.execute("DELETE FROM stats_by_year_dirty")
+    return sum(count for year, count in dirty_counts.items() if year in current & years)
+
+def stats_history_source(cur, fields):
+    # What to select player_id, year and the given stats columns of every season from: stats_by_year when it is
+    # current, otherwise a UNION ALL over the stats_$YEAR tables.  None if there are no stats tables at all.
+    if stats_by_year_is_current(cur):
+        return "stats_by_year"
+    selects = []
+    for year in detect_seasons(cur):
+        if not table_exists(cur, f"stats_{year}"):
+            continue
+        columns = stats_table_columns(cur, year)
+        values = ", ".join(f'"{field}"' if field in columns else f'NULL AS "{field}"' for field in fields)
+        selects.append(f"SELECT player_id, {year} AS year, {values} FROM stats_{year}")
+    return f"({' UNION ALL '.join(selects)})" if selects else None
+
+def nearest_season_stats(cur, year, wanted):
+    # wanted: {player_id: {field, ...}}.  For each player and field, the value from the closest other season where it
+    # isn't NULL (the earlier season wins a tie).  Returns {player_id: {field: (value, season)}}.
+    fields = sorted({field for player_fields in wanted.values() for field in player_fields})
+    source = stats_history_source(cur, fields)
+    found = {}
+    if source is None:
+        return found
+    for field in fields:
+        player_ids = [player_id for player_id, player_fields in wanted.items() if field in player_fields]
+        cur.execute(f"""
+            SELECT player_id, value, year FROM (
+                SELECT s.player_id, s."{field}" AS value, s.year,
+                       ROW_NUMBER() OVER (PARTITION BY s.player_id ORDER BY ABS(s.year - ?1), s.year) AS n
+                FROM json_each(?2) p
+                JOIN {source} s ON s.player_id = p.value
+                WHERE s.year != ?1 AND s."{field}" IS NOT NULL)
+            WHERE n = 1""", (year, json.dumps(player_ids)))
+        for player_id, value, season in cur.fetchall():
+            found.setdefault(player_id, {})[field] = (value, season)
+    return found
+
+def load_rom_export(cur, year):
+    fields = ", ".join(f'"{field}"' for field in PLAYER_RECORD_FIELDS)
+    cur.execute(f"""
+        SELECT {fields} FROM rom_export_{year}
+        WHERE slot_type = 'team'
+        ORDER BY team_stock, roster_position
+    """)
+    team_rows = cur.fetchall()
+    cur.execute(f"""
+        SELECT league, hr_roster_position, {fields} FROM rom_export_{year}
+        WHERE slot_type = 'hr_derby'
+        ORDER BY
+            CASE league WHEN 'NL' THEN 0 WHEN 'AL' THEN 1 ELSE 2 END,
+            hr_roster_position
+    """)
+    return roster_from_rows(team_rows, cur.fetchall())
+
+# Build diagnostics: message for each code, and the order levels are summarized in
+DIAGNOSTIC_MESSAGES = {
+    "null_field": "'{field}' is NULL",
+    "unknown_value": "Unknown '{field}' value",
+    "roster_position_out_of_range": "Roster position isn't between 1 and 25",
+    "no_player_row": "No 'players' row",
+    "no_stats_row": "No stats row",
+    "short_roster": "Fewer than 25 players in the roster",
+    "name_characters_dropped": "Name lost character(s) not in CHAR_MAP",
+    "name_truncated": "Last name is longer than 8 characters and was cut short",
+}
+DIAGNOSTIC_LEVELS = ("error", "warning", "note")
+DIAGNOSTIC_SUMMARY_PLAYERS = 10
+
+class Diagnostics:
+    # Collects build problems instead of printing each one as it happens.  An issue is kept once per
+    # (code, player_id, team, slot, field); seeing it again only bumps its count.  team and slot are set by the
+    # encoders before each roster slot, so the write_*_values functions only pass what they know.
+    # saved_slots holds the last build's issues for the slots --incremental doesn't re-encode (by slot key); the
+    # encoders put them back in place with restore_slot(), so the summary and report cover the whole ROM.
+    def __init__(self):
+        self.issues = {}
+        self.team = None
+        self.slot = None
+        self.saved_slots = {}
+
+    def add(self, level, code, player_id, field=None, value=None, action=None):
+        key = (code, player_id, self.team, self.slot, field)
+        issue = self.issues.get(key)
+        if issue is None:
+            self.issues[key] = {"level": level, "code": code, "player_id": player_id, "team": self.team, "slot": self.slot,
+                                "field": field, "value": value, "action": action, "count": 1}
+        else:
+            issue["count"] += 1
+
+    def warning(self, code, player_id, field=None, value=None, action=None):
+        self.add("warning", code, player_id, field, value, action)
+
+    def error(self, code, player_id, field=None, value=None, action=None):
+        self.add("error", code, player_id, field, value, action)
+
+    def note(self, code, player_id, field=None, value=None, action=None):
+        self.add("note", code, player_id, field, value, action)
+
+    def restore_slot(self, key):
+        for issue in self.saved_slots.get(key, []):
+            self.issues[(issue["code"], issue["player_id"], issue["team"], issue["slot"], issue["field"])] = dict(issue)
+
+    def slot_issues(self):
+        # {slot key: [issue]} for the issues found while encoding a roster or Home Run Derby slot
+        slots = {}
+        for issue in self.issues.values():
+            if issue["slot"] is not None:
+                key = hr_derby_slot_key(issue["slot"] - 1) if issue["team"] == "HR Derby" else team_slot_key(issue["team"], issue["slot"] - 1)
+                slots.setdefault(key, []).append(issue)
+        return slots
+
+    def count(self, level):
+        return sum(1 for issue in self.issues.values() if issue["level"] == level)
+
+    def summary(self, max_players=DIAGNOSTIC_SUMMARY_PLAYERS):
+        # One line per (level, code, field, action), errors first
+        groups = {}
+        for issue in self.issues.values():
+            groups.setdefault((issue["level"], issue["code"], issue["field"], issue["action"]), []).append(issue)
+        lines = []
+        for (level, code, field, action), issues in sorted(groups.items(), key=lambda item: (DIAGNOSTIC_LEVELS.index(item[0][0]), item[0][1], item[0][2] or "")):
+            entries = []
+            for issue in issues[:max_players]:
+                entry = issue["player_id"] or issue["team"]
+                if issue["player_id"] and issue["team"]:
+                    entry += f" ({issue['team']} #{issue['slot']})"
+                if issue["value"] is not None:
+                    entry += f" {issue['value']!r}"
+                entries.append(entry)
+            if len(issues) > max_players:
+                entries.append(f"... {len(issues) - max_players} more")
+            message = DIAGNOSTIC_MESSAGES[code].format(field=field)
+            lines.append(f"{level.upper()}: {message} ({len(issues)}){', ' + action if action else ''}: {', '.join(entries)}")
+        return lines
+
+    def print_summary(self):
+        for line in self.summary():
+            print(line)
+
+    def write_report(self, path, year, rom=None):
+        # Every issue as JSON (path ending in .json) or as rows of a 'build_diagnostics' table in a SQLite DB
+        # (any other path, can be the projects DB).  Rows from an earlier report for the same year and ROM are replaced.
+        issues = [dict(issue, year=year, rom=rom) for issue in self.issues.values()]
+        if path.lower().endswith(".json"):
+            write_file_atomic(path, json.dumps({"year": year, "rom": rom, "issues": issues}, indent=1).encode("utf-8"))
+            return
+        columns = ("year", "rom", "level", "code", "player_id", "team", "slot", "field", "value", "action", "count")
+        conn = sqlite3.connect(path, timeout=30)
+        try:
+            conn.execute(f"CREATE TABLE IF NOT EXISTS build_diagnostics ({', '.join(columns)})")
+            conn.execute("DELETE FROM build_diagnostics WHERE year = ? AND rom IS ?", (year, rom))
+            conn.executemany(f"INSERT INTO build_diagnostics VALUES ({', '.join('?' for column in columns)})",
+                             [tuple(issue[column] if column != "value" or issue[column] is None else str(issue[column]) for column in columns) for issue in issues])
+            conn.commit()
+        finally:
+            conn.close()
+
+class BuildStats:
+    # Where one build's time goes, for --stats/--stats-json/--profile: wall time per phase, per-team encode time
+    # SQL statements and time per phase, and bytes changed per team
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total_seconds = None
+        self.phases = {}
+        self.current_phase = None
+        self.team_seconds = {}
+        self.sql = {}
+        self.bytes_changed = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        previous = self.current_phase
+        self.current_phase = name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+            self.current_phase = previous
+
+    def sql_counts(self):
+        return self.sql.setdefault(self.current_phase or "other", {"statements": 0, "seconds": 0.0})
+
+    def trace(self, statement):
+        # sqlite3 trace callback, called once for every statement the connection runs
+        self.sql_counts()["statements"] += 1
+
+    def count_changed_bytes(self, base_rom_data, rom_data, layout):
+        for team_stock in TEAMS_STOCK_ORDER:
+            offset = layout["team_offsets"][team_stock]
+            self.bytes_changed[team_stock] = sum(1 for a, b in zip(base_rom_data[offset:offset+TEAM_LENGTH], rom_data[offset:offset+TEAM_LENGTH]) if a != b)
+        offset = layout["first_hr_derby_player_offset"]
+        length = HR_DERBY_BATTER_COUNT * PLAYER_LENGTH
+        self.bytes_changed["HR Derby"] = sum(1 for a, b in zip(base_rom_data[offset:offset+length], rom_data[offset:offset+length]) if a != b)
+
+    def finish(self):
+        self.total_seconds = time.perf_counter() - self.started
+
+    def to_dict(self, year, rom=None):
+        return {
+            "year": year,
+            "rom": rom,
+            "total_seconds": self.total_seconds,
+            "phases": self.phases,
+            "team_encode_seconds": self.team_seconds,
+            "sql": {
+                "statements": sum(counts["statements"] for counts in self.sql.values()),
+                "seconds": sum(counts["seconds"] for counts in self.sql.values()),
+                "by_phase": self.sql,
+            },
+            "bytes_changed": self.bytes_changed,
+        }
+
+    def report(self, year):
+        total = self.total_seconds or 1e-9
+        lines = [f"Build stats for year {year}: {self.total_seconds * 1000:.1f}ms total"]
+        for name, seconds in self.phases.items():
+            counts = self.sql.get(name)
+            sql = f", {counts['statements']} SQL statement(s) in {counts['seconds'] * 1000:.1f}ms" if counts else ""
+            lines.append(f"  {name:20s} {seconds * 1000:9.1f}ms {seconds / total:6.1%}{sql}")
+        statements = sum(counts["statements"] for counts in self.sql.values())
+        sql_seconds = sum(counts["seconds"] for counts in self.sql.values())
+        lines.append(f"  SQL: {statements} statement(s), {sql_seconds * 1000:.1f}ms in execute/fetch calls")
+        if self.team_seconds:
+            slowest = sorted(self.team_seconds.items(), key=lambda item: -item[1])[:5]
+            lines.append(f"  Slowest team encodes: {', '.join(f'{team} {seconds * 1000:.2f}ms' for team, seconds in slowest)}")
+        if self.bytes_changed:
+            lines.append(f"  Bytes changed: {sum(self.bytes_changed.values())} ({', '.join(f'{team} {count}' for team, count in self.bytes_changed.items())})")
+        return lines
+
+class TimedCursor(sqlite3.Cursor):
+    # Cursor that adds the time spent in execute and fetch calls to a BuildStats (set .stats after creating it)
+    stats = None
+
+    def timed(self, method, *args):
+        start = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self.stats.sql_counts()["seconds"] += time.perf_counter() - start
+
+    def execute(self, *args):
+        return self.timed(super().execute, *args)
+
+    def executemany(self, *args):
+        return self.timed(super().executemany, *args)
+
+    def fetchone(self):
+        return self.timed(super().fetchone)
+
+    def fetchmany(self, *args):
+        return self.timed(super().fetchmany, *args)
+
+    def fetchall(self):
+        return self.timed(super().fetchall)
+
+def stats_phase(stats, name):
+    # stats.phase(name), or nothing when the build isn't being measured
+    return stats.phase(name) if stats is not None else contextlib.nullcontext()
+
+class NameTranslation(dict):
+    # str.translate() table: any character whose upper case is in CHAR_MAP becomes that code, anything else is
+    # deleted (returns None).  Entries are filled in the first time a character is seen.
+    def __missing__(self, code_point):
+        code = CHAR_MAP.get(chr(code_point).upper())
+        value = None if code is None else chr(code)
+        self[code_point] = value
+        return value
+
+NAME_TRANSLATION = NameTranslation()
+
+@functools.lru_cache(maxsize=None)
+def encode_name(first_name, last_name):
+    # Returns (9 name bytes, characters that were dropped, whether the last name was cut to 8 characters).
+    # Cached, since the same players come up in every build and every season.
     # First initial
     initial = first_name[0].upper() if first_name else ' '
     initial_byte = CHAR_MAP.get(initial, 0x00)
+    dropped = first_name[0] if first_name and initial not in CHAR_MAP else ""
 
-    # Pad last name to at least 3 chars for safe indexing
+    # Pad last name to at least 3 chars for safe indexing, and only process the first 8 characters
     padded_last = last_name.ljust(3)
+    last = padded_last[:8]
+    if last[1] in "cC" and padded_last[2].isupper():
+        # "Mc" particle, the lowercase c has its own tile
+        encoded = last[0].translate(NAME_TRANSLATION) + chr(CHAR_MAP['c']) + last[2:].translate(NAME_TRANSLATION)
+    else:
+        encoded = last.translate(NAME_TRANSLATION)
+    dropped += "".join(ch for ch in last if NAME_TRANSLATION[ord(ch)] is None)
 
-    last_name_bytes = []
-    for i, ch in enumerate(padded_last[:8]):  # Only process first 8 characters
-        if ch == ' ':
-            code = CHAR_MAP[' ']
-        elif i == 1 and ch.lower() == 'c' and padded_last[2].isupper():
-            code = CHAR_MAP['c']
-        else:
-            code = CHAR_MAP.get(ch.upper(), None)
-        if code is not None:
-            last_name_bytes.append(code)
-        # else: skip characters not in CHAR_MAP
-
-    # Pad to 8 bytes if needed
-    while len(last_name_bytes) < 8:
-        last_name_bytes.append(CHAR_MAP[' '])
+    # Pad to 8 bytes if needed (characters not in CHAR_MAP were skipped)
+    name_bytes = bytes([initial_byte]) + encoded.encode("latin-1").ljust(8, bytes([CHAR_MAP[' ']]))[:8]
+    return name_bytes, dropped, len(last_name) > 8
 
-    return [initial_byte] + last_name_bytes[:8]
+def encode_player_name(first_name, last_name):
+    return list(encode_name(first_name, last_name)[0])
+
+def encode_player_names(players):
+    # Name bytes for every player in one go (9 zero bytes for players without a 'players' row)
+    return [encode_name(player.first_name, player.last_name)[0] if player.has_player_row else bytes(9) for player in players]
+
+def season_players(season):
+    # Every PlayerRecord in a season: team rosters, then the Home Run Derby
+    players = [player for team_stock in TEAMS_STOCK_ORDER for player in season.team_rosters.get(team_stock, [])]
+    players += [player for league, roster_position, player in season.hr_derby_players]
+    return players
+
+def name_encoding_report(players):
+    # [(player_id, first_name, last_name, dropped characters, truncated)] for every name that can't be shown exactly
+    report = []
+    seen = set()
+    for player in players:
+        if not player.has_player_row or player.player_id in seen:
+            continue
+        seen.add(player.player_id)
+        name_bytes, dropped, truncated = encode_name(player.first_name, player.last_name)
+        if dropped or truncated:
+            report.append((player.player_id, player.first_name, player.last_name, dropped, truncated))
+    return report
+
+def diagnose_name_encoding(players, diagnostics):
+    # Add every name that can't be shown exactly to diagnostics
+    diagnostics.team = diagnostics.slot = None
+    for player_id, first_name, last_name, dropped, truncated in name_encoding_report(players):
+        if dropped:
+            diagnostics.warning("name_characters_dropped", player_id, "last_name", f"{first_name} {last_name}", f"dropped {dropped!r}")
+        if truncated:
+            diagnostics.note("name_truncated", player_id, "last_name", last_name)
+
+def write_all_player_values(player_bytes, player, roster_position, diagnostics):
+    player_id = player.player_id
 
-def write_all_player_values(player_bytes, cur, player_id, year, roster_position):
     # Player Position (0x09)
-    cur.execute(f"SELECT position FROM {lineup_table} WHERE player_id = ?", (player_id,))
-    row = cur.fetchone()
-    pos = row[0] if row else None
+    pos = player.position
     if pos is not None and pos in POS_MAP:
         player_bytes[0x09] = POS_MAP[pos]
     elif pos is not None:
-        print(f"WARNING: Unknown position '{pos}' for {player_id}, skipping")
+        diagnostics.warning("unknown_value", player_id, "position", pos, "skipping")
 
     # Jersey Number (0x0A)
-    jersey_num_column = f"jersey_number_{args.year}"
-    cur.execute(f"SELECT {jersey_num_column} FROM players WHERE player_id = ?", (player_id,))
-    row = cur.fetchone()
-    jersey_num = row[0] if row else None
+    jersey_num = player.jersey_number
     if jersey_num is None:
-        print(f"WARNING: {jersey_num_column} is NULL for {player_id}, setting to #0")
+        diagnostics.warning("null_field", player_id, f"jersey_number_{player.year}", action="setting to #0")
         jersey_num = 0
     player_bytes[0x0A] = int(jersey_num) & 0xFF
 
     # Batting Handedness (0x0D)
-    cur.execute("SELECT handedness_batting FROM players WHERE player_id = ?", (player_id,))
-    row = cur.fetchone()
-    bat_hand = row[0] if row else None
+    bat_hand = player.handedness_batting
     if bat_hand is None:
-        print(f"WARNING: 'handedness_batting' is NULL for {player_id}, setting to R")
+        diagnostics.warning("null_field", player_id, "handedness_batting", action="setting to R")
         bat_hand = "R"
     if bat_hand in HAND_MAP:
         player_bytes[0x0D] = HAND_MAP[bat_hand]
     else:
-        print(f"WARNING: Unknown batting handedness '{bat_hand}' for {player_id}, skipping")
+        diagnostics.warning("unknown_value", player_id, "handedness_batting", bat_hand, "skipping")
 
     # Batting Skin Color, Batting Head (0x0E)
-    cur.execute("SELECT appearance_bat_skin, appearance_bat_head FROM players WHERE player_id = ?", (player_id,))
-    row = cur.fetchone()
-    bat_skin, bat_head = row if row else (None, None)
+    bat_skin, bat_head = player.appearance_bat_skin, player.appearance_bat_head
     if bat_skin is None:
-        print(f"WARNING: 'appearance_bat_skin' is NULL for {player_id}, skipping")
+        diagnostics.warning("null_field", player_id, "appearance_bat_skin", action="skipping")
     else:
         player_bytes[0x0E] = (player_bytes[0x0E] & 0x0F) | ((bat_skin & 0x0F) << 4)
     if bat_head is None:
-        print(f"WARNING: 'appearance_bat_head' is NULL for {player_id}, skipping")
+        diagnostics.warning("null_field", player_id, "appearance_bat_head", action="skipping")
     else:
         player_bytes[0x0E] = (player_bytes[0x0E] & 0xF0) | (bat_head & 0x0F)
 
     # Batting Hair Color, Batting Body (0x0F)
-    cur.execute("SELECT appearance_bat_hair_color, appearance_bat_body FROM players WHERE player_id = ?", (player_id,))
-    row = cur.fetchone()
-    bat_hair, bat_body = row if row else (None, None)
+    bat_hair, bat_body = player.appearance_bat_hair_color, player.appearance_bat_body
     if bat_hair is None:
-        print(f"WARNING: 'appearance_bat_hair_color' is NULL for {player_id}, skipping")
+        diagnostics.warning("null_field", player_id, "appearance_bat_hair_color", action="skipping")
     else:
         player_bytes[0x0F] = (player_bytes[0x0F] & 0x0F) | ((bat_hair & 0x0F) << 4)
     if bat_body is None:
-        print(f"WARNING: 'appearance_bat_body' is NULL for {player_id}, skipping")
+        diagnostics.warning("null_field", player_id, "appearance_bat_body", action="skipping")
     else:
         player_bytes[0x0F] = (player_bytes[0x0F] & 0xF0) | (bat_body & 0x0F)
 
     # Batting Legs Size, Batting Legs Stance (0x10)
-    cur.execute("SELECT appearance_bat_legs_size, appearance_bat_legs_stance FROM players WHERE player_id = ?", (player_id,))
-    row = cur.fetchone()
-    bat_legs_size, bat_legs_stance = row if row else (None, None)
+    bat_legs_size, bat_legs_stance = player.appearance_bat_legs_size, player.appearance_bat_legs_stance
     if bat_legs_size is None:
-        print(f"WARNING: 'appearance_bat_legs_size' is NULL for {player_id}, skipping")
+        diagnostics.warning("null_field", player_id, "appearance_bat_legs_size", action="skipping")
     else:
         player_bytes[0x10] = (player_bytes[0x10] & 0x0F) | ((bat_legs_size & 0x0F) << 4)
     if bat_legs_stance is None:
-        print(f"WARNING: 'appearance_bat_legs_stance' is NULL for {player_id}, skipping")
+        diagnostics.warning("null_field", player_id, "appearance_bat_legs_stance", action="skipping")
     else:
         player_bytes[0x10] = (player_bytes[0x10] & 0xF0) | (bat_legs_stance & 0x0F)
 
     # Unknown, Batting Arms Stance (0x11)
-    cur.execute("SELECT appearance_bat_arms_stance FROM players WHERE player_id = ?", (player_id,))
-    row = cur.fetchone()
-    bat_arms = row[0] if row else None
+    bat_arms = player.appearance_bat_arms_stance
     if bat_arms is None:
-        print(f"WARNING: 'appearance_bat_arms_stance' is NULL for {player_id}, setting to 0")
+        diagnostics.warning("null_field", player_id, "appearance_bat_arms_stance", action="setting to 0")
         bat_arms = 0
     player_bytes[0x11] = (player_bytes[0x11] & 0xF0) | (bat_arms & 0x0F)
 
@@ -215,7 +1160,7 @@ def write_all_player_values(player_bytes, cur, player_id, year, roster_position)
     elif 21 <= roster_position <= 25:
         unknown_0x19_high = 0x0  # relief pitchers
     else:
-        print(f"ERROR: Roster position isn't between 1 and 25 {player_id}")
+        diagnostics.error("roster_position_out_of_range", player_id, "roster_position", roster_position, "leaving 0x19 and 0x1D unchanged")
         unknown_0x19_high = (player_bytes[0x19] >> 4)  # leave unchanged if out of range
     player_bytes[0x19] = (player_bytes[0x19] & 0x0F) | (unknown_0x19_high << 4)
 
@@ -228,32 +1173,30 @@ def write_all_player_values(player_bytes, cur, player_id, year, roster_position)
     elif 16 <= roster_position <= 25:
         unknown_0x1d_high = 0x2  # pitchers
     else:
-        print(f"ERROR: Roster position isn't between 1 and 25 {player_id}")
         unknown_0x1d_high = (player_bytes[0x1D] >> 4)  # leave unchanged if out of range
     player_bytes[0x1D] = (player_bytes[0x1D] & 0x0F) | (unknown_0x1d_high << 4)
 
-def write_batter_values(player_bytes, player_id, year, avg, hr, rbi):
+def write_batter_values(player_bytes, player, diagnostics):
+    player_id = player.player_id
+    avg, hr, rbi = player.avg, player.hr, player.rbi
+
     # BAT Rating, POW Rating (0x0B)
-    cur.execute(f"SELECT rating_bat_bat, rating_bat_pow FROM {ratings_table} WHERE player_id = ?", (player_id,))
-    row = cur.fetchone()
-    rating_bat, rating_pow = row if row else (None, None)
+    rating_bat, rating_pow = player.rating_bat_bat, player.rating_bat_pow
     if rating_bat is None:
-        print(f"WARNING: 'rating_bat_bat' is NULL for {player_id}, setting to 1")
+        diagnostics.warning("null_field", player_id, "rating_bat_bat", action="setting to 1")
         rating_bat = 1
     if rating_pow is None:
-        print(f"WARNING: 'rating_bat_pow' is NULL for {player_id}, setting to 1")
+        diagnostics.warning("null_field", player_id, "rating_bat_pow", action="setting to 1")
         rating_pow = 1
     player_bytes[0x0B] = (rating_bat - 1 << 4) | (rating_pow - 1 & 0x0F)
 
     # SPD Rating, DEF Rating (0x0C)
-    cur.execute(f"SELECT rating_bat_spd, rating_bat_def FROM {ratings_table} WHERE player_id = ?", (player_id,))
-    row = cur.fetchone()
-    rating_spd, rating_def = row if row else (None, None)
+    rating_spd, rating_def = player.rating_bat_spd, player.rating_bat_def
     if rating_spd is None:
-        print(f"WARNING: 'rating_bat_spd' is NULL for {player_id}, setting to 1")
+        diagnostics.warning("null_field", player_id, "rating_bat_spd", action="setting to 1")
         rating_spd = 1
     if rating_def is None:
-        print(f"WARNING: 'rating_bat_def' is NULL for {player_id}, setting to 1")
+        diagnostics.warning("null_field", player_id, "rating_bat_def", action="setting to 1")
         rating_def = 1
     player_bytes[0x0C] = (rating_spd - 1 << 4) | (rating_def - 1 & 0x0F)
 
@@ -268,7 +1211,7 @@ def write_batter_values(player_bytes, player_id, year, avg, hr, rbi):
 
     # AVG: Multiply by 1000, convert to hex (0x18, 0x19)
     if avg is None:
-        print(f"WARNING: 'avg' is NULL for {player_id}, setting to .000")
+        diagnostics.warning("null_field", player_id, "avg", action="setting to .000")
         avg = 0.000
     avg_val = int(round(avg * 1000))
     avg_hex = f"{avg_val:03X}"  # always at least 3 hex digits
@@ -282,91 +1225,86 @@ def write_batter_values(player_bytes, player_id, year, avg, hr, rbi):
 
     # HR (0x1A)
     if hr is None:
-        print(f"WARNING: 'hr' is NULL for {player_id}, setting to 0")
+        diagnostics.warning("null_field", player_id, "hr", action="setting to 0")
         hr = 0
     player_bytes[0x1A] = int(hr)
 
     # RBI (0x1C)
     if rbi is None:
-        print(f"WARNING: 'rbi' is NULL for {player_id}, setting to 0")
+        diagnostics.warning("null_field", player_id, "rbi", action="setting to 0")
         rbi = 0
     player_bytes[0x1C] = int(rbi)
 
     # Unknown ("10" for all batters) (0x1D)
     player_bytes[0x1D] = 0x10
 
-def write_pitcher_values(player_bytes, player_id, year, wins, losses, sv, era):
+def write_pitcher_values(player_bytes, player, diagnostics):
+    player_id = player.player_id
+    wins, losses, sv, era = player.w, player.l, player.sv, player.era
+
     # SPD Rating, CON Rating (0x0B)
-    cur.execute(f"SELECT rating_pit_spd, rating_pit_con FROM {ratings_table} WHERE player_id = ?", (player_id,))
-    row = cur.fetchone()
-    rating_spd, rating_con = row if row else (None, None)
+    rating_spd, rating_con = player.rating_pit_spd, player.rating_pit_con
     if rating_spd is None:
-        print(f"WARNING: 'rating_pit_spd' is NULL for {player_id}, setting to 1")
+        diagnostics.warning("null_field", player_id, "rating_pit_spd", action="setting to 1")
         rating_spd = 1
     if rating_con is None:
-        print(f"WARNING: 'rating_pit_con' is NULL for {player_id}, setting to 1")
+        diagnostics.warning("null_field", player_id, "rating_pit_con", action="setting to 1")
         rating_con = 1
     player_bytes[0x0B] = (rating_spd - 1 << 4) | (rating_con - 1 & 0x0F)
 
     # Unknown (always zero), FAT rating (0x0C)
-    cur.execute(f"SELECT rating_pit_fat FROM {ratings_table} WHERE player_id = ?", (player_id,))
-    row = cur.fetchone()
-    rating_fat = row[0] if row else None
+    rating_fat = player.rating_pit_fat
     if rating_fat is None:
-        print(f"WARNING: 'rating_pit_fat' is NULL for {player_id}, setting to 1")
+        diagnostics.warning("null_field", player_id, "rating_pit_fat", action="setting to 1")
         rating_fat = 1
     player_bytes[0x0C] = (rating_fat - 1) & 0x0F
 
     # Pitching Handedness, Pitching Skin Color (0x15)
-    cur.execute("SELECT handedness_throwing, appearance_pit_skin FROM players WHERE player_id = ?", (player_id,))
-    row = cur.fetchone()
-    pit_hand, pit_skin = row if row else (None, None)
+    pit_hand, pit_skin = player.handedness_throwing, player.appearance_pit_skin
     # Only write pit_hand if it is valid
     if pit_hand is None:
-        print(f"WARNING: 'handedness_throwing' is NULL for {player_id}, setting to R")
+        diagnostics.warning("null_field", player_id, "handedness_throwing", action="setting to R")
+        pit_hand = "R"
     if pit_hand == "R":
         pit_hand_val = 0
     elif pit_hand == "L":
         pit_hand_val = 1
     else:
-        print(f"ERROR: Pitching handedness is invalid for {player_id}, skipping high nibble of 0x15")
+        diagnostics.error("unknown_value", player_id, "handedness_throwing", pit_hand, "skipping high nibble of 0x15")
         pit_hand_val = None
     if pit_hand_val is not None:
         player_bytes[0x15] = (player_bytes[0x15] & 0x0F) | ((pit_hand_val & 0x0F) << 4)
     # Only write pit_skin if not NULL
     if pit_skin is None:
-        print(f"WARNING: 'appearance_pit_skin' is NULL for {player_id}, skipping")
-    player_bytes[0x15] = (player_bytes[0x15] & 0xF0) | (pit_skin & 0x0F)
+        diagnostics.warning("null_field", player_id, "appearance_pit_skin", action="skipping")
+    else:
+        player_bytes[0x15] = (player_bytes[0x15] & 0xF0) | (pit_skin & 0x0F)
 
     # Pitching Head, Pitching Hair Color (0x16)
-    cur.execute("SELECT appearance_pit_head, appearance_pit_hair_color FROM players WHERE player_id = ?", (player_id,))
-    row = cur.fetchone()
-    pit_head, pit_hair_color = row if row else (None, None)
+    pit_head, pit_hair_color = player.appearance_pit_head, player.appearance_pit_hair_color
     if pit_head is None:
-        print(f"WARNING: 'appearance_pit_head' is NULL for {player_id}, skipping")
+        diagnostics.warning("null_field", player_id, "appearance_pit_head", action="skipping")
     else:
         player_bytes[0x16] = (player_bytes[0x16] & 0x0F) | ((pit_head & 0x0F) << 4)
     if pit_hair_color is None:
-        print(f"WARNING: 'appearance_pit_hair_color' is NULL for {player_id}, skipping")
+        diagnostics.warning("null_field", player_id, "appearance_pit_hair_color", action="skipping")
     else:
         player_bytes[0x16] = (player_bytes[0x16] & 0xF0) | (pit_hair_color & 0x0F)
 
     # Pitching Body, Pitch Throwing Style (0x17)
-    cur.execute("SELECT appearance_pit_body, throwing_style FROM players WHERE player_id = ?", (player_id,))
-    row = cur.fetchone()
-    pit_body, throwing_style = row if row else (None, None)
+    pit_body, throwing_style = player.appearance_pit_body, player.throwing_style
     if pit_body is None:
-        print(f"WARNING: 'appearance_pit_body' is NULL for {player_id}, skipping")
+        diagnostics.warning("null_field", player_id, "appearance_pit_body", action="skipping")
     else:
         player_bytes[0x17] = (player_bytes[0x17] & 0x0F) | ((pit_body & 0x0F) << 4)
     if throwing_style is None:
-        print(f"WARNING: 'throwing_style' is NULL for {player_id}, setting to 0")
+        diagnostics.warning("null_field", player_id, "throwing_style", action="setting to 0")
         throwing_style = 0
     player_bytes[0x17] = (player_bytes[0x17] & 0xF0) | (throwing_style & 0x0F)
 
     # W (0x18)
     if wins is None:
-        print(f"WARNING: 'wins' is NULL for {player_id}, setting to 0")
+        diagnostics.warning("null_field", player_id, "w", action="setting to 0")
         wins = 0
     player_bytes[0x18] = int(wins)
 
@@ -375,7 +1313,7 @@ def write_pitcher_values(player_bytes, player_id, year, wins, losses, sv, era):
 
     # L (0x1A)
     if losses is None:
-        print(f"WARNING: 'losses' is NULL for {player_id}, setting to 0")
+        diagnostics.warning("null_field", player_id, "l", action="setting to 0")
         losses = 0
     player_bytes[0x1A] = int(losses)
 
@@ -384,13 +1322,13 @@ def write_pitcher_values(player_bytes, player_id, year, wins, losses, sv, era):
 
     # SV (0x1E)
     if sv is None:
-        print(f"WARNING: 'sv' is NULL for {player_id}, setting to 0")
+        diagnostics.warning("null_field", player_id, "sv", action="setting to 0")
         sv = 0
     player_bytes[0x1E] = int(sv)
 
     # ERA (0x1C, 0x1D)
     if era is None:
-        print(f"WARNING: 'era' is NULL for {player_id}, setting to 0.00")
+        diagnostics.warning("null_field", player_id, "era", action="setting to 0.00")
         era = 0.00
     era_val = int(round(era * 100))
     era_hex = f"{era_val:03X}"
@@ -401,199 +1339,1054 @@ def write_pitcher_values(player_bytes, player_id, year, wins, losses, sv, era):
     # 0x1D: preserve upper nibble, set lower nibble to hundreds
     player_bytes[0x1D] = (player_bytes[0x1D] & 0xF0) | (hundreds & 0x0F)
 
-def verify_team_lineups(cur, year):
-    # Get all teams and their league
-    cur.execute(f"SELECT DISTINCT team_{year}, league FROM team_lineups_{year}")
-    teams = cur.fetchall()
-    errors = []
-
-    for team_id, league in teams:
-        # Get first n lineup positions for this team
-        n = 9 if league == "AL" else 8
-        pos_map = POS_MAP_AL if league == "AL" else POS_MAP_NL
-        cur.execute(
-            f"""SELECT position
-                FROM team_lineups_{year}
-                WHERE team_{year} = ? AND roster_position BETWEEN 1 AND ?
-                ORDER BY roster_position""",
-            (team_id, n)
-        )
-        positions = [row[0] for row in cur.fetchall()]
-        # Check for missing or duplicate positions
-        missing = set(pos_map) - set(positions)
-        extra = [p for p in positions if positions.count(p) > 1]
-        if missing or extra or len(positions) != n:
-            errors.append({
-                "team": team_id,
-                "league": league,
-                "missing": missing,
-                "extra": set([p for p in positions if positions.count(p) > 1]),
-                "positions": positions
-            })
-
-    if errors:
-        for err in errors:
-            print(f"Lineup error for team {err['team']} ({err['league']}):")
-            if err["missing"]:
-                print(f"  Missing: {', '.join(err['missing'])}")
-            if err["extra"]:
-                print(f"  Duplicate(s): {', '.join(err['extra'])}")
-            print(f"  Positions found: {err['positions']}")
-        raise Exception("Lineup verification failed! See errors above.")
-
-def main():
-    # Open and read ROM
-    with open(args.romfile, "rb") as f:
-        rom_data = bytearray(f.read())
-
-    # Verify that every team has all of the required positions
-    verify_team_lineups(cur, args.year)
-
-    # Find first team offset
-    first_team_offset = find_first_team_offset(rom_data)
-
-    # Populate TEAM_OFFSETS
-    TEAM_OFFSETS = {}
-    for idx, team_stock in enumerate(TEAMS_STOCK_ORDER):
-        if idx <= 13:  # AL
-            offset = first_team_offset + idx * TEAM_LENGTH
-        else:  # NL
-            offset = first_team_offset + 14 * TEAM_LENGTH + AL_TO_NL_GAP + (idx - 14) * TEAM_LENGTH
-        TEAM_OFFSETS[team_stock] = offset
+# Player record layout (0x20 bytes), used to decode a ROM's player table with NumPy
+PLAYER_RECORD_DTYPE = [
+    ("name",               "u1", 9),  # 0x00-0x08: first initial + 8 last name characters
+    ("position",           "u1"),     # 0x09
+    ("jersey_number",      "u1"),     # 0x0A
+    ("ratings_0b",         "u1"),     # 0x0B: BAT/POW (batters), SPD/CON (pitchers)
+    ("ratings_0c",         "u1"),     # 0x0C: SPD/DEF (batters), FAT (pitchers)
+    ("handedness_batting", "u1"),     # 0x0D
+    ("bat_skin_head",      "u1"),     # 0x0E
+    ("bat_hair_body",      "u1"),     # 0x0F
+    ("bat_legs",           "u1"),     # 0x10
+    ("bat_arms",           "u1"),     # 0x11
+    ("unknown_12",         "u1", 3),  # 0x12-0x14
+    ("pit_hand_skin",      "u1"),     # 0x15
+    ("pit_head_hair",      "u1"),     # 0x16
+    ("pit_body_style",     "u1"),     # 0x17
+    ("stat_18",            "u1"),     # 0x18: AVG tens/ones (batters), W (pitchers)
+    ("stat_19",            "u1"),     # 0x19: unknown high nibble, AVG hundreds (batters)
+    ("stat_1a",            "u1"),     # 0x1A: HR (batters), L (pitchers)
+    ("unknown_1b",         "u1"),     # 0x1B
+    ("stat_1c",            "u1"),     # 0x1C: RBI (batters), ERA tens/ones (pitchers)
+    ("stat_1d",            "u1"),     # 0x1D: unknown high nibble, ERA hundreds (pitchers)
+    ("stat_1e",            "u1"),     # 0x1E: SV (pitchers)
+    ("unknown_1f",         "u1"),     # 0x1F
+]
 
+def require_numpy():
+    if np is None:
+        raise Exception("ERROR: NumPy is required for ROM decoding (pip install numpy)")
+
+def read_player_records(rom_data, slot_offsets):
+    # Gather the 32-byte records at slot_offsets into a structured array (one row per slot)
+    require_numpy()
+    rom_array = np.frombuffer(rom_data, dtype=np.uint8)
+    raw = rom_array[slot_offsets[:, None] + np.arange(PLAYER_LENGTH)]
+    return np.ascontiguousarray(raw).view(np.dtype(PLAYER_RECORD_DTYPE)).reshape(-1)
+
+def decode_player_records(records, is_batter):
+    # Inverse of write_all_player_values/write_*_values: turn a structured array of ROM records back into columns.
+    # Batter columns are only meaningful where is_batter is True, pitcher columns where it is False.
+    require_numpy()
+    r = records
+    hi = lambda column: (column >> 4).astype(np.int64)
+    lo = lambda column: (column & 0x0F).astype(np.int64)
+    is_batter = np.asarray(is_batter, dtype=bool)
+    columns = {
+        "name": r["name"].copy(),
+        "position": r["position"].astype(np.int64),
+        "jersey_number": r["jersey_number"].astype(np.int64),
+        "handedness_batting": r["handedness_batting"].astype(np.int64),
+        "appearance_bat_skin": hi(r["bat_skin_head"]),
+        "appearance_bat_head": lo(r["bat_skin_head"]),
+        "appearance_bat_hair_color": hi(r["bat_hair_body"]),
+        "appearance_bat_body": lo(r["bat_hair_body"]),
+        "appearance_bat_legs_size": hi(r["bat_legs"]),
+        "appearance_bat_legs_stance": lo(r["bat_legs"]),
+        "appearance_bat_arms_stance": lo(r["bat_arms"]),
+        "unknown_0x19_high": hi(r["stat_19"]),
+        "unknown_0x1d_high": hi(r["stat_1d"]),
+        # Batters
+        "rating_bat_bat": hi(r["ratings_0b"]) + 1,
+        "rating_bat_pow": lo(r["ratings_0b"]) + 1,
+        "rating_bat_spd": hi(r["ratings_0c"]) + 1,
+        "rating_bat_def": lo(r["ratings_0c"]) + 1,
+        "avg": ((lo(r["stat_19"]) << 8) | r["stat_18"]) / 1000.0,
+        "hr": r["stat_1a"].astype(np.int64),
+        "rbi": r["stat_1c"].astype(np.int64),
+        # Pitchers
+        "rating_pit_spd": hi(r["ratings_0b"]) + 1,
+        "rating_pit_con": lo(r["ratings_0b"]) + 1,
+        "rating_pit_fat": lo(r["ratings_0c"]) + 1,
+        "handedness_throwing": hi(r["pit_hand_skin"]),
+        "appearance_pit_skin": lo(r["pit_hand_skin"]),
+        "appearance_pit_head": hi(r["pit_head_hair"]),
+        "appearance_pit_hair_color": lo(r["pit_head_hair"]),
+        "appearance_pit_body": hi(r["pit_body_style"]),
+        "throwing_style": lo(r["pit_body_style"]),
+        "w": r["stat_18"].astype(np.int64),
+        "l": r["stat_1a"].astype(np.int64),
+        "sv": r["stat_1e"].astype(np.int64),
+        "era": ((lo(r["stat_1d"]) << 8) | r["stat_1c"]) / 100.0,
+        "is_batter": is_batter,
+    }
+    return columns
+
+# Columns of decode_rom_players() rows.  Batting stats/ratings are NULL for pitchers and pitching ones for batters.
+ROM_PLAYER_FIELDS = (
+    "slot_type", "team_stock", "slot", "first_initial", "last_name", "position", "jersey_number", "handedness_batting",
+    "appearance_bat_skin", "appearance_bat_head", "appearance_bat_hair_color", "appearance_bat_body",
+    "appearance_bat_legs_size", "appearance_bat_legs_stance", "appearance_bat_arms_stance",
+    "rating_bat_bat", "rating_bat_pow", "rating_bat_spd", "rating_bat_def", "avg", "hr", "rbi",
+    "handedness_throwing", "appearance_pit_skin", "appearance_pit_head", "appearance_pit_hair_color",
+    "appearance_pit_body", "throwing_style", "rating_pit_spd", "rating_pit_con", "rating_pit_fat", "w", "l", "sv", "era",
+    "unknown_0x19_high", "unknown_0x1d_high",
+)
+ROM_BATTER_FIELDS = ("rating_bat_bat", "rating_bat_pow", "rating_bat_spd", "rating_bat_def", "avg", "hr", "rbi")
+ROM_PITCHER_FIELDS = (
+    "handedness_throwing", "appearance_pit_skin", "appearance_pit_head", "appearance_pit_hair_color",
+    "appearance_pit_body", "throwing_style", "rating_pit_spd", "rating_pit_con", "rating_pit_fat", "w", "l", "sv", "era",
+)
+
+def decode_name(name_bytes):
+    # 9 name bytes -> (first initial, last name).  Codes that aren't in CHAR_MAP come back as "?".
+    chars = "".join(CHAR_MAP_INVERSE.get(code, "?") for code in name_bytes)
+    return chars[0].strip(), chars[1:].rstrip()
+
+def rom_player_slots(layout):
+    # [(slot_type, team_stock, slot, ROM offset, is_batter)] for every roster and Home Run Derby slot, in ROM order
+    slots = []
     for team_stock in TEAMS_STOCK_ORDER:
-        team_offset = TEAM_OFFSETS[team_stock]
-
-        # Get player_ids for this team
-        cur.execute(f"""
-            SELECT player_id
-            FROM {lineup_table}
-            WHERE team_stock = ?
-            ORDER BY roster_position ASC
-            LIMIT 25
-        """, (team_stock,))
-        player_ids = [row[0] for row in cur.fetchall()]
-        if len(player_ids) < 25:
-            print(f"Warning: Only found {len(player_ids)} players for {team}")
-
-        for idx, player_id in enumerate(player_ids):
+        for idx in range(25):
+            slots.append(("team", team_stock, idx + 1, layout["team_offsets"][team_stock] + idx * PLAYER_LENGTH, idx < 15))
+    for idx in range(HR_DERBY_BATTER_COUNT):
+        slots.append(("hr_derby", None, idx + 1, layout["first_hr_derby_player_offset"] + idx * PLAYER_LENGTH, True))
+    return slots
+
+def decode_rom_players(rom_data, layout):
+    # Decode every roster and Home Run Derby record into a row of ROM_PLAYER_FIELDS values
+    require_numpy()
+    slots = rom_player_slots(layout)
+    slot_offsets = np.array([slot[3] for slot in slots], dtype=np.int64)
+    is_batter = np.array([slot[4] for slot in slots], dtype=bool)
+    columns = decode_player_records(read_player_records(rom_data, slot_offsets), is_batter)
+    columns["avg"] = np.round(columns["avg"], 3)
+    columns["era"] = np.round(columns["era"], 2)
+    values = {field: columns[field].tolist() for field in ROM_PLAYER_FIELDS if field in columns}
+
+    rows = []
+    for i, (slot_type, team_stock, slot, offset, batter) in enumerate(slots):
+        first_initial, last_name = decode_name(bytes(columns["name"][i]))
+        position = values["position"][i]
+        handedness_batting = values["handedness_batting"][i]
+        row = {
+            "slot_type": slot_type,
+            "team_stock": team_stock,
+            "slot": slot,
+            "first_initial": first_initial,
+            "last_name": last_name,
+            "position": POS_MAP_INVERSE.get(position, f"0x{position:02X}"),
+            "handedness_batting": HAND_MAP_INVERSE.get(handedness_batting, f"0x{handedness_batting:02X}"),
+        }
+        for field in ROM_PLAYER_FIELDS:
+            if field not in row:
+                row[field] = values[field][i]
+        hidden = ROM_PITCHER_FIELDS if batter else ROM_BATTER_FIELDS
+        for field in hidden:
+            row[field] = None
+        if not batter:
+            row["handedness_throwing"] = {0: "R", 1: "L"}.get(row["handedness_throwing"], row["handedness_throwing"])
+        rows.append(tuple(row[field] for field in ROM_PLAYER_FIELDS))
+    return rows
+
+def verify_rom(rom_data, layout, season):
+    # Field-by-field differences between a built ROM and what the season would encode into it:
+    # [(slot_type, team_stock, slot, player_id, field, ROM value, DB value)].
+    # The DB side is the ROM re-encoded from the season, so NULL defaults, name truncation and rounding count as matches.
+    expected = bytearray(rom_data)
+    encode_season(expected, layout, season)
+
+    player_ids = {}
+    for team_stock, players in season.team_rosters.items():
+        for idx, player in enumerate(players[:25]):
+            player_ids[("team", team_stock, idx + 1)] = player.player_id
+    for idx, (league, roster_position, player) in enumerate(season.hr_derby_players[:HR_DERBY_BATTER_COUNT]):
+        player_ids[("hr_derby", None, idx + 1)] = player.player_id
+
+    differences = []
+    for actual_row, expected_row in zip(decode_rom_players(rom_data, layout), decode_rom_players(expected, layout)):
+        if actual_row == expected_row:
+            continue
+        key = actual_row[:3]
+        for field, actual, wanted in zip(ROM_PLAYER_FIELDS[3:], actual_row[3:], expected_row[3:]):
+            if actual != wanted:
+                differences.append(key + (player_ids.get(key), field, actual, wanted))
+    return differences
+
+def diagnose_missing_rows(player, diagnostics):
+    # True if the player has the rows a slot needs; otherwise the slot is left as is and the reason is recorded
+    if not player.has_player_row:
+        diagnostics.warning("no_player_row", player.player_id, action="slot left as is")
+        return False
+    if not player.has_stats_row:
+        diagnostics.warning("no_stats_row", player.player_id, action="slot left as is")
+        return False
+    return True
+
+def encode_teams(rom_data, team_offsets, team_rosters, diagnostics, dirty=None, stats=None):
+    # Encode every team's roster slots one player at a time (only the slot keys in dirty, if given).
+    # With a BuildStats, the time spent on each team is recorded in stats.team_seconds.
+    for team_stock in TEAMS_STOCK_ORDER:
+        team_started = time.perf_counter()
+        team_offset = team_offsets[team_stock]
+
+        # Get players for this team
+        players = team_rosters.get(team_stock, [])[:25]
+        if len(players) < 25:
+            diagnostics.team, diagnostics.slot = team_stock, None
+            diagnostics.warning("short_roster", None, value=len(players))
+
+        for idx, player in enumerate(players):
+            if dirty is not None and team_slot_key(team_stock, idx) not in dirty:
+                diagnostics.restore_slot(team_slot_key(team_stock, idx))
+                continue
+            diagnostics.team, diagnostics.slot = team_stock, idx + 1
+            if not diagnose_missing_rows(player, diagnostics):
+                continue
             player_offset = team_offset + idx * PLAYER_LENGTH
             player_bytes = rom_data[player_offset:player_offset+PLAYER_LENGTH]
 
             # Set player names
-            cur.execute("""
-                SELECT first_name, last_name
-                FROM players
-                WHERE player_id = ?
-            """, (player_id,))
-            name_row = cur.fetchone()
-            if name_row:
-                first_name, last_name = name_row
-                name_bytes = encode_player_name(first_name, last_name)
-                player_bytes[0x00] = name_bytes[0]
-                player_bytes[0x01:0x09] = name_bytes[1:9]
-            else:
-                print(f"Warning: No name found for player_id={player_id}")
-
-            # Get roster position and set unknown bytes
-            cur.execute(f"SELECT roster_position FROM {lineup_table} WHERE player_id = ?", (player_id,))
-            roster_position = cur.fetchone()[0]
+            player_bytes[0x00:0x09] = encode_name(player.first_name, player.last_name)[0]
 
             # Set values common to all players
-            write_all_player_values(player_bytes, cur, player_id, args.year, roster_position)
+            write_all_player_values(player_bytes, player, player.roster_position, diagnostics)
 
             if idx < 15:
                 # Batters
-                cur.execute(f"""
-                    SELECT pl.handedness_batting, st.avg, st.hr, st.rbi
-                    FROM players pl
-                    JOIN {stats_table} st ON st.player_id = pl.player_id
-                    WHERE pl.player_id = ?
-                """, (player_id,))
-                row = cur.fetchone()
-                if not row:
-                    print(f"Warning: No player data for player_id={player_id} ({team} batter #{idx+1})")
-                    continue
-                bat_hand, avg, hr, rbi = row
-                write_batter_values(player_bytes, player_id, args.year, avg, hr, rbi)
+                write_batter_values(player_bytes, player, diagnostics)
             else:
                 # Pitchers
-                cur.execute(f"""
-                    SELECT st.w, st.l, st.sv, st.era
-                    FROM players pl
-                    JOIN {stats_table} st ON st.player_id = pl.player_id
-                    WHERE pl.player_id = ?
-                """, (player_id,))
-                row = cur.fetchone()
-                if not row:
-                    print(f"Warning: No pitcher data for player_id={player_id} ({team} pitcher #{idx-14})")
-                    continue
-                wins, losses, sv, era = row
-                write_pitcher_values(player_bytes, player_id, args.year, wins, losses, sv, era)
+                write_pitcher_values(player_bytes, player, diagnostics)
 
             # Write back to ROM
             rom_data[player_offset:player_offset+PLAYER_LENGTH] = player_bytes
 
-    # Find the first home run derby player offset
-    first_hr_derby_player_offset = find_first_hr_derby_player_offset(rom_data)
-
-    # Get the home run derby players from the database
-    cur.execute(f"""
-        SELECT league, roster_position, player_id
-        FROM {hr_derby_table}
-        ORDER BY
-            CASE league WHEN 'NL' THEN 0 WHEN 'AL' THEN 1 ELSE 2 END,
-            roster_position
-    """)
-    hr_derby_players = cur.fetchall()
-    if len(hr_derby_players) != HR_DERBY_BATTER_COUNT:
-        raise Exception(f"Expected {HR_DERBY_BATTER_COUNT} HR Derby batters, found {len(hr_derby_players)}")
-
-    # Write the home run derby players
-    for i, (league, roster_position, player_id) in enumerate(hr_derby_players):
-        player_bytes = bytearray(PLAYER_LENGTH)
-        write_all_player_values(player_bytes, cur, player_id, args.year, roster_position)
-
-        cur.execute("""
-            SELECT first_name, last_name
-            FROM players
-            WHERE player_id = ?
-        """, (player_id,))
-        name_row = cur.fetchone()
-        if name_row:
-            first_name, last_name = name_row
-            name_bytes = encode_player_name(first_name, last_name)
-            player_bytes[0x00] = name_bytes[0]
-            player_bytes[0x01:0x09] = name_bytes[1:9]
-        else:
-            print(f"Warning: No name found for player_id={player_id}")
+        if stats is not None:
+            stats.team_seconds[team_stock] = time.perf_counter() - team_started
 
-        cur.execute(f"""
-            SELECT pl.handedness_batting, st.avg, st.hr, st.rbi
-            FROM players pl
-            JOIN {stats_table} st ON st.player_id = pl.player_id
-            WHERE pl.player_id = ?
-        """, (player_id,))
-        row = cur.fetchone()
-        if not row:
-            print(f"Warning: No player data for player_id={player_id} ({team} batter #{idx+1})")
+def encode_hr_derby_players(rom_data, first_hr_derby_player_offset, hr_derby_players, diagnostics, dirty=None):
+    # Encode the Home Run Derby batters (only the slot keys in dirty, if given)
+    for i, (league, roster_position, player) in enumerate(hr_derby_players):
+        if dirty is not None and hr_derby_slot_key(i) not in dirty:
+            diagnostics.restore_slot(hr_derby_slot_key(i))
             continue
-        bat_hand, avg, hr, rbi = row
-        write_batter_values(player_bytes, player_id, args.year, avg, hr, rbi)
+        diagnostics.team, diagnostics.slot = "HR Derby", i + 1
+        if not diagnose_missing_rows(player, diagnostics):
+            continue
+        player_bytes = bytearray(PLAYER_LENGTH)
+        write_all_player_values(player_bytes, player, roster_position, diagnostics)
+        player_bytes[0x00:0x09] = encode_name(player.first_name, player.last_name)[0]
+        write_batter_values(player_bytes, player, diagnostics)
 
         # Write back to ROM
         offset = first_hr_derby_player_offset + i * PLAYER_LENGTH
         rom_data[offset:offset+PLAYER_LENGTH] = player_bytes
 
-    # Write the home run derby full names
+def season_tables(year):
+    return [f"team_lineups_{year}", f"home_run_derby_lineups_{year}", f"ratings_{year}", f"stats_{year}"]
+
+def validate_seasons(cur, years):
+    # Check every lineup rule for every season with two aggregate queries, and report every problem instead of
+    # stopping at the first one.  Returns {year: [{"level": "error" | "warning", "team": ..., "message": ...}]}.
+    # Errors stop a build; warnings (missing players/ratings/stats rows) only mean those slots fall back to defaults
+    # or are skipped, like they always have.
+    violations = {year: [] for year in years}
+    cur.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view')")
+    existing = {row[0] for row in cur.fetchall()}
+    checked_years = []
+    for year in years:
+        missing_tables = [table for table in season_tables(year) if table not in existing]
+        for table in missing_tables:
+            violations[year].append({"level": "error", "team": None, "message": f"Table {table} does not exist"})
+        if not missing_tables:
+            checked_years.append(year)
+    if not checked_years:
+        return violations
+
+    # One row per (year, team) with its size, starting lineup and any players without players/ratings/stats rows
+    cur.execute(" UNION ALL ".join(f"""
+        SELECT {int(year)}, tl.team_stock, MIN(tl.team_{year}), MIN(tl.league), COUNT(*),
+            group_concat(CASE WHEN tl.roster_position BETWEEN 1 AND (CASE tl.league WHEN 'AL' THEN 9 ELSE 8 END) THEN tl.position END, ','),
+            group_concat(CASE WHEN pl.player_id IS NULL THEN tl.player_id END, ','),
+            group_concat(CASE WHEN rt.player_id IS NULL THEN tl.player_id END, ','),
+            group_concat(CASE WHEN st.player_id IS NULL THEN tl.player_id END, ',')
+        FROM team_lineups_{year} tl
+        LEFT JOIN players pl ON pl.player_id = tl.player_id
+        LEFT JOIN ratings_{year} rt ON rt.player_id = tl.player_id
+        LEFT JOIN (SELECT DISTINCT player_id FROM stats_{year}) st ON st.player_id = tl.player_id
+        GROUP BY tl.team_stock""" for year in checked_years))
+    team_rows = cur.fetchall()
+
+    # One row per year for the Home Run Derby
+    cur.execute(" UNION ALL ".join(f"""
+        SELECT {int(year)}, COUNT(*),
+            group_concat(CASE WHEN pl.player_id IS NULL THEN hd.player_id END, ','),
+            group_concat(CASE WHEN rt.player_id IS NULL THEN hd.player_id END, ','),
+            group_concat(CASE WHEN st.player_id IS NULL THEN hd.player_id END, ',')
+        FROM home_run_derby_lineups_{year} hd
+        LEFT JOIN players pl ON pl.player_id = hd.player_id
+        LEFT JOIN ratings_{year} rt ON rt.player_id = hd.player_id
+        LEFT JOIN (SELECT DISTINCT player_id FROM stats_{year}) st ON st.player_id = hd.player_id""" for year in checked_years))
+    hr_derby_rows = cur.fetchall()
+
+    def report(year, level, team, message):
+        violations[year].append({"level": level, "team": team, "message": message})
+
+    def report_missing_rows(year, team, no_player, no_ratings, no_stats):
+        if no_player:
+            report(year, "warning", team, f"No 'players' row for {no_player.replace(',', ', ')}")
+        if no_ratings:
+            report(year, "warning", team, f"No 'ratings_{year}' row for {no_ratings.replace(',', ', ')}")
+        if no_stats:
+            report(year, "warning", team, f"No 'stats_{year}' row for {no_stats.replace(',', ', ')}")
+
+    row_counts = {year: 0 for year in checked_years}
+    teams_found = {year: set() for year in checked_years}
+    for year, team_stock, team, league, count, starters, no_player, no_ratings, no_stats in team_rows:
+        row_counts[year] += count
+        teams_found[year].add(team_stock)
+        label = team_stock if team == team_stock else f"{team_stock} ({team})"
+        if team_stock not in TEAMS_STOCK_ORDER:
+            report(year, "error", label, f"'{team_stock}' is not one of the stock teams")
+        if count != 25:
+            report(year, "error", label, f"Has {count} players in team_lineups_{year} (should be 25)")
+
+        # Every starting position exactly once (DH only in the AL)
+        n = 9 if league == "AL" else 8
+        pos_map = POS_MAP_AL if league == "AL" else POS_MAP_NL
+        positions = starters.split(",") if starters else []
+        seen = set()
+        duplicates = set()
+        for position in positions:
+            if position in seen:
+                duplicates.add(position)
+            seen.add(position)
+        missing = pos_map - seen
+        if missing or duplicates or len(positions) != n:
+            message = f"{league} starting lineup (roster positions 1-{n}) is {', '.join(positions) or 'empty'}"
+            if missing:
+                message += f"; missing: {', '.join(sorted(missing))}"
+            if duplicates:
+                message += f"; duplicate(s): {', '.join(sorted(duplicates))}"
+            report(year, "error", label, message)
+
+        report_missing_rows(year, label, no_player, no_ratings, no_stats)
+
+    for year in checked_years:
+        if row_counts[year] != 700:
+            report(year, "error", None, f"team_lineups_{year} has {row_counts[year]} rows.  It should have exactly 700 rows (28 teams, each with 25 players)")
+        for team_stock in TEAMS_STOCK_ORDER:
+            if team_stock not in teams_found[year]:
+                report(year, "error", team_stock, f"Has no players in team_lineups_{year}")
+
+    for year, count, no_player, no_ratings, no_stats in hr_derby_rows:
+        if count != HR_DERBY_BATTER_COUNT:
+            report(year, "error", "HR Derby", f"Expected {HR_DERBY_BATTER_COUNT} HR Derby batters, found {count}")
+        report_missing_rows(year, "HR Derby", no_player, no_ratings, no_stats)
+
+    return violations
+
+def print_violations(year, violations):
+    for violation in violations:
+        team = f"{violation['team']}: " if violation["team"] else ""
+        print(f"{violation['level'].upper()}: {year} {team}{violation['message']}")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Update Ken Griffey Jr. Presents Major League Baseball SNES ROM with stats from a SQLite DB.  Created by johnz1.")
+    parser.add_argument("romfile", nargs="*", help="Ken Griffey Jr. Presents Major League Baseball SNES ROM file(s) to update (will be overwritten unless --out, --ips or --bps is given!)")
+    parser.add_argument("--out", help="Write the modified ROM here instead of overwriting romfile ({year} and {rom} are replaced with the year and the ROM file name)")
+    parser.add_argument("--ips", help="Write an IPS patch against romfile here ({year} and {rom} are replaced with the year and the ROM file name)")
+    parser.add_argument("--bps", help="Write a BPS patch against romfile here ({year} and {rom} are replaced with the year and the ROM file name)")
+    parser.add_argument("--in-place", action="store_true", help="Patch the changed player records directly in the output ROM (journaled) instead of writing a new copy and renaming it")
+    parser.add_argument("--db", help=f"Path to the SQLite database (default: {DEFAULT_DB_PATH})", default=DEFAULT_DB_PATH)
+    parser.add_argument("--year", type=int, nargs="+", help="Year(s) of stats to use (more than one year needs --out/--ips/--bps paths with {year} in them)")
+    parser.add_argument("--incremental", action="store_true", help="Only re-encode player slots whose DB rows changed since the last build (tracked in <output ROM>.manifest.json)")
+    parser.add_argument("--layout-cache", help=f"JSON file caching the detected ROM layout by ROM hash (default: {DEFAULT_LAYOUT_CACHE_PATH})", default=DEFAULT_LAYOUT_CACHE_PATH)
+    parser.add_argument("--no-layout-cache", action="store_true", help="Always scan the ROM for the team and Home Run Derby markers")
+    parser.add_argument("--validate-only", action="store_true", help="Only check the lineups of every --year (in one pass) and report every problem found, no ROM needed")
+    parser.add_argument("--maintain-schema", action="store_true", help="Add missing indexes and build/refresh the rom_export_$YEAR tables for every --year (or every season in the DB if --year isn't given), no ROM needed")
+    parser.add_argument("--report", help="Also write every build warning to this file: JSON if it ends in .json, otherwise a 'build_diagnostics' table in that SQLite DB (can be the projects DB).  Use {year}/{rom} like --out")
+    parser.add_argument("--stats", action="store_true", help="Print where the build's time went: wall time per phase and per team, SQL statements and time, and bytes changed per team")
+    parser.add_argument("--stats-json", help="Write the --stats numbers to this JSON file ({year}/{rom} like --out)")
+    parser.add_argument("--profile", help="Run the build under cProfile and dump the stats to this file for python -m pstats ({year}/{rom} like --out)")
+    parser.add_argument("--watch", action="store_true", help="Build, then keep running and rebuild the changed player slots every time the DB changes (one ROM and one --year)")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_WATCH_POLL_INTERVAL, help=f"With --watch, seconds between checks for DB changes (default: {DEFAULT_WATCH_POLL_INTERVAL})")
+    parser.add_argument("--debounce", type=float, default=DEFAULT_WATCH_DEBOUNCE, help=f"With --watch, seconds the DB has to stay unchanged before rebuilding (default: {DEFAULT_WATCH_DEBOUNCE})")
+    parser.add_argument("--export-snapshot", help="Write a validated, memory-mappable snapshot of every --year to this file ({year} is replaced with the year), no ROM needed")
+    parser.add_argument("--snapshot", help="Build from the snapshot(s) written by --export-snapshot ({year} like --out) instead of the DB.  --db is then optional; if it's given, a stale snapshot is an error")
+    parser.add_argument("--fill-stats", action="store_true", help="Fill NULL avg (batters) and era (pitchers) from the player's nearest other season instead of writing .000/0.00 (uses the stats_by_year table from --maintain-schema if it's there)")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of worker processes for building several years and/or ROMs (default: 1)")
+    args = parser.parse_args(argv)
+    if not args.db and not (args.snapshot and not args.maintain_schema and not args.export_snapshot):
+        parser.error("--db is required (or set DEFAULT_DB_PATH at the top of the script)")
+    if not args.romfile and not (args.validate_only or args.maintain_schema or args.export_snapshot):
+        parser.error("a ROM file is required unless --validate-only, --maintain-schema or --export-snapshot is given")
+    if not args.year and not args.maintain_schema:
+        parser.error("--year is required")
+    if args.watch and (len(args.romfile) != 1 or len(args.year) != 1 or args.validate_only or args.maintain_schema):
+        parser.error("--watch needs exactly one ROM file and one --year")
+    if args.watch and args.snapshot:
+        parser.error("--watch rebuilds from the DB, it can't be used with --snapshot")
+    if args.fill_stats and not args.db:
+        parser.error("--fill-stats needs --db")
+    if args.year and len(args.year) > 1 and any("{year}" not in path for path in (args.snapshot, args.export_snapshot) if path):
+        parser.error("--snapshot and --export-snapshot paths need {year} in them for more than one --year")
+    return args
+
+def connect_db(db):
+    # Accept an open sqlite3 connection or a path; returns (connection, whether we opened it)
+    if isinstance(db, sqlite3.Connection):
+        return db, False
+    return sqlite3.connect(db), True
+
+class Season:
+    # One year's validated roster, as loaded by load_season()
+    __slots__ = ("year", "team_rosters", "hr_derby_players")
+
+    def __init__(self, year, team_rosters, hr_derby_players):
+        self.year = year
+        self.team_rosters = team_rosters
+        self.hr_derby_players = hr_derby_players
+
+def load_season(cur, year, stats=None):
+    # Run the sanity checks and load every player for the season up front
+    with stats_phase(stats, "validation"):
+        errors = [violation for violation in validate_seasons(cur, [year])[year] if violation["level"] == "error"]
+    if errors:
+        print_violations(year, errors)
+        raise Exception(f"ERROR: {len(errors)} lineup problem(s) in {year}, see above.  Aborting.")
+
+    with stats_phase(stats, "roster fetch"):
+        team_rosters, hr_derby_players = load_season_roster(cur, year)
+    return Season(year, team_rosters, hr_derby_players)
+
+# PlayerRecord fields that hold text or a REAL; the rest (other than player_id and year) are integers
+PLAYER_RECORD_TEXT_FIELDS = ("team_stock", "position", "first_name", "last_name", "handedness_batting", "handedness_throwing")
+PLAYER_RECORD_REAL_FIELDS = ("avg", "era")
+
+def check_overrides(overrides):
+    # Make sure {player_id: {field: value}} only sets fields that can be overridden, to a value of the column's type
+    # (or None for NULL), so a bad override is reported before anything is encoded
+    if not isinstance(overrides, dict):
+        raise Exception("ERROR: Overrides must be an object of {player_id: {field: value}}")
+    for player_id, fields in overrides.items():
+        if not isinstance(fields, dict):
+            raise Exception(f"ERROR: Overrides for {player_id} must be an object of {{field: value}}")
+        for field, value in fields.items():
+            if field not in PLAYER_RECORD_FIELDS or field in ("player_id", "year"):
+                raise Exception(f"ERROR: Can't override '{field}' for {player_id}")
+            if value is None:
+                continue
+            if field in PLAYER_RECORD_TEXT_FIELDS:
+                valid, expected = isinstance(value, str), "a string"
+            elif field in PLAYER_RECORD_REAL_FIELDS:
+                valid, expected = isinstance(value, (int, float)) and not isinstance(value, bool), "a number"
+            elif field in ("has_player_row", "has_stats_row"):
+                valid, expected = isinstance(value, int), "true, false, 0 or 1"
+            else:
+                valid, expected = isinstance(value, int) and not isinstance(value, bool), "a whole number"
+            if not valid:
+                raise Exception(f"ERROR: '{field}' for {player_id} must be {expected} or null, got {value!r}")
+
+def override_season(season, overrides):
+    # Copy of season with {player_id: {field: value}} applied to copies of the affected PlayerRecords.
+    # The original season (and every record that isn't overridden) is shared, not copied.
+    check_overrides(overrides)
+
+    def apply(player):
+        fields = overrides.get(player.player_id)
+        if not fields:
+            return player
+        copy = PlayerRecord(tuple(getattr(player, field) for field in PLAYER_RECORD_FIELDS))
+        for field, value in fields.items():
+            setattr(copy, field, value)
+        return copy
+
+    team_rosters = {team_stock: [apply(player) for player in players] for team_stock, players in season.team_rosters.items()}
+    hr_derby_players = [(league, roster_position, apply(player)) for league, roster_position, player in season.hr_derby_players]
+    return Season(season.year, team_rosters, hr_derby_players)
+
+def fill_stats_from_other_seasons(cur, season):
+    # Copy of season where a NULL avg (batter slots) or era (pitcher slots) is taken from the player's nearest other
+    # season (see nearest_season_stats) instead of being written as .000 / 0.00.  Slots without a stats row are left
+    # alone like before.  Returns (season, {player_id: {field: (value, season it came from)}}).
+    wanted = {}
+    for players in season.team_rosters.values():
+        for idx, player in enumerate(players[:25]):
+            field = "avg" if idx < 15 else "era"
+            if player.has_stats_row and getattr(player, field) is None:
+                wanted.setdefault(player.player_id, set()).add(field)
+    for league, roster_position, player in season.hr_derby_players:
+        if player.has_stats_row and player.avg is None:
+            wanted.setdefault(player.player_id, set()).add("avg")
+    if not wanted:
+        return season, {}
+    found = nearest_season_stats(cur, season.year, wanted)
+    overrides = {player_id: {field: value for field, (value, other_year) in fields.items()} for player_id, fields in found.items()}
+    return override_season(season, overrides), found
+
+SNAPSHOT_FIELDS = ("slot_type", "league", "hr_roster_position") + PLAYER_RECORD_FIELDS
+
+def season_rows(season):
+    # One row per roster and Home Run Derby slot, in SNAPSHOT_FIELDS order (the same columns as rom_export_$YEAR)
+    rows = [("team", None, None) + tuple(getattr(player, field) for field in PLAYER_RECORD_FIELDS)
+            for players in season.team_rosters.values() for player in players]
+    rows += [("hr_derby", league, roster_position) + tuple(getattr(player, field) for field in PLAYER_RECORD_FIELDS)
+             for league, roster_position, player in season.hr_derby_players]
+    return rows
+
+def season_rows_sha256(rows):
+    return hashlib.sha256(json.dumps(rows).encode("utf-8")).hexdigest()
+
+def db_file_signature(db_path):
+    # [(mtime, size) or None] of the DB file and its WAL file
+    signature = []
+    for path in (db_path, db_path + "-wal"):
+        try:
+            stat = os.stat(path)
+            signature.append([stat.st_mtime_ns, stat.st_size])
+        except OSError:
+            signature.append(None)
+    return signature
+
+def snapshot_column_type(values):
+    # Narrowest column type that gives every value back exactly: int32, float64, string, or anything else as JSON
+    if all(value is None or (type(value) is int and SNAPSHOT_NULL_INT < value <= 0x7FFFFFFF) for value in values):
+        return "i"
+    if all(value is None or type(value) is float for value in values):
+        return "d"
+    if all(value is None or type(value) is str for value in values):
+        return "s"
+    return "v"
+
+def little_endian(values):
+    if sys.byteorder != "little":
+        values.byteswap()
+    return values.tobytes()
+
+def export_season_snapshot(cur, year, path, db_path=None):
+    # Compile a validated season into a snapshot file that load_season_snapshot() reads without SQLite: one
+    # fixed-width column per SNAPSHOT_FIELDS field (NULL is INT32_MIN, NaN or 0xFFFFFFFF) and one string table for
+    # names, IDs and codes.  The lineup warnings and a fingerprint of the DB go into the metadata, so a build can
+    # tell if the snapshot is stale (see snapshot_is_current).  Returns the metadata.
+    violations = validate_seasons(cur, [year])[year]
+    errors = [violation for violation in violations if violation["level"] == "error"]
+    if errors:
+        print_violations(year, errors)
+        raise Exception(f"ERROR: {len(errors)} lineup problem(s) in {year}, see above.  Aborting.")
+    team_rosters, hr_derby_players = load_season_roster(cur, year)
+    rows = season_rows(Season(year, team_rosters, hr_derby_players))
+
+    strings = {}
+    blocks = []
+    columns = []
+    position = SNAPSHOT_DATA_START
+
+    def add_block(data):
+        nonlocal position
+        offset = position
+        padding = -len(data) % 8
+        blocks.append(data + bytes(padding))
+        position += len(data) + padding
+        return offset
+
+    for i, field in enumerate(SNAPSHOT_FIELDS):
+        values = [row[i] for row in rows]
+        column_type = snapshot_column_type(values)
+        if column_type == "i":
+            data = array.array("i", [SNAPSHOT_NULL_INT if value is None else value for value in values])
+        elif column_type == "d":
+            data = array.array("d", [math.nan if value is None else value for value in values])
+        elif column_type == "s":
+            data = array.array("I", [SNAPSHOT_NULL_INDEX if value is None else strings.setdefault(value, len(strings)) for value in values])
+        else:
+            data = array.array("I", [strings.setdefault(json.dumps(value), len(strings)) for value in values])
+        columns.append({"field": field, "type": column_type, "offset": add_block(little_endian(data))})
+
+    encoded = [string.encode("utf-8") for string in strings]
+    string_offsets = array.array("I", [0])
+    for string in encoded:
+        string_offsets.append(string_offsets[-1] + len(string))
+    metadata = {
+        "year": year,
+        "rows": len(rows),
+        "columns": columns,
+        "strings": {"count": len(encoded), "offsets": add_block(little_endian(string_offsets)), "data": add_block(b"".join(encoded))},
+        "source": {
+            "rows_sha256": season_rows_sha256(rows),
+            "db_file": db_file_signature(db_path) if db_path else None,
+        },
+        "violations": violations,
+    }
+    metadata_bytes = json.dumps(metadata).encode("utf-8")
+    metadata_offset = add_block(metadata_bytes)
+
+    payload = b"".join(blocks)
+    header = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, year, metadata_offset, len(metadata_bytes), zlib.crc32(payload))
+    write_file_atomic(path, header.ljust(SNAPSHOT_DATA_START, b"\0") + payload)
+    return metadata
+
+def load_season_snapshot(path):
+    # Read a snapshot written by export_season_snapshot() from the memory-mapped file, without SQLite.  The columns
+    # are cast in place, but each one is copied out once to build the PlayerRecord objects the encoders work on.
+    # Returns (Season, metadata).
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as view:
+        if len(mm) < SNAPSHOT_DATA_START:
+            raise Exception(f"ERROR: {path} is not a season snapshot")
+        magic, version, year, metadata_offset, metadata_length, crc = SNAPSHOT_HEADER.unpack_from(mm, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise Exception(f"ERROR: {path} is not a season snapshot")
+        if version != SNAPSHOT_VERSION:
+            raise Exception(f"ERROR: {path} is a version {version} snapshot, this script reads version {SNAPSHOT_VERSION}.  Export it again.")
+        if zlib.crc32(view[SNAPSHOT_DATA_START:]) != crc:
+            raise Exception(f"ERROR: {path} is damaged (CRC mismatch).  Export it again.")
+        metadata = json.loads(str(view[metadata_offset:metadata_offset+metadata_length], "utf-8"))
+
+        def column(offset, typecode, count):
+            with view[offset:offset + count * array.array(typecode).itemsize] as data:
+                if sys.byteorder == "little":
+                    with data.cast(typecode) as values:
+                        return values.tolist()
+                values = array.array(typecode, data)
+                values.byteswap()
+                return values.tolist()
+
+        count = metadata["strings"]["count"]
+        string_offsets = column(metadata["strings"]["offsets"], "I", count + 1)
+        data = metadata["strings"]["data"]
+        strings = [str(view[data + string_offsets[i]:data + string_offsets[i + 1]], "utf-8") for i in range(count)]
+
+        rows = metadata["rows"]
+        columns = []
+        for description in metadata["columns"]:
+            column_type = description["type"]
+            values = column(description["offset"], SNAPSHOT_TYPECODES[column_type], rows)
+            if column_type == "i":
+                values = [None if value == SNAPSHOT_NULL_INT else value for value in values]
+            elif column_type == "d":
+                values = [None if math.isnan(value) else value for value in values]
+            elif column_type == "s":
+                values = [None if value == SNAPSHOT_NULL_INDEX else strings[value] for value in values]
+            else:
+                values = [json.loads(strings[value]) for value in values]
+            columns.append(values)
+
+    if [description["field"] for description in metadata["columns"]] != list(SNAPSHOT_FIELDS):
+        raise Exception(f"ERROR: {path} was exported with different player fields.  Export it again.")
+    team_rows = []
+    hr_derby_rows = []
+    for row in zip(*columns):
+        if row[0] == "team":
+            team_rows.append(row[3:])
+        else:
+            hr_derby_rows.append(row[1:])
+    team_rosters, hr_derby_players = roster_from_rows(team_rows, hr_derby_rows)
+    return Season(year, team_rosters, hr_derby_players), metadata
+
+def snapshot_is_current(metadata, cur, db_path):
+    # True if the DB still has the season the snapshot was exported from.  If the DB and WAL files haven't been
+    # touched since the export that is enough; otherwise the season is loaded again and its rows compared by hash.
+    source = metadata["source"]
+    if source["db_file"] is not None and source["db_file"] == db_file_signature(db_path):
+        return True
+    team_rosters, hr_derby_players = load_season_roster(cur, metadata["year"])
+    return season_rows_sha256(season_rows(Season(metadata["year"], team_rosters, hr_derby_players))) == source["rows_sha256"]
+
+def snapshot_path(template, year):
+    return template.format(year=year)
+
+def load_build_season(cur, args, year, stats=None):
+    # The season from --snapshot if it was given (checked against the DB, if there is one), otherwise from the DB.
+    # With --fill-stats, NULL avg/era values are then filled in from other seasons.
+    if args.snapshot:
+        season = load_snapshot_season(cur, args, year, stats)
+    else:
+        season = load_season(cur, year, stats)
+    if args.fill_stats:
+        with stats_phase(stats, "stats fill"):
+            season, found = fill_stats_from_other_seasons(cur, season)
+        filled = sum(len(fields) for fields in found.values())
+        print(f"{filled} NULL avg/era value(s) for {year} filled in from other seasons")
+    return season
+
+def load_snapshot_season(cur, args, year, stats=None):
+    path = snapshot_path(args.snapshot, year)
+    with stats_phase(stats, "snapshot load"):
+        season, metadata = load_season_snapshot(path)
+    if season.year != year:
+        raise Exception(f"ERROR: {path} is a snapshot of {season.year}, not {year}")
+    if cur is not None:
+        with stats_phase(stats, "snapshot check"):
+            if not snapshot_is_current(metadata, cur, args.db):
+                raise Exception(f"ERROR: {path} is stale, the DB has changed since it was exported.  Run --export-snapshot again.")
+    return season
+
+def encode_season(rom_data, layout, season, dirty=None, diagnostics=None, stats=None):
+    # Encode a loaded season into rom_data (a bytearray) at the given layout.
+    # Returns the Diagnostics (a new one unless one is passed in) with every problem found on the way.
+    if diagnostics is None:
+        diagnostics = Diagnostics()
+    with stats_phase(stats, "team encode"):
+        encode_teams(rom_data, layout["team_offsets"], season.team_rosters, diagnostics, dirty, stats)
+    with stats_phase(stats, "HR Derby encode"):
+        encode_hr_derby_players(rom_data, layout["first_hr_derby_player_offset"], season.hr_derby_players, diagnostics, dirty)
+    with stats_phase(stats, "name check"):
+        diagnose_name_encoding(season_players(season), diagnostics)
+    return diagnostics
+
+def build_rom(rom, db, year, layout=None, season=None, diagnostics=None):
+    # Library entry point: returns a copy of rom (bytes) with the year's rosters from db encoded into it.
+    # db can be an open sqlite3 connection (kept open) or a path.  Pass layout (from probe_rom_layout/load_rom_layout)
+    # and season (from load_season) to skip the ROM scan and the DB queries on repeated builds, and a Diagnostics
+    # to get the build's warnings.
+    if layout is None:
+        layout = probe_rom_layout(rom)
+    if season is None:
+        conn, owned = connect_db(db)
+        try:
+            season = load_season(conn.cursor(), year)
+        finally:
+            if owned:
+                conn.close()
+    rom_data = bytearray(rom)
+    encode_season(rom_data, layout, season, diagnostics=diagnostics)
+    update_rom_checksum(rom_data, rom, layout)
+    return bytes(rom_data)
+
+def format_output_path(template, rom_path, year):
+    if not template:
+        return None
+    return template.format(year=year, rom=os.path.splitext(os.path.basename(rom_path))[0])
+
+def output_paths(args, rom_path, year):
+    # (out_path, ips_path, bps_path) for one build (only patches are written if --ips/--bps is given without --out)
+    out_path = format_output_path(args.out, rom_path, year)
+    ips_path = format_output_path(args.ips, rom_path, year)
+    bps_path = format_output_path(args.bps, rom_path, year)
+    if not (out_path or ips_path or bps_path):
+        out_path = rom_path
+    return out_path, ips_path, bps_path
+
+def manifest_path_for(paths):
+    return next(path for path in paths if path) + ".manifest.json"
+
+def write_outputs(args, rom_path, base_rom_data, rom_data, layout, year, paths, stats=None):
+    # Write the ROM and patches requested on the command line
+    out_path, ips_path, bps_path = paths
+    regions = rom_regions(layout)
+    if out_path:
+        with stats_phase(stats, "write ROM"):
+            changed = write_rom(rom_path, out_path, rom_data, regions, in_place=args.in_place)
+        changed_records = sum(1 for offset, length in changed if length == PLAYER_LENGTH)
+        print(f"ROM successfully updated for year {year} ({changed_records} player records changed, written to {out_path}).")
+    if ips_path:
+        with stats_phase(stats, "write IPS"):
+            patch = build_ips_patch(base_rom_data, rom_data, regions)
+            write_file_atomic(ips_path, patch)
+        print(f"IPS patch for year {year} written to {ips_path} ({len(patch)} bytes).")
+    if bps_path:
+        with stats_phase(stats, "write BPS"):
+            patch = build_bps_patch(base_rom_data, rom_data, regions)
+            write_file_atomic(bps_path, patch)
+        print(f"BPS patch for year {year} written to {bps_path} ({len(patch)} bytes).")
+
+def build_year(cur, args, rom_path, base_rom_data, layout, year, stats=None):
+    # Build one year's ROM from the untouched base ROM and write the outputs requested on the command line.
+    # Returns (season, built ROM bytearray).
+    rom_data = bytearray(base_rom_data)
+    season = load_build_season(cur, args, year, stats)
+    paths = output_paths(args, rom_path, year)
+
+    # With --incremental, reuse the last build's bytes and diagnostics for every slot whose inputs haven't changed
+    manifest_path = manifest_path_for(paths)
+    dirty = None
+    diagnostics = Diagnostics()
+    if args.incremental:
+        with stats_phase(stats, "incremental manifest"):
+            slot_hashes = build_slot_hashes(rom_data, layout, season.team_rosters, season.hr_derby_players)
+            dirty = apply_build_manifest(rom_data, load_build_manifest(manifest_path, year), slot_hashes, diagnostics)
+        print(f"{len(dirty)} of {len(slot_hashes)} player slots changed since the last build")
+
+    encode_season(rom_data, layout, season, dirty, diagnostics, stats)
+    diagnostics.print_summary()
+    report_path = format_output_path(args.report, rom_path, year)
+    if report_path:
+        with stats_phase(stats, "diagnostics report"):
+            diagnostics.write_report(report_path, year, os.path.basename(rom_path))
+        print(f"{len(diagnostics.issues)} diagnostic(s) for year {year} written to {report_path}.")
+    with stats_phase(stats, "checksum"):
+        update_rom_checksum(rom_data, base_rom_data, layout)
+    if stats is not None:
+        stats.count_changed_bytes(base_rom_data, rom_data, layout)
+
+    write_outputs(args, rom_path, base_rom_data, rom_data, layout, year, paths, stats=stats)
+    if args.incremental:
+        with stats_phase(stats, "incremental manifest"):
+            save_build_manifest(manifest_path, year, rom_data, slot_hashes, diagnostics.slot_issues())
+    return season, rom_data
+
+def build_job(conn, args, rom_path, year):
+    # Read the base ROM, find its layout and build one year with build_year().  With --stats, --stats-json or
+    # --profile the build is measured: SQL statements are counted with a trace callback and timed with a
+    # TimedCursor, and --profile runs the whole job under cProfile.  conn is None when building from --snapshot alone.
+    # Returns (base ROM bytes, layout, season, built ROM bytearray).
+    measured = args.stats or args.stats_json or args.profile
+    stats = BuildStats() if measured else None
+    profiler = cProfile.Profile() if args.profile else None
+    if conn is None:
+        cur = None
+    elif measured:
+        cur = conn.cursor(TimedCursor)
+        cur.stats = stats
+        conn.set_trace_callback(stats.trace)
+    else:
+        cur = conn.cursor()
+    if profiler:
+        profiler.enable()
+    try:
+        # Open and read ROM
+        with stats_phase(stats, "read ROM"):
+            with open(rom_path, "rb") as f:
+                base_rom_data = f.read()
+
+        # Find the team and Home Run Derby offsets
+        with stats_phase(stats, "layout scan"):
+            layout = load_rom_layout(base_rom_data, None if args.no_layout_cache else args.layout_cache)
+        if layout["header_size"]:
+            print(f"Detected a {layout['header_size']}-byte copier header")
+        if layout["snes_header_offset"] is None:
+            print("WARNING: No SNES internal header found, the checksum will not be updated")
+
+        season, rom_data = build_year(cur, args, rom_path, base_rom_data, layout, year, stats)
+    finally:
+        if profiler:
+            profiler.disable()
+        if measured:
+            if conn is not None:
+                conn.set_trace_callback(None)
+            stats.finish()
+
+    if args.stats:
+        for line in stats.report(year):
+            print(line)
+    stats_json_path = format_output_path(args.stats_json, rom_path, year)
+    if stats_json_path:
+        write_file_atomic(stats_json_path, json.dumps(stats.to_dict(year, os.path.basename(rom_path)), indent=1).encode("utf-8"))
+        print(f"Build stats for year {year} written to {stats_json_path}.")
+    profile_path = format_output_path(args.profile, rom_path, year)
+    if profile_path:
+        profiler.dump_stats(profile_path)
+        print(f"cProfile stats for year {year} written to {profile_path} (view with python -m pstats {profile_path}).")
+    return base_rom_data, layout, season, rom_data
+
+def db_signature(conn, db_path):
+    # Changes whenever the DB is committed to: PRAGMA data_version catches commits by other connections (DB browsers
+    # included), and the size and modification time of the DB and its WAL file catch the file being rewritten
+    return conn.execute("PRAGMA data_version").fetchone()[0], db_file_signature(db_path)
+
+def wait_for_db_change(conn, db_path, signature, poll_interval, debounce):
+    # Poll until the DB changes, then wait until it has been quiet for debounce seconds, so a burst of edits
+    # (or a DB browser writing several statements) ends in one rebuild.  Returns the new signature.
+    while True:
+        time.sleep(poll_interval)
+        latest = db_signature(conn, db_path)
+        if latest != signature:
+            break
+    while True:
+        time.sleep(debounce)
+        settled = db_signature(conn, db_path)
+        if settled == latest:
+            return settled
+        latest = settled
+
+def watch(args, rom_path, year):
+    # Build once, then keep the base ROM, the season and the built ROM in memory.  Every time the DB changes, reload
+    # the season and re-encode only the slots whose inputs changed (the same slot hashes as --incremental), then
+    # write just those records, until Ctrl+C.
+    conn = sqlite3.connect(args.db)
+    try:
+        base_rom_data, layout, season, rom_data = build_job(conn, args, rom_path, year)
+        paths = output_paths(args, rom_path, year)
+        cur = conn.cursor()
+        slot_hashes = build_slot_hashes(base_rom_data, layout, season.team_rosters, season.hr_derby_players)
+        # Season-wide problems (names, short rosters) are printed once, not after every rebuild
+        known_issues = set(encode_season(bytearray(rom_data), layout, season, dirty=set()).issues)
+        # Each slot's issues as of its last encode, for the manifest (the first build just wrote them to it)
+        slot_issues = {key: entry["issues"] for key, entry in load_build_manifest(manifest_path_for(paths), year).items()} if args.incremental else {}
+        signature = db_signature(conn, args.db)
+        print(f"Watching {args.db} for changes to {year} (Ctrl+C to stop)")
+        while True:
+            signature = wait_for_db_change(conn, args.db, signature, args.poll_interval, args.debounce)
+            start = time.perf_counter()
+            try:
+                season = load_build_season(cur, args, year)
+            except Exception as e:
+                print(e)
+                print("Waiting for the next change")
+                signature = db_signature(conn, args.db)
+                continue
+
+            new_hashes = build_slot_hashes(base_rom_data, layout, season.team_rosters, season.hr_derby_players)
+            dirty = {key for key, value in new_hashes.items() if slot_hashes.get(key) != value}
+            rebuilt = dirty | (set(slot_hashes) - set(new_hashes))
+            for key in rebuilt:
+                # Encoding keeps some of the slot's bytes, so start from the base ROM like a full build does
+                offset = (new_hashes.get(key) or slot_hashes[key])[0]
+                rom_data[offset:offset+PLAYER_LENGTH] = base_rom_data[offset:offset+PLAYER_LENGTH]
+            slot_hashes = new_hashes
+            if not rebuilt:
+                print(f"DB changed, but no player slot for {year} did")
+                signature = db_signature(conn, args.db)
+                continue
+
+            # Only print the problems this rebuild turned up that weren't there before
+            diagnostics = encode_season(rom_data, layout, season, dirty)
+            rebuilt_issues = diagnostics.slot_issues()
+            slot_issues = {key: rebuilt_issues.get(key, []) if key in dirty else slot_issues.get(key, []) for key in slot_hashes}
+            diagnostics.issues = {key: issue for key, issue in diagnostics.issues.items() if key not in known_issues}
+            known_issues.update(diagnostics.issues)
+            diagnostics.print_summary()
+            update_rom_checksum(rom_data, base_rom_data, layout)
+            write_outputs(args, rom_path, base_rom_data, rom_data, layout, year, paths)
+            if args.incremental:
+                save_build_manifest(manifest_path_for(paths), year, rom_data, slot_hashes, slot_issues)
+            print(f"Rebuilt {len(rebuilt)} player slot(s) in {(time.perf_counter() - start) * 1000:.1f}ms: {', '.join(sorted(rebuilt))}")
+            signature = db_signature(conn, args.db)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        conn.close()
 
+def read_only_connect(db_path):
+    return sqlite3.connect(f"file:{urllib.request.pathname2url(os.path.abspath(db_path))}?mode=ro", uri=True)
+
+# Each batch worker process gets its own read-only connection (see init_batch_worker)
+batch_conn = None
+
+def init_batch_worker(db_path):
+    global batch_conn
+    batch_conn = read_only_connect(db_path) if db_path else None
+
+def run_batch_job(args, rom_path, year):
+    # Build one (ROM, year) job; returns (rom_path, year, error or None, seconds, captured output).
+    # Errors are returned instead of raised so one bad season doesn't stop the rest of the batch.
+    start = time.perf_counter()
+    output = io.StringIO()
+    error = None
+    try:
+        with contextlib.redirect_stdout(output):
+            build_job(batch_conn, args, rom_path, year)
+    except Exception as e:
+        error = str(e) or e.__class__.__name__
+    return rom_path, year, error, time.perf_counter() - start, output.getvalue()
+
+def run_batch(args, jobs):
+    # Fan the (ROM, year) jobs out over --jobs worker processes and report each one as it finishes
+    start = time.perf_counter()
+    failures = []
+    if args.jobs > 1:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs, initializer=init_batch_worker, initargs=(args.db,))
+    else:
+        init_batch_worker(args.db)
+        executor = None
+    try:
+        if executor:
+            futures = [executor.submit(run_batch_job, args, rom_path, year) for rom_path, year in jobs]
+            results = (future.result() for future in concurrent.futures.as_completed(futures))
+        else:
+            results = (run_batch_job(args, rom_path, year) for rom_path, year in jobs)
+        for done, (rom_path, year, error, seconds, output) in enumerate(results, 1):
+            status = "OK" if error is None else "FAILED"
+            print(f"[{done}/{len(jobs)}] {year} {rom_path}: {status} in {seconds:.2f}s")
+            for line in output.splitlines():
+                print(f"    {line}")
+            if error is not None:
+                print(f"    {error}")
+                failures.append((rom_path, year, error))
+    finally:
+        if executor:
+            executor.shutdown()
+    print(f"Batch finished in {time.perf_counter() - start:.2f}s: {len(jobs) - len(failures)} succeeded, {len(failures)} failed.")
+    return failures
+
+def validate_only(args):
+    # Check every requested season in one pass, returns the number of errors.  With --snapshot (and no --db) the
+    # problems recorded when each snapshot was exported are reported instead.
+    if args.snapshot and not args.db:
+        violations = {year: load_season_snapshot(snapshot_path(args.snapshot, year))[1]["violations"] for year in args.year}
+    else:
+        conn = read_only_connect(args.db)
+        try:
+            violations = validate_seasons(conn.cursor(), args.year)
+        finally:
+            conn.close()
+    error_count = 0
+    for year in args.year:
+        print_violations(year, violations[year])
+        errors = sum(1 for violation in violations[year] if violation["level"] == "error")
+        warnings = len(violations[year]) - errors
+        print(f"{year}: {errors} error(s), {warnings} warning(s)")
+        error_count += errors
+    return error_count
+
+def export_snapshots(args):
+    conn = read_only_connect(args.db)
+    try:
+        for year in args.year:
+            path = snapshot_path(args.export_snapshot, year)
+            metadata = export_season_snapshot(conn.cursor(), year, path, args.db)
+            print(f"Snapshot of {year} written to {path} ({metadata['rows']} player slots, {len(metadata['violations'])} warning(s)).")
+    finally:
+        conn.close()
 
-    # Overwrite input ROM file, and close the database connection
-    with open(args.romfile, "wb") as f:
-        f.write(rom_data)
-    conn.close()
-    print(f"ROM successfully updated for year {args.year}.")
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.export_snapshot:
+        export_snapshots(args)
+        return
+
+    if args.maintain_schema:
+        conn = sqlite3.connect(args.db)
+        try:
+            maintain_schema(conn, args.year or detect_seasons(conn.cursor()))
+        finally:
+            conn.close()
+        return
+
+    if args.validate_only:
+        if validate_only(args):
+            sys.exit(1)
+        return
+
+    # Several years/ROMs can only be built in one run if every output has its own path
+    outputs = [path for path in (args.out, args.ips, args.bps) if path]
+    if len(args.year) > 1 and (not outputs or any("{year}" not in path for path in outputs)):
+        raise Exception("ERROR: Building more than one year needs --out, --ips and/or --bps paths containing {year}")
+    if len(args.romfile) > 1 and any("{rom}" not in path for path in outputs):
+        raise Exception("ERROR: Building more than one ROM needs --out, --ips and --bps paths containing {rom}")
+
+    jobs = [(rom_path, year) for rom_path in args.romfile for year in args.year]
+    if len(jobs) > 1:
+        if run_batch(args, jobs):
+            sys.exit(1)
+        return
+
+    rom_path, year = jobs[0]
+    if args.watch:
+        watch(args, rom_path, year)
+        return
+
+    # Connect to the DB (a --snapshot build doesn't need one)
+    conn = sqlite3.connect(args.db) if args.db else None
+    try:
+        build_job(conn, args, rom_path, year)
+    finally:
+        if conn is not None:
+            conn.close()
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,269 @@
+import argparse
+import csv
+import itertools
+import json
+import re
+import sqlite3
+import sys
+import time
+
+# Configurable defaults
+DEFAULT_DB_PATH = ""
+DEFAULT_BATCH_SIZE = 5000
+
+# Same layout as 'stats_2007' (the baseballguru.com columns)
+STATS_COLUMNS = [
+    ("player_id", "TEXT"), ("gold_glove", "INT"), ("avg", "REAL"), ("hr", "INT"), ("rbi", "INT"), ("g", "INT"),
+    ("2b", "INT"), ("3b", "INT"), ("ab", "INT"), ("bb", "INT"), ("cs", "INT"), ("gidp", "INT"), ("h", "INT"),
+    ("hbp", "INT"), ("ibb", "INT"), ("obp", "REAL"), ("obs", "REAL"), ("r", "INT"), ("sb", "INT"), ("sbpct", "REAL"),
+    ("sf", "INT"), ("sh", "INT"), ("slg", "REAL"), ("so", "INT"), ("w", "INT"), ("l", "INT"), ("sv", "INT"),
+    ("era", "REAL"), ("bba", "INT"), ("bfp", "INT"), ("bk", "INT"), ("cg", "INT"), ("er", "INT"), ("gf", "INT"),
+    ("gp", "INT"), ("gs", "INT"), ("ha", "INT"), ("hbpa", "INT"), ("hra", "INT"), ("ibba", "INT"), ("ip", "REAL"),
+    ("ipouts", "INT"), ("ra", "INT"), ("sho", "INT"), ("soa", "INT"), ("whip", "REAL"), ("wp", "INT"), ("wpct", "REAL"),
+]
+
+# 'players' columns that can be imported as is
+PLAYER_COLUMNS = [
+    "first_name", "last_name", "position", "handedness_batting", "handedness_throwing", "height_in", "weight_lb",
+]
+
+# 'players' columns that have the year in their name ('age' in the CSV goes to 'age_$YEAR')
+PLAYER_SEASON_COLUMNS = {
+    "age": 'INTEGER CHECK("age_{year}" <= 99)',
+    "team": "TEXT",
+    "jersey_number": 'INTEGER CHECK("jersey_number_{year}" <= 99)',
+}
+
+# CSV header -> column, for the headers that don't already match (headers are compared in lowercase)
+HEADER_ALIASES = {
+    "playerid": "player_id",
+    "bbrefid": "player_id",
+    "bbref_id": "player_id",
+    "yearid": "year",
+    "season": "year",
+    "namefirst": "first_name",
+    "namelast": "last_name",
+    "bats": "handedness_batting",
+    "throws": "handedness_throwing",
+    "height": "height_in",
+    "weight": "weight_lb",
+    "teamid": "team",
+    "uniform_number": "jersey_number",
+    "doubles": "2b",
+    "triples": "3b",
+}
+
+# Pitching files (Lahman, baseball-reference) use the batting names for the stats a pitcher allowed.  A file is read
+# as a pitching file if it has one of PITCHING_ONLY_COLUMNS and none of the "allowed" columns, and then these headers
+# go to the allowed columns instead.  SH, SF and GIDP allowed have no column, so they are ignored.
+PITCHING_ONLY_COLUMNS = {"w", "l", "sv", "era", "ip", "ipouts"}
+PITCHING_HEADER_ALIASES = {
+    "h": "ha", "hr": "hra", "bb": "bba", "so": "soa", "r": "ra", "g": "gp", "ibb": "ibba", "hbp": "hbpa",
+    "sh": None, "sf": None, "gidp": None,
+}
+
+def is_pitching_file(columns):
+    allowed = set(PITCHING_HEADER_ALIASES.values()) - {None}
+    return bool(PITCHING_ONLY_COLUMNS & set(columns)) and not allowed & set(columns)
+
+def map_header(header, aliases):
+    # CSV header names -> column names (None for the columns of a pitching file that have nowhere to go)
+    names = [name.strip().lower() for name in header]
+    columns = [aliases.get(name, HEADER_ALIASES.get(name, name)) for name in names]
+    if "player_id" not in columns:
+        raise Exception("ERROR: The CSV file has no player ID column (player_id, playerID or bbrefID)")
+    if is_pitching_file(columns):
+        print("Pitching file: H, HR, BB, SO, R, G, IBB and HBP go to the allowed columns (ha, hra, bba, ...)")
+        columns = [column if name in aliases else PITCHING_HEADER_ALIASES.get(column, column) for name, column in zip(names, columns)]
+    return columns
+
+def import_plan(columns, year):
+    # Which CSV columns go into stats_$YEAR and players, as lists of (CSV index, column name)
+    stats_names = {name for name, column_type in STATS_COLUMNS}
+    stats = [(i, name) for i, name in enumerate(columns) if name in stats_names and name != "player_id"]
+    players = [(i, name) for i, name in enumerate(columns) if name in PLAYER_COLUMNS]
+    players += [(i, f"{name}_{year}") for i, name in enumerate(columns) if name in PLAYER_SEASON_COLUMNS]
+    return stats, players
+
+def create_season_tables(cur, year):
+    # Create stats_$YEAR and the year columns in 'players' if they don't exist yet
+    columns = ",\n\t".join(f'"{name}"\t{column_type}' for name, column_type in STATS_COLUMNS)
+    cur.execute(f'CREATE TABLE IF NOT EXISTS "stats_{year}" (\n\t{columns}\n)')
+    cur.execute(f"CREATE INDEX IF NOT EXISTS idx_stats_{year}_player_id ON stats_{year} (player_id)")
+
+    cur.execute("PRAGMA table_info(players)")
+    existing = {row[1] for row in cur.fetchall()}
+    for name, column_type in PLAYER_SEASON_COLUMNS.items():
+        column = f"{name}_{year}"
+        if column not in existing:
+            cur.execute(f'ALTER TABLE players ADD COLUMN "{column}" {column_type.format(year=year)}')
+
+def upsert_statements(year, stats, players):
+    # Statements that take (player_id, *values) parameters
+    statements = []
+
+    # stats_$YEAR has no key, so update the existing row and only insert if there isn't one.
+    # Only the columns in the CSV are touched, so batting and pitching files can be imported one after another.
+    if stats:
+        names = [name for i, name in stats]
+        assignments = ", ".join(f'"{name}" = ?{n + 2}' for n, name in enumerate(names))
+        statements.append(f'UPDATE stats_{year} SET {assignments} WHERE player_id = ?1')
+        column_list = ", ".join(f'"{name}"' for name in ["player_id"] + names)
+        placeholders = ", ".join(f"?{n + 1}" for n in range(len(names) + 1))
+        statements.append(f"""
+            INSERT INTO stats_{year} ({column_list})
+            SELECT {placeholders}
+            WHERE NOT EXISTS (SELECT 1 FROM stats_{year} WHERE player_id = ?1)""")
+
+    names = [name for i, name in players]
+    column_list = ", ".join(f'"{name}"' for name in ["player_id"] + names)
+    placeholders = ", ".join("?" for n in range(len(names) + 1))
+    if names:
+        conflict = "DO UPDATE SET " + ", ".join(f'"{name}" = excluded."{name}"' for name in names)
+    else:
+        conflict = "DO NOTHING"
+    players_statement = f"INSERT INTO players ({column_list}) VALUES ({placeholders}) ON CONFLICT (player_id) {conflict}"
+    return statements, players_statement
+
+def parse_value(value):
+    value = value.strip()
+    return value if value else None
+
+class SeasonImport:
+    # Prepared statements and the pending batch for one season
+    def __init__(self, cur, year, columns):
+        create_season_tables(cur, year)
+        self.year = year
+        self.stats, self.players = import_plan(columns, year)
+        self.stats_statements, self.players_statement = upsert_statements(year, self.stats, self.players)
+        self.rows = []
+        self.count = 0
+
+    def add(self, line, player_id, row):
+        self.rows.append((line, player_id, row))
+
+    def drop_repeated_players(self, cur):
+        # Leave out the rows of players who already have a row in this season of the file (another stint).  The
+        # player IDs seen so far are kept in a temp table rather than in memory, so a file with many seasons doesn't
+        # grow the import.
+        cur.execute("SELECT player_id FROM temp.stats_import_seen WHERE year = ? AND player_id IN (SELECT value FROM json_each(?))",
+                    (self.year, json.dumps([player_id for line, player_id, row in self.rows])))
+        seen = {row[0] for row in cur.fetchall()}
+        rows = []
+        for line, player_id, row in self.rows:
+            if player_id in seen:
+                print(f"WARNING: Line {line} has a second row for {player_id} in {self.year} (another stint?), skipping it.  Combine the stints into one row first.")
+                continue
+            seen.add(player_id)
+            rows.append((player_id, row))
+        cur.executemany("INSERT INTO temp.stats_import_seen (year, player_id) VALUES (?, ?)", [(self.year, player_id) for player_id, row in rows])
+        return rows
+
+    def flush(self, cur):
+        if not self.rows:
+            return
+        rows = self.drop_repeated_players(cur)
+        self.rows = []
+        # A file with only stats columns doesn't add bare 'players' rows
+        if self.players:
+            cur.executemany(self.players_statement, [
+                [player_id] + [parse_value(row[i]) for i, name in self.players] for player_id, row in rows
+            ])
+        stats_rows = [[player_id] + [parse_value(row[i]) for i, name in self.stats] for player_id, row in rows]
+        for statement in self.stats_statements:
+            cur.executemany(statement, stats_rows)
+        self.count += len(rows)
+
+def import_csv(conn, csv_file, year=None, batch_size=DEFAULT_BATCH_SIZE, aliases=None):
+    # Stream one CSV file into stats_$YEAR and players, committing every batch_size rows.
+    # Rows go to the year in their year/yearID/season column, or to 'year' if the file has none.
+    # Only one batch per season is held in memory at a time.  Returns {year: rows imported}.
+    reader = csv.reader(csv_file)
+    try:
+        columns = map_header(next(reader), aliases or {})
+    except StopIteration:
+        return {}
+    player_id_index = columns.index("player_id")
+    year_index = columns.index("year") if "year" in columns else None
+    if year_index is None and year is None:
+        raise Exception("ERROR: The CSV file has no year column, so --year is required")
+
+    cur = conn.cursor()
+    cur.execute("CREATE TEMP TABLE IF NOT EXISTS stats_import_seen (year INTEGER, player_id TEXT, PRIMARY KEY (year, player_id)) WITHOUT ROWID")
+    cur.execute("DELETE FROM temp.stats_import_seen")
+    seasons = {}
+    line = 1
+    while True:
+        batch = list(itertools.islice(reader, batch_size))
+        if not batch:
+            break
+        for row in batch:
+            line += 1
+            if len(row) != len(columns):
+                print(f"WARNING: Line {line} has {len(row)} columns instead of {len(columns)}, skipping it")
+                continue
+            player_id = row[player_id_index].strip().lower()
+            if not player_id:
+                print(f"WARNING: Line {line} has no player ID, skipping it")
+                continue
+            row_year = year
+            if year_index is not None and row[year_index].strip():
+                try:
+                    row_year = int(row[year_index])
+                except ValueError:
+                    print(f"WARNING: Line {line} has year '{row[year_index].strip()}', which isn't a number, skipping it")
+                    continue
+            if row_year is None:
+                print(f"WARNING: Line {line} has no year, skipping it")
+                continue
+            if row_year not in seasons:
+                seasons[row_year] = SeasonImport(cur, row_year, columns)
+            seasons[row_year].add(line, player_id, row)
+
+        for season in seasons.values():
+            season.flush(cur)
+        conn.commit()
+
+    return {row_year: season.count for row_year, season in seasons.items()}
+
+def parse_aliases(pairs):
+    # ["HomeRuns=hr", ...] -> {"homeruns": "hr", ...}
+    aliases = {}
+    for pair in pairs:
+        match = re.fullmatch(r"([^=]+)=(.+)", pair)
+        if not match:
+            raise Exception(f"ERROR: --map needs CSV_HEADER=column, got '{pair}'")
+        aliases[match.group(1).strip().lower()] = match.group(2).strip().lower()
+    return aliases
+
+def main():
+    parser = argparse.ArgumentParser(description="Import season stats from CSV files into the SQLite DB for the Ken Griffey Jr. Presents Major League Baseball ROM modifier.  Created by johnz1.")
+    parser.add_argument("csvfile", nargs="+", help="CSV files with a header row and one row per player (and season)")
+    parser.add_argument("--db", help=f"Path to the SQLite database (default: {DEFAULT_DB_PATH})", default=DEFAULT_DB_PATH)
+    parser.add_argument("--year", type=int, help="Season for files without a year/yearID/season column")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help=f"Rows per transaction (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument("--map", nargs="*", default=[], metavar="CSV_HEADER=column", help="Extra CSV header to column mappings, e.g. HomeRuns=hr")
+    args = parser.parse_args()
+    if not args.db:
+        parser.error("--db is required (or set DEFAULT_DB_PATH at the top of the script)")
+    if args.batch_size < 1:
+        parser.error("--batch-size must be at least 1")
+
+    aliases = parse_aliases(args.map)
+    conn = sqlite3.connect(args.db)
+    try:
+        for path in args.csvfile:
+            started = time.perf_counter()
+            with open(path, newline="", encoding="utf-8-sig") as csv_file:
+                counts = import_csv(conn, csv_file, args.year, args.batch_size, aliases)
+            for year, count in sorted(counts.items()):
+                print(f"{path}: {count} row(s) imported into stats_{year}")
+            print(f"{path}: finished in {time.perf_counter() - started:.2f}s")
+    except Exception as e:
+        print(e)
+        sys.exit(1)
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    main()
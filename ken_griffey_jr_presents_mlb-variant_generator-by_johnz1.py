@@ -0,0 +1,221 @@
+import argparse
+import importlib.util
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+
+# Configurable defaults
+DEFAULT_DB_PATH = ""
+MODIFIER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ken_griffey_jr_presents_mlb-rom_modifier-by_johnz1.py")
+
+# Load the ROM modifier script as a module (its file name isn't importable)
+spec = importlib.util.spec_from_file_location("kgjr_rom_modifier", MODIFIER_PATH)
+modifier = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(modifier)
+
+VARIANT_KEYS = {"name", "players", "teams", "trades", "hr_derby"}
+RATING_FIELDS = [field for field in modifier.PLAYER_RECORD_FIELDS if field.startswith("rating_")]
+
+def load_variants(path):
+    # The "variants" list of a variants JSON file, checked up front so a typo doesn't show up halfway through a run
+    with open(path, "r") as f:
+        variants = json.load(f).get("variants")
+    if not isinstance(variants, list):
+        raise Exception(f"ERROR: {path} has no \"variants\" list")
+    names = set()
+    for n, variant in enumerate(variants, 1):
+        name = variant.get("name")
+        if not isinstance(name, str) or not re.fullmatch(r"[\w.-]+", name):
+            raise Exception(f"ERROR: Variant #{n} needs a \"name\" of letters, digits, '.', '-' or '_'")
+        if name in names:
+            raise Exception(f"ERROR: Variant name '{name}' is used more than once")
+        names.add(name)
+        unknown = set(variant) - VARIANT_KEYS
+        if unknown:
+            raise Exception(f"ERROR: Variant '{name}' has unknown key(s): {', '.join(sorted(unknown))}")
+    return variants
+
+def copy_player(player, **fields):
+    copy = modifier.PlayerRecord(tuple(getattr(player, field) for field in modifier.PLAYER_RECORD_FIELDS))
+    for field, value in fields.items():
+        setattr(copy, field, value)
+    return copy
+
+def variant_season(season, variant):
+    # Copy of season with the variant's overrides applied, in this order:
+    #   "players":  {player_id: {field: value}}, like the build daemon's overrides
+    #   "teams":    {team_stock: {rating column: change}}, added to every rating of the team (kept within 1-10)
+    #   "trades":   [[player_id, player_id], ...], the two players swap roster slots
+    #   "hr_derby": [player_id, ...], rostered players that replace the Home Run Derby batters in order
+    # Every PlayerRecord that isn't changed is shared with season, which is how changed_slots() finds the slots to encode.
+    name = variant["name"]
+    if variant.get("players"):
+        season = modifier.override_season(season, variant["players"])
+    team_rosters = dict(season.team_rosters)
+    hr_derby_players = list(season.hr_derby_players)
+
+    for team_stock, changes in variant.get("teams", {}).items():
+        if team_stock not in team_rosters:
+            raise Exception(f"ERROR: Variant '{name}': '{team_stock}' is not one of the stock teams")
+        for field, change in changes.items():
+            if field not in RATING_FIELDS or not isinstance(change, int):
+                raise Exception(f"ERROR: Variant '{name}': team changes need a rating column and a whole number, got {field}={change!r}")
+        team_rosters[team_stock] = [
+            copy_player(player, **{field: min(max(getattr(player, field) + change, 1), 10) for field, change in changes.items() if getattr(player, field) is not None})
+            for player in team_rosters[team_stock]
+        ]
+
+    slots = {player.player_id: (team_stock, idx) for team_stock, players in team_rosters.items() for idx, player in enumerate(players)}
+    for pair in variant.get("trades", []):
+        if len(pair) != 2 or any(player_id not in slots for player_id in pair):
+            raise Exception(f"ERROR: Variant '{name}': trades need two rostered player IDs, got {pair!r}")
+        (team_a, idx_a), (team_b, idx_b) = slots[pair[0]], slots[pair[1]]
+        player_a, player_b = team_rosters[team_a][idx_a], team_rosters[team_b][idx_b]
+        team_rosters[team_a] = list(team_rosters[team_a])
+        team_rosters[team_b] = list(team_rosters[team_b])
+        # Each player takes over the other's slot: team, roster position and lineup position
+        team_rosters[team_a][idx_a] = copy_player(player_b, team_stock=player_a.team_stock, roster_position=player_a.roster_position, position=player_a.position)
+        team_rosters[team_b][idx_b] = copy_player(player_a, team_stock=player_b.team_stock, roster_position=player_b.roster_position, position=player_b.position)
+        slots[pair[0]], slots[pair[1]] = (team_b, idx_b), (team_a, idx_a)
+
+    # A Home Run Derby batter's record comes from his lineup row, so he gets the team bumps and trades too
+    hr_derby_players = [(league, roster_position, team_rosters[slots[player.player_id][0]][slots[player.player_id][1]])
+                        if player.player_id in slots else (league, roster_position, player)
+                        for league, roster_position, player in hr_derby_players]
+
+    if "hr_derby" in variant:
+        player_ids = variant["hr_derby"]
+        if len(player_ids) > len(hr_derby_players) or any(player_id not in slots for player_id in player_ids):
+            raise Exception(f"ERROR: Variant '{name}': hr_derby needs up to {len(hr_derby_players)} rostered player IDs")
+        for i, player_id in enumerate(player_ids):
+            league, roster_position, player = hr_derby_players[i]
+            if player.player_id != player_id:
+                team_stock, idx = slots[player_id]
+                hr_derby_players[i] = (league, roster_position, team_rosters[team_stock][idx])
+
+    return modifier.Season(season.year, team_rosters, hr_derby_players)
+
+def changed_slots(base_season, season):
+    # Slot keys whose PlayerRecord (or Home Run Derby entry) isn't the same object as in the base season
+    dirty = set()
+    for team_stock in modifier.TEAMS_STOCK_ORDER:
+        base_players = base_season.team_rosters.get(team_stock, [])
+        players = season.team_rosters.get(team_stock, [])
+        if players is base_players:
+            continue
+        for idx, (base_player, player) in enumerate(zip(base_players[:25], players[:25])):
+            if player is not base_player:
+                dirty.add(modifier.team_slot_key(team_stock, idx))
+    for idx, (base_entry, entry) in enumerate(zip(base_season.hr_derby_players, season.hr_derby_players)):
+        if entry[2] is not base_entry[2] or entry[:2] != base_entry[:2]:
+            dirty.add(modifier.hr_derby_slot_key(idx))
+    return dirty
+
+class VariantBuilder:
+    # Encodes the base season once, then builds each variant in one working copy of that image: only the variant's
+    # slots are re-encoded, and they are put back afterwards.  Memory stays at two ROM images however many variants
+    # are built.
+    def __init__(self, base_rom_data, layout, base_season):
+        self.base_rom_data = base_rom_data
+        self.layout = layout
+        self.base_season = base_season
+        self.slot_offsets = {key: offset for key, (offset, player_id, source_hash) in
+                             modifier.build_slot_hashes(base_rom_data, layout, base_season.team_rosters, base_season.hr_derby_players).items()}
+        built = bytearray(base_rom_data)
+        self.base_diagnostics = modifier.encode_season(built, layout, base_season)
+        modifier.update_rom_checksum(built, base_rom_data, layout)
+        self.base_built = bytes(built)
+        self.work = built
+        region = modifier.checksum_region(layout)
+        self.restore_regions = [region] if region else []
+
+    def build(self, season):
+        # Encode season's changed slots into self.work and return (slot keys, Diagnostics of the problems the base
+        # build didn't have).  self.work stays valid until the next restore().
+        dirty = changed_slots(self.base_season, season)
+        for key in dirty:
+            # Encoding keeps some of the slot's bytes, so start from the input ROM like a full build does
+            offset = self.slot_offsets[key]
+            self.work[offset:offset+modifier.PLAYER_LENGTH] = self.base_rom_data[offset:offset+modifier.PLAYER_LENGTH]
+            self.restore_regions.append((offset, modifier.PLAYER_LENGTH))
+        diagnostics = modifier.Diagnostics()
+        if dirty:
+            modifier.encode_season(self.work, self.layout, season, dirty, diagnostics)
+        diagnostics.issues = {key: issue for key, issue in diagnostics.issues.items() if key not in self.base_diagnostics.issues}
+        modifier.update_rom_checksum(self.work, self.base_rom_data, self.layout)
+        return dirty, diagnostics
+
+    def restore(self):
+        # Put the base season's bytes back into every region the last build() touched
+        for offset, length in self.restore_regions:
+            self.work[offset:offset+length] = self.base_built[offset:offset+length]
+        region = modifier.checksum_region(self.layout)
+        self.restore_regions = [region] if region else []
+
+def variant_path(template, name):
+    if not template:
+        return None
+    return template.format(variant=name)
+
+def main():
+    parser = argparse.ArgumentParser(description="Build many variants of one season of Ken Griffey Jr. Presents Major League Baseball from a JSON list of overrides, encoding the season only once.  Created by johnz1.")
+    parser.add_argument("romfile", help="Input ROM file (not modified)")
+    parser.add_argument("--db", help=f"Path to the SQLite database (default: {DEFAULT_DB_PATH})", default=DEFAULT_DB_PATH)
+    parser.add_argument("--year", type=int, required=True, help="Season the variants are based on")
+    parser.add_argument("--variants", required=True, help="JSON file with a \"variants\" list (see the README)")
+    parser.add_argument("--out", help="Write each variant's ROM here ({variant} is replaced with the variant name)")
+    parser.add_argument("--ips", help="Write each variant's IPS patch against romfile here ({variant} like --out)")
+    parser.add_argument("--bps", help="Write each variant's BPS patch against romfile here ({variant} like --out)")
+    args = parser.parse_args()
+    if not args.db:
+        parser.error("--db is required (or set DEFAULT_DB_PATH at the top of the script)")
+    outputs = [path for path in (args.out, args.ips, args.bps) if path]
+    if not outputs or any("{variant}" not in path for path in outputs):
+        parser.error("--out, --ips and/or --bps are required, and each needs {variant} in it")
+
+    failures = 0
+    try:
+        variants = load_variants(args.variants)
+        with open(args.romfile, "rb") as f:
+            base_rom_data = f.read()
+        layout = modifier.probe_rom_layout(base_rom_data)
+        conn = sqlite3.connect(args.db)
+        try:
+            base_season = modifier.load_season(conn.cursor(), args.year)
+        finally:
+            conn.close()
+
+        start = time.perf_counter()
+        builder = VariantBuilder(base_rom_data, layout, base_season)
+        regions = modifier.rom_regions(layout)
+        for variant in variants:
+            name = variant["name"]
+            try:
+                dirty, diagnostics = builder.build(variant_season(base_season, variant))
+                diagnostics.print_summary()
+                out_path, ips_path, bps_path = (variant_path(template, name) for template in (args.out, args.ips, args.bps))
+                if out_path:
+                    modifier.write_file_atomic(out_path, builder.work)
+                if ips_path:
+                    modifier.write_file_atomic(ips_path, modifier.build_ips_patch(base_rom_data, builder.work, regions))
+                if bps_path:
+                    modifier.write_file_atomic(bps_path, modifier.build_bps_patch(base_rom_data, builder.work, regions))
+                print(f"{name}: {len(dirty)} player slot(s) re-encoded")
+            except Exception as e:
+                print(f"{name}: {e}")
+                failures += 1
+            finally:
+                builder.restore()
+        seconds = time.perf_counter() - start
+        print(f"{len(variants) - failures} of {len(variants)} variant(s) built in {seconds:.2f}s ({len(variants) / max(seconds, 1e-9) * 60:.0f} per minute)")
+    except Exception as e:
+        print(e)
+        sys.exit(1)
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
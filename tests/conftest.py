@@ -0,0 +1,43 @@
+import importlib.util
+import os
+import shutil
+
+import pytest
+
+SCRIPT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIRST_YEAR = 2001
+SEASONS = 2
+PLAYERS = 800
+SEED = 1
+
+# The scripts' file names aren't importable, so load them the way they load each other.  The benchmark script
+# already generates a schema-valid DB and a stand-in ROM, so the tests use its generators (and its modifier).
+def load_script(name, file_name):
+    spec = importlib.util.spec_from_file_location(name, os.path.join(SCRIPT_DIR, file_name))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+benchmark = load_script("kgjr_benchmark", "ken_griffey_jr_presents_mlb-benchmark-by_johnz1.py")
+modifier = benchmark.modifier
+
+@pytest.fixture(scope="session")
+def generated_db(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("db") / "season.db")
+    benchmark.generate_db(path, SEASONS, FIRST_YEAR, PLAYERS, SEED)
+    return path
+
+@pytest.fixture
+def db_path(generated_db, tmp_path):
+    # A fresh copy of the generated DB for every test, so tests can edit it
+    path = str(tmp_path / "season.db")
+    shutil.copyfile(generated_db, path)
+    return path
+
+@pytest.fixture(scope="session")
+def rom():
+    return benchmark.generate_rom(benchmark.DEFAULT_ROM_SIZE, benchmark.DEFAULT_FIRST_TEAM_OFFSET, benchmark.DEFAULT_HR_DERBY_OFFSET, SEED)
+
+@pytest.fixture(scope="session")
+def year():
+    return FIRST_YEAR
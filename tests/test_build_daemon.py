@@ -0,0 +1,53 @@
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import pytest
+
+from conftest import load_script
+
+build_daemon = load_script("kgjr_build_daemon", "ken_griffey_jr_presents_mlb-build_daemon-by_johnz1.py")
+modifier = build_daemon.modifier
+
+@pytest.fixture
+def server(db_path):
+    build_daemon.BuildRequestHandler.cache = build_daemon.BuildCache(db_path)
+    server = build_daemon.ThreadingHTTPServer(("127.0.0.1", 0), build_daemon.BuildRequestHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/build"
+    server.shutdown()
+    server.server_close()
+    build_daemon.BuildRequestHandler.cache.conn.close()
+
+def post(url, request):
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, data=json.dumps(request).encode("utf-8"))) as response:
+            return response.status, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.read()
+
+def test_build_matches_build_rom(server, rom, db_path, year, tmp_path):
+    rom_path = tmp_path / "base.sfc"
+    rom_path.write_bytes(rom)
+    status, body = post(server, {"year": year, "rom": str(rom_path)})
+    assert status == 200
+    assert body == modifier.build_rom(rom, db_path, year)
+
+def test_bad_override_type_is_a_400(server, rom, year, tmp_path):
+    rom_path = tmp_path / "base.sfc"
+    rom_path.write_bytes(rom)
+    status, body = post(server, {"year": year, "rom": str(rom_path), "overrides": {"anyone": {"rating_bat_spd": "9"}}})
+    assert status == 400
+    assert b"'rating_bat_spd' for anyone must be a whole number" in body
+    assert post(server, {"year": str(year), "rom": str(rom_path)})[0] == 400
+    assert post(server, {"year": year, "rom": str(rom_path), "format": "zip"})[0] == 400
+    assert post(server, {"year": year, "rom": str(tmp_path / "missing.sfc")})[0] == 400
+
+def test_rom_that_fails_to_probe_is_a_500(server, year, tmp_path):
+    rom_path = tmp_path / "blank.sfc"
+    rom_path.write_bytes(bytes(0x8000))
+    status, body = post(server, {"year": year, "rom": str(rom_path)})
+    assert status == 500
+    assert b"First team marker" in body
@@ -0,0 +1,54 @@
+import struct
+
+import pytest
+
+from conftest import SEED, benchmark, modifier
+
+# A 1.5 MB ROM: the last 0.5 MB is mirrored to fill 2 MB, and the player tables are in the mirrored part
+MIRRORED_ROM_SIZE = 0x180000
+
+def reference_checksum(data, header_size, snes_header_offset):
+    # The checksum the slow way: pad the ROM to a power of two by repeating its last part, count the checksum
+    # field as 0xFFFF/0x0000 and add up every byte
+    rom = bytearray(data[header_size:])
+    field = snes_header_offset - header_size + modifier.SNES_HEADER_CHECKSUM_COMPLEMENT
+    rom[field:field+4] = b"\xff\xff\x00\x00"
+    size = 1 << (len(rom) - 1).bit_length()
+    base = 1 << (len(rom).bit_length() - 1)
+    while len(rom) < size:
+        rom += rom[base:][:size - len(rom)]
+    return sum(rom) & 0xFFFF
+
+def stored_checksum(data, layout):
+    complement, checksum = struct.unpack_from("<HH", data, layout["snes_header_offset"] + modifier.SNES_HEADER_CHECKSUM_COMPLEMENT)
+    assert complement ^ checksum == 0xFFFF
+    return checksum
+
+@pytest.fixture(scope="module", params=[benchmark.DEFAULT_ROM_SIZE, MIRRORED_ROM_SIZE], ids=["power_of_two", "mirrored"])
+def sized_rom(request):
+    return benchmark.generate_rom(request.param, benchmark.DEFAULT_FIRST_TEAM_OFFSET, benchmark.DEFAULT_HR_DERBY_OFFSET, SEED)
+
+@pytest.mark.parametrize("copier_header", [False, True])
+def test_full_recompute_matches_the_reference(copier_header, monkeypatch):
+    rom = benchmark.generate_rom(MIRRORED_ROM_SIZE, benchmark.DEFAULT_FIRST_TEAM_OFFSET, benchmark.DEFAULT_HR_DERBY_OFFSET, SEED, copier_header=copier_header)
+    layout = modifier.probe_rom_layout(rom)
+    expected = reference_checksum(rom, layout["header_size"], layout["snes_header_offset"])
+    assert modifier.rom_checksum_sum(rom, layout["header_size"], layout["snes_header_offset"]) == expected
+    assert layout["checksum_sum"] == expected
+    # The sum without NumPy gives the same answer
+    monkeypatch.setattr(modifier, "np", None)
+    assert modifier.rom_checksum_sum(rom, layout["header_size"], layout["snes_header_offset"]) == expected
+
+def test_build_updates_the_checksum_from_the_deltas(sized_rom, db_path, year):
+    layout = modifier.probe_rom_layout(sized_rom)
+    built = modifier.build_rom(sized_rom, db_path, year, layout=layout)
+    assert built != sized_rom
+    assert stored_checksum(built, layout) == reference_checksum(built, layout["header_size"], layout["snes_header_offset"])
+
+def test_checksum_follows_a_small_edit(sized_rom):
+    layout = modifier.probe_rom_layout(sized_rom)
+    edited = bytearray(sized_rom)
+    offset = layout["first_hr_derby_player_offset"]
+    edited[offset:offset+modifier.PLAYER_LENGTH] = bytes(range(modifier.PLAYER_LENGTH))
+    modifier.update_rom_checksum(edited, sized_rom, layout, [(offset, modifier.PLAYER_LENGTH)])
+    assert stored_checksum(edited, layout) == reference_checksum(edited, layout["header_size"], layout["snes_header_offset"])
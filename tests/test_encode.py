@@ -0,0 +1,25 @@
+import sqlite3
+
+from conftest import modifier
+
+def test_decode_reads_back_what_the_build_wrote(rom, db_path, year):
+    conn = sqlite3.connect(db_path)
+    season = modifier.load_season(conn.cursor(), year)
+    conn.close()
+    layout = modifier.probe_rom_layout(rom)
+    rows = modifier.decode_rom_players(modifier.build_rom(rom, None, year, layout=layout, season=season), layout)
+    decoded = {(row[1], row[2]): dict(zip(modifier.ROM_PLAYER_FIELDS, row)) for row in rows if row[0] == "team"}
+
+    checked = 0
+    for team_stock in modifier.TEAMS_STOCK_ORDER:
+        for idx, player in enumerate(season.team_rosters[team_stock][:25]):
+            if not (player.has_player_row and player.has_stats_row):
+                continue
+            row = decoded[(team_stock, idx + 1)]
+            assert (row["first_initial"], row["last_name"]) == modifier.decode_name(modifier.encode_name(player.first_name, player.last_name)[0])
+            fields = modifier.ROM_BATTER_FIELDS if idx < 15 else modifier.ROM_PITCHER_FIELDS
+            for field in fields:
+                if getattr(player, field) is not None and field not in ("avg", "era"):
+                    assert row[field] == getattr(player, field), (player.player_id, field)
+            checked += 1
+    assert checked > 600
@@ -0,0 +1,66 @@
+import json
+import re
+import sqlite3
+
+from conftest import modifier
+
+def build(rom_path, db_path, year, out_path, capsys, report_path=None):
+    # Number of player slots the build re-encoded, and the diagnostics summary lines if report_path is given
+    argv = [rom_path, "--db", db_path, "--year", str(year), "--out", out_path, "--incremental", "--no-layout-cache"]
+    if report_path:
+        argv += ["--report", report_path]
+    modifier.main(argv)
+    out = capsys.readouterr().out
+    changed = int(re.search(r"(\d+) of 706 player slots changed", out).group(1))
+    if report_path:
+        return changed, [line for line in out.splitlines() if line.startswith(("ERROR:", "WARNING:", "NOTE:"))]
+    return changed
+
+def test_incremental_build_matches_a_full_build(rom, db_path, year, tmp_path, capsys):
+    rom_path, out_path = str(tmp_path / "base.sfc"), str(tmp_path / "out.sfc")
+    with open(rom_path, "wb") as f:
+        f.write(rom)
+
+    assert build(rom_path, db_path, year, out_path, capsys) == 706
+    assert build(rom_path, db_path, year, out_path, capsys) == 0
+
+    conn = sqlite3.connect(db_path)
+    player_id = conn.execute(f"SELECT player_id FROM team_lineups_{year} WHERE roster_position = 1 LIMIT 1").fetchone()[0]
+    conn.execute(f"UPDATE ratings_{year} SET rating_bat_pow = 11 - rating_bat_pow WHERE player_id = ?", (player_id,))
+    conn.commit()
+
+    # The player's roster slot, and the Home Run Derby slot if the player has one
+    assert build(rom_path, db_path, year, out_path, capsys) in (1, 2)
+    with open(out_path, "rb") as f:
+        incremental = f.read()
+    assert incremental == modifier.build_rom(rom, conn, year)
+    conn.close()
+
+def test_incremental_build_reports_the_same_diagnostics_as_a_full_build(rom, db_path, year, tmp_path, capsys):
+    rom_path, out_path, report_path = str(tmp_path / "base.sfc"), str(tmp_path / "out.sfc"), str(tmp_path / "report.json")
+    with open(rom_path, "wb") as f:
+        f.write(rom)
+    conn = sqlite3.connect(db_path)
+    player_id = conn.execute(f"SELECT player_id FROM team_lineups_{year} WHERE roster_position = 1 LIMIT 1").fetchone()[0]
+    conn.execute(f"UPDATE ratings_{year} SET rating_bat_spd = NULL WHERE player_id = ?", (player_id,))
+    conn.commit()
+
+    changed, full_summary = build(rom_path, db_path, year, out_path, capsys, report_path)
+    with open(report_path) as f:
+        full_report = json.load(f)["issues"]
+    assert changed == 706 and any("rating_bat_spd" in line for line in full_summary)
+
+    # Nothing is re-encoded, but the summary and the report still cover every slot
+    changed, summary = build(rom_path, db_path, year, out_path, capsys, report_path)
+    with open(report_path) as f:
+        assert json.load(f)["issues"] == full_report
+    assert changed == 0 and summary == full_summary
+
+    # Fixing the player's ratings drops their warning and keeps everyone else's
+    conn.execute(f"UPDATE ratings_{year} SET rating_bat_spd = 5 WHERE player_id = ?", (player_id,))
+    conn.commit()
+    conn.close()
+    changed, summary = build(rom_path, db_path, year, out_path, capsys, report_path)
+    assert changed in (1, 2)
+    assert not any("rating_bat_spd" in line for line in summary)
+    assert [line for line in summary if "rating_bat_spd" not in line] == [line for line in full_summary if "rating_bat_spd" not in line]
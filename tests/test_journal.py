@@ -0,0 +1,32 @@
+import json
+import os
+
+from conftest import modifier
+
+def test_interrupted_in_place_write_is_rolled_back(tmp_path, capsys):
+    target = tmp_path / "out.sfc"
+    # Stopped after the journal was saved and the record at 8 was patched
+    (tmp_path / "out.sfc.journal").write_text(json.dumps({"regions": [(8, "0000")]}))
+    target.write_bytes(b"\x00" * 8 + b"\xff\xff" + b"\x00" * 54)
+
+    assert modifier.recover_rom_journal(str(target))
+    assert target.read_bytes() == b"\x00" * 64
+    assert not os.path.exists(str(target) + ".journal")
+    assert "Rolled back" in capsys.readouterr().out
+
+def test_truncated_journal_is_removed_and_the_target_left_alone(tmp_path, capsys):
+    target = tmp_path / "out.sfc"
+    target.write_bytes(b"\x00" * 64)
+    (tmp_path / "out.sfc.journal").write_text('{"regions": [[8, "00')
+
+    assert not modifier.recover_rom_journal(str(target))
+    assert target.read_bytes() == b"\x00" * 64
+    assert not os.path.exists(str(target) + ".journal")
+    assert "unreadable journal" in capsys.readouterr().out
+
+    # The next in-place write goes ahead as usual and leaves no journal behind
+    data = b"\x00" * 8 + b"\x01\x02" + b"\x00" * 54
+    (tmp_path / "out.sfc.journal").write_bytes(b"")
+    assert modifier.write_rom(str(target), str(target), data, [(8, 2)], in_place=True) == [(8, 2)]
+    assert target.read_bytes() == data
+    assert os.listdir(tmp_path) == ["out.sfc"]
@@ -0,0 +1,22 @@
+import pytest
+
+from conftest import SEED, benchmark, modifier
+
+def test_probe_finds_both_markers(rom):
+    layout = modifier.probe_rom_layout(rom)
+    assert layout["header_size"] == 0
+    assert layout["first_team_offset"] == benchmark.DEFAULT_FIRST_TEAM_OFFSET
+    assert layout["first_hr_derby_player_offset"] == benchmark.DEFAULT_HR_DERBY_OFFSET
+    assert layout["snes_header_offset"] == modifier.SNES_HEADER_CANDIDATES[0][0]
+
+def test_probe_with_copier_header(rom):
+    headered = benchmark.generate_rom(benchmark.DEFAULT_ROM_SIZE, benchmark.DEFAULT_FIRST_TEAM_OFFSET, benchmark.DEFAULT_HR_DERBY_OFFSET, SEED, copier_header=True)
+    layout = modifier.probe_rom_layout(headered)
+    assert layout["header_size"] == modifier.COPIER_HEADER_LENGTH
+    assert layout["first_team_offset"] == benchmark.DEFAULT_FIRST_TEAM_OFFSET + modifier.COPIER_HEADER_LENGTH
+    assert layout["first_hr_derby_player_offset"] == benchmark.DEFAULT_HR_DERBY_OFFSET + modifier.COPIER_HEADER_LENGTH
+    assert layout["checksum_sum"] == modifier.probe_rom_layout(rom)["checksum_sum"]
+
+def test_probe_without_markers():
+    with pytest.raises(Exception, match="First team marker"):
+        modifier.probe_rom_layout(bytes(0x8000))
@@ -0,0 +1,73 @@
+import struct
+import zlib
+
+import pytest
+
+from conftest import modifier
+
+def apply_ips(source, patch):
+    assert patch[:5] == b"PATCH" and patch[-3:] == b"EOF"
+    target = bytearray(source)
+    i = 5
+    while i < len(patch) - 3:
+        offset = int.from_bytes(patch[i:i+3], "big")
+        length = int.from_bytes(patch[i+3:i+5], "big")
+        assert length and offset != modifier.IPS_EOF_OFFSET
+        target[offset:offset+length] = patch[i+5:i+5+length]
+        i += 5 + length
+    return bytes(target)
+
+def read_bps_number(patch, i):
+    value, shift = 0, 1
+    while True:
+        byte = patch[i]
+        i += 1
+        value += (byte & 0x7F) * shift
+        if byte & 0x80:
+            return value, i
+        shift <<= 7
+        value += shift
+
+def apply_bps(source, patch):
+    assert patch[:4] == b"BPS1"
+    source_size, i = read_bps_number(patch, 4)
+    target_size, i = read_bps_number(patch, i)
+    metadata_size, i = read_bps_number(patch, i)
+    i += metadata_size
+    assert source_size == len(source)
+    target = bytearray()
+    while i < len(patch) - 12:
+        command, i = read_bps_number(patch, i)
+        action, length = command & 3, (command >> 2) + 1
+        if action == 0:
+            target += source[len(target):len(target)+length]
+        else:
+            assert action == 1
+            target += patch[i:i+length]
+            i += length
+    source_crc, target_crc, patch_crc = struct.unpack("<III", patch[-12:])
+    assert (source_crc, target_crc, patch_crc) == (zlib.crc32(source), zlib.crc32(target), zlib.crc32(patch[:-4]))
+    assert len(target) == target_size
+    return bytes(target)
+
+@pytest.fixture(scope="module")
+def built(rom, generated_db, year):
+    layout = modifier.probe_rom_layout(rom)
+    return layout, modifier.build_rom(rom, generated_db, year, layout=layout)
+
+def test_ips_round_trip(rom, built):
+    layout, target = built
+    assert apply_ips(rom, modifier.build_ips_patch(rom, target, modifier.rom_regions(layout))) == target
+
+def test_bps_round_trip(rom, built):
+    layout, target = built
+    assert apply_bps(rom, modifier.build_bps_patch(rom, target, modifier.rom_regions(layout))) == target
+
+def test_ips_record_never_starts_at_eof_offset():
+    # A change at 0x454F46 ("EOF") has to start one byte earlier
+    source = bytes(modifier.IPS_EOF_OFFSET + 0x100)
+    target = bytearray(source)
+    target[modifier.IPS_EOF_OFFSET:modifier.IPS_EOF_OFFSET+4] = b"\x01\x02\x03\x04"
+    regions = [(modifier.IPS_EOF_OFFSET, 4)]
+    assert apply_ips(source, modifier.build_ips_patch(source, target, regions)) == target
+    assert apply_bps(source, modifier.build_bps_patch(source, target, regions)) == target
@@ -0,0 +1,60 @@
+import sqlite3
+
+import numpy as np
+
+from conftest import load_script
+
+ratings_generator = load_script("kgjr_ratings_generator", "ken_griffey_jr_presents_mlb-ratings_generator-by_johnz1.py")
+
+def write(conn, overwrite):
+    years_column = np.array([2001, 2001], dtype=np.int64)
+    ratings = {column: np.array([5, 0], dtype=np.int64) for column in ratings_generator.RATINGS_COLUMNS}
+    ratings_generator.write_ratings(conn, [2001], years_column, ["set", "unrated"], ratings, overwrite)
+
+def ratings(conn, player_id):
+    return conn.execute("SELECT rating_bat_bat, rating_bat_pow FROM ratings_2001 WHERE player_id = ?", (player_id,)).fetchone()
+
+def test_existing_ratings_are_kept_by_default():
+    conn = sqlite3.connect(":memory:")
+    ratings_generator.create_ratings_table(conn.cursor(), 2001)
+    conn.execute("INSERT INTO ratings_2001 (player_id, rating_bat_bat, rating_pit_fat) VALUES ('set', 9, 2), ('unrated', 3, NULL)")
+    write(conn, overwrite=False)
+    assert ratings(conn, "set") == (9, 5)
+    assert ratings(conn, "unrated") == (3, None)
+
+def test_overwrite_replaces_ratings_that_have_a_stat():
+    conn = sqlite3.connect(":memory:")
+    ratings_generator.create_ratings_table(conn.cursor(), 2001)
+    conn.execute("INSERT INTO ratings_2001 (player_id, rating_bat_bat, rating_pit_fat) VALUES ('set', 9, 2), ('unrated', 3, NULL)")
+    write(conn, overwrite=True)
+    assert ratings(conn, "set") == (5, 5)
+    assert ratings(conn, "unrated") == (3, None)
+
+def add_stock_distributions(conn):
+    # Flat stock distributions, so every generated rating is a real 1-10 value
+    for group, first, last, table in ratings_generator.ROSTER_GROUPS:
+        columns = ("bat", "pow", "spd", "def") if group.startswith("batters") else ("spd", "con", "fat")
+        conn.execute(f"CREATE TABLE {table} (rating INTEGER NOT NULL, {', '.join(columns)})")
+        conn.executemany(f"INSERT INTO {table} VALUES (?{', 1' * len(columns)})", [(rating,) for rating in range(1, 11)])
+    conn.commit()
+
+def hand_set_ratings(conn, year):
+    # Set rating_bat_bat to 0 (never generated) for every rostered batter, so any overwrite shows
+    conn.execute(f"UPDATE ratings_{year} SET rating_bat_bat = 0 WHERE player_id IN (SELECT player_id FROM team_lineups_{year} WHERE roster_position <= 15)")
+    conn.commit()
+    return conn.execute(f"SELECT COUNT(*) FROM ratings_{year} WHERE rating_bat_bat = 0").fetchone()[0]
+
+def test_command_line_keeps_hand_set_ratings_unless_overwrite(db_path, year, capsys):
+    conn = sqlite3.connect(db_path)
+    add_stock_distributions(conn)
+    hand_set = hand_set_ratings(conn, year)
+    assert hand_set > 300
+
+    ratings_generator.main(["--db", db_path, "--year", str(year)])
+    assert conn.execute(f"SELECT COUNT(*) FROM ratings_{year} WHERE rating_bat_bat = 0").fetchone()[0] == hand_set
+    ratings_generator.main(["--db", db_path, "--year", str(year), "--keep-existing"])
+    assert conn.execute(f"SELECT COUNT(*) FROM ratings_{year} WHERE rating_bat_bat = 0").fetchone()[0] == hand_set
+
+    ratings_generator.main(["--db", db_path, "--year", str(year), "--overwrite"])
+    assert conn.execute(f"SELECT COUNT(*) FROM ratings_{year} WHERE rating_bat_bat = 0").fetchone()[0] == 0
+    conn.close()
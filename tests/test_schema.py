@@ -0,0 +1,102 @@
+import sqlite3
+
+from conftest import modifier
+
+def test_build_leaves_the_callers_transaction_alone(db_path, rom, year):
+    conn = sqlite3.connect(db_path)
+    modifier.maintain_schema(conn, [year])
+    player_id = conn.execute(f"SELECT player_id FROM team_lineups_{year} WHERE roster_position = 1").fetchone()[0]
+    before = conn.execute(f"SELECT rating_bat_spd FROM ratings_{year} WHERE player_id = ?", (player_id,)).fetchone()[0]
+    conn.execute(f"UPDATE ratings_{year} SET rating_bat_spd = ? WHERE player_id = ?", (before % 10 + 1, player_id))
+
+    # The export is out of date, so the build joins the source tables and sees the uncommitted edit
+    assert not modifier.rom_export_is_current(conn.cursor(), year)
+    edited = modifier.build_rom(rom, conn, year)
+    assert conn.in_transaction
+    conn.rollback()
+    assert conn.execute(f"SELECT rating_bat_spd FROM ratings_{year} WHERE player_id = ?", (player_id,)).fetchone()[0] == before
+    assert edited != modifier.build_rom(rom, conn, year)
+    conn.close()
+
+def test_maintain_schema_refreshes_only_changed_players(db_path, rom, year, capsys):
+    conn = sqlite3.connect(db_path)
+    full_build = modifier.build_rom(rom, conn, year)
+    modifier.maintain_schema(conn, [year])
+    assert modifier.rom_export_is_current(conn.cursor(), year)
+    assert modifier.build_rom(rom, conn, year) == full_build
+
+    conn.execute(f"UPDATE ratings_{year} SET rating_bat_spd = 10 WHERE player_id IN (SELECT player_id FROM team_lineups_{year} WHERE roster_position = 1 LIMIT 2)")
+    conn.commit()
+    edited = modifier.build_rom(rom, conn, year)
+    capsys.readouterr()
+    modifier.maintain_schema(conn, [year])
+    assert f"rom_export_{year} refreshed (2 changed player(s))" in capsys.readouterr().out
+    assert modifier.rom_export_is_current(conn.cursor(), year)
+    assert modifier.build_rom(rom, conn, year) == edited
+    conn.close()
+
+def test_recreated_source_table_falls_back_to_the_live_join(db_path, rom, year, capsys):
+    conn = sqlite3.connect(db_path)
+    modifier.maintain_schema(conn, [year])
+    # Re-create ratings_$YEAR with every BAT rating changed, like a re-import does; its triggers go with the old table
+    conn.execute(f"CREATE TABLE ratings_new AS SELECT * FROM ratings_{year}")
+    conn.execute("UPDATE ratings_new SET rating_bat_bat = 11 - rating_bat_bat WHERE rating_bat_bat IS NOT NULL")
+    conn.execute(f"DROP TABLE ratings_{year}")
+    conn.execute(f"ALTER TABLE ratings_new RENAME TO ratings_{year}")
+    conn.commit()
+    assert not modifier.rom_export_is_current(conn.cursor(), year)
+    edited = modifier.build_rom(rom, conn, year)
+    with_export = modifier.build_rom(rom, conn, year, season=modifier.Season(year, *modifier.load_rom_export(conn.cursor(), year)))
+    assert edited != with_export
+
+    # The next --maintain-schema run rebuilds the whole export, and the fast path gives the same ROM again
+    capsys.readouterr()
+    modifier.maintain_schema(conn, [year])
+    assert f"rom_export_{year} rebuilt" in capsys.readouterr().out
+    assert modifier.rom_export_is_current(conn.cursor(), year)
+    assert modifier.build_rom(rom, conn, year) == edited
+    conn.close()
+
+def null_batting_average(conn, year, other_year):
+    # Give a roster batter a NULL avg in year and a known avg in other_year; returns the player_id
+    player_id = conn.execute(f"SELECT player_id FROM team_lineups_{year} WHERE roster_position = 1").fetchone()[0]
+    conn.execute(f"UPDATE stats_{year} SET avg = NULL WHERE player_id = ?", (player_id,))
+    conn.execute(f"UPDATE stats_{other_year} SET avg = 0.321 WHERE player_id = ?", (player_id,))
+    return player_id
+
+def test_fill_stats_reads_without_writing(db_path, year):
+    conn = sqlite3.connect(db_path)
+    modifier.maintain_schema(conn, [year])
+    player_id = null_batting_average(conn, year, year + 1)
+    cur = conn.cursor()
+    # Changes are waiting, so the lookup runs over the stats_$YEAR tables and sees the uncommitted edits
+    assert not modifier.stats_by_year_is_current(cur)
+    season, found = modifier.fill_stats_from_other_seasons(cur, modifier.load_season(cur, year))
+    assert found[player_id] == {"avg": (0.321, year + 1)}
+    assert conn.in_transaction
+    conn.commit()
+
+    modifier.maintain_schema(conn, [year])
+    assert modifier.stats_by_year_is_current(cur)
+    assert modifier.fill_stats_from_other_seasons(cur, modifier.load_season(cur, year))[1] == found
+    conn.close()
+
+def test_stats_by_year_follows_added_and_dropped_seasons(db_path, year):
+    conn = sqlite3.connect(db_path)
+    modifier.maintain_schema(conn, [year])
+    cur = conn.cursor()
+    new_year = year + 5
+    conn.execute(f"CREATE TABLE stats_{new_year} AS SELECT * FROM stats_{year}")
+    conn.commit()
+    assert not modifier.stats_by_year_is_current(cur)
+    modifier.maintain_schema(conn, [year])
+    assert modifier.stats_by_year_is_current(cur)
+    assert conn.execute("SELECT COUNT(*) FROM stats_by_year WHERE year = ?", (new_year,)).fetchone()[0] > 0
+
+    conn.execute(f"DROP TABLE stats_{new_year}")
+    conn.commit()
+    assert not modifier.stats_by_year_is_current(cur)
+    modifier.maintain_schema(conn, [year])
+    assert modifier.stats_by_year_is_current(cur)
+    assert conn.execute("SELECT COUNT(*) FROM stats_by_year WHERE year = ?", (new_year,)).fetchone()[0] == 0
+    conn.close()
@@ -0,0 +1,76 @@
+import argparse
+import sqlite3
+
+import pytest
+
+from conftest import load_script, modifier
+
+extractor = load_script("kgjr_rom_extractor", "ken_griffey_jr_presents_mlb-rom_extractor-by_johnz1.py")
+
+def export(db_path, year, path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return modifier.export_season_snapshot(conn.cursor(), year, path, db_path)
+    finally:
+        conn.close()
+
+def test_snapshot_loads_the_same_season(db_path, year, tmp_path):
+    path = str(tmp_path / "season.kgsnap")
+    export(db_path, year, path)
+    season, metadata = modifier.load_season_snapshot(path)
+    conn = sqlite3.connect(db_path)
+    try:
+        assert modifier.season_rows(season) == modifier.season_rows(modifier.load_season(conn.cursor(), year))
+    finally:
+        conn.close()
+
+def test_extractor_verifies_against_a_snapshot_without_the_db(rom, db_path, year, tmp_path, monkeypatch, capsys):
+    snapshot = str(tmp_path / "{year}.kgsnap")
+    export(db_path, year, modifier.snapshot_path(snapshot, year))
+    built = tmp_path / "built.sfc"
+    built.write_bytes(modifier.build_rom(rom, db_path, year))
+
+    monkeypatch.setattr("sys.argv", ["extractor", str(built), "--verify", "--year", str(year), "--snapshot", snapshot])
+    extractor.main()
+    assert "matches the DB" in capsys.readouterr().out
+
+    monkeypatch.setattr("sys.argv", ["extractor", str(built), "--verify", "--year", str(year), "--snapshot", snapshot, "--db", db_path])
+    extractor.main()
+    assert "matches the DB" in capsys.readouterr().out
+
+    (tmp_path / "base.sfc").write_bytes(rom)
+    monkeypatch.setattr("sys.argv", ["extractor", str(tmp_path / "base.sfc"), "--verify", "--year", str(year), "--snapshot", snapshot])
+    with pytest.raises(SystemExit):
+        extractor.main()
+
+def test_snapshot_goes_stale_when_the_season_changes(db_path, year, tmp_path):
+    path = str(tmp_path / "season.kgsnap")
+    metadata = export(db_path, year, path)
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
+    assert modifier.snapshot_is_current(metadata, cur, db_path)
+
+    # A write that leaves the season as it was changes the DB file, but the rows still hash the same
+    conn.execute("CREATE TABLE unrelated (x)")
+    conn.commit()
+    assert metadata["source"]["db_file"] != modifier.db_file_signature(db_path)
+    assert modifier.snapshot_is_current(metadata, cur, db_path)
+
+    conn.execute(f"UPDATE ratings_{year} SET rating_bat_pow = 11 - rating_bat_pow WHERE rating_bat_pow IS NOT NULL")
+    conn.commit()
+    assert not modifier.snapshot_is_current(metadata, cur, db_path)
+    args = argparse.Namespace(snapshot=path, db=db_path)
+    with pytest.raises(Exception, match="is stale"):
+        modifier.load_snapshot_season(cur, args, year)
+    # Without a DB to check against, the snapshot is used as it is
+    assert modifier.load_snapshot_season(None, args, year).year == year
+    conn.close()
+
+def test_damaged_snapshot_is_caught(db_path, year, tmp_path):
+    path = tmp_path / "season.kgsnap"
+    export(db_path, year, str(path))
+    data = bytearray(path.read_bytes())
+    data[modifier.SNAPSHOT_DATA_START] ^= 0xFF
+    path.write_bytes(bytes(data))
+    with pytest.raises(Exception, match="CRC mismatch"):
+        modifier.load_season_snapshot(str(path))
@@ -0,0 +1,42 @@
+import io
+import sqlite3
+
+from conftest import load_script
+
+stats_importer = load_script("kgjr_stats_importer", "ken_griffey_jr_presents_mlb-stats_importer-by_johnz1.py")
+
+def test_stats_only_file_adds_no_players_rows(db_path):
+    conn = sqlite3.connect(db_path)
+    counts = stats_importer.import_csv(conn, io.StringIO("playerID,yearID,HR\nnewguy01,2030,12\n"))
+    assert counts == {2030: 1}
+    assert conn.execute("SELECT hr FROM stats_2030 WHERE player_id = 'newguy01'").fetchall() == [(12,)]
+    assert conn.execute("SELECT COUNT(*) FROM players WHERE player_id = 'newguy01'").fetchone() == (0,)
+    conn.close()
+
+def test_player_columns_still_add_players(db_path):
+    conn = sqlite3.connect(db_path)
+    stats_importer.import_csv(conn, io.StringIO("playerID,yearID,nameFirst,nameLast,HR\nnewguy01,2030,New,Guy,12\n"))
+    assert conn.execute("SELECT first_name, last_name FROM players WHERE player_id = 'newguy01'").fetchall() == [("New", "Guy")]
+    conn.close()
+
+def test_second_stint_and_bad_year_are_skipped(db_path, capsys):
+    conn = sqlite3.connect(db_path)
+    csv_file = io.StringIO("playerID,yearID,HR\nnewguy01,2030,12\nnewguy01,2030,3\nnewguy02,20x0,5\nnewguy02,2030,7\n")
+    counts = stats_importer.import_csv(conn, csv_file, batch_size=1)
+    assert counts == {2030: 2}
+    assert conn.execute("SELECT player_id, hr FROM stats_2030 ORDER BY player_id").fetchall() == [("newguy01", 12), ("newguy02", 7)]
+    out = capsys.readouterr().out
+    assert "Line 3 has a second row for newguy01 in 2030" in out
+    assert "Line 4 has year '20x0'" in out
+    conn.close()
+
+def test_batting_then_pitching_file(db_path, capsys):
+    conn = sqlite3.connect(db_path)
+    batting = "playerID,yearID,stint,G,AB,R,H,HR,BB,SO,IBB,HBP,SH,SF,GIDP\nnewguy01,2030,1,150,500,80,150,30,60,100,5,4,1,3,12\n"
+    pitching = "playerID,yearID,stint,W,L,G,GS,SV,IPouts,H,ER,HR,BB,SO,ERA,IBB,HBP,R,SH,SF,GIDP\nnewguy01,2030,1,10,5,30,30,0,600,180,70,20,50,170,3.15,2,6,75,4,5,15\n"
+    stats_importer.import_csv(conn, io.StringIO(batting))
+    stats_importer.import_csv(conn, io.StringIO(pitching))
+    assert "Pitching file" in capsys.readouterr().out
+    row = conn.execute("SELECT g, r, h, hr, bb, so, ibb, hbp, sh, sf, gidp, gp, ra, ha, hra, bba, soa, ibba, hbpa, w, l, era, ipouts FROM stats_2030 WHERE player_id = 'newguy01'").fetchall()
+    assert row == [(150, 80, 150, 30, 60, 100, 5, 4, 1, 3, 12, 30, 75, 180, 20, 50, 170, 2, 6, 10, 5, 3.15, 600)]
+    conn.close()
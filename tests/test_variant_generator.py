@@ -0,0 +1,55 @@
+import sqlite3
+
+from conftest import load_script
+
+variant_generator = load_script("kgjr_variant_generator", "ken_griffey_jr_presents_mlb-variant_generator-by_johnz1.py")
+modifier = variant_generator.modifier
+
+def test_variant_matches_full_build_of_edited_db(db_path, rom, year):
+    conn = sqlite3.connect(db_path)
+    cur = conn.cursor()
+    base_season = modifier.load_season(cur, year)
+
+    # Bump the team of a Home Run Derby batter, then trade him away, and override someone on a third team
+    league, roster_position, derby_player = base_season.hr_derby_players[0]
+    team_stock = derby_player.team_stock
+    other_team, third_team = [other for other in modifier.TEAMS_STOCK_ORDER if other != team_stock][:2]
+    partner = base_season.team_rosters[other_team][3]
+    overridden = base_season.team_rosters[third_team][0]
+    changes = {"rating_bat_spd": 1, "rating_bat_pow": -2}
+    variant = {
+        "name": "edited",
+        "players": {overridden.player_id: {"rating_bat_bat": 10}},
+        "teams": {team_stock: changes},
+        "trades": [[derby_player.player_id, partner.player_id]],
+    }
+
+    layout = modifier.probe_rom_layout(rom)
+    builder = variant_generator.VariantBuilder(rom, layout, base_season)
+    dirty, diagnostics = builder.build(variant_generator.variant_season(base_season, variant))
+    assert modifier.hr_derby_slot_key(0) in dirty
+
+    # The same edits made in the DB
+    cur.execute(f"UPDATE ratings_{year} SET rating_bat_bat = 10 WHERE player_id = ?", (overridden.player_id,))
+    for field, change in changes.items():
+        cur.execute(f"""UPDATE ratings_{year} SET {field} = MIN(MAX({field} + ?, 1), 10)
+                        WHERE {field} IS NOT NULL AND player_id IN (SELECT player_id FROM team_lineups_{year} WHERE team_stock = ?)""",
+                    (change, team_stock))
+    for old, new in ((derby_player.player_id, "swap"), (partner.player_id, derby_player.player_id), ("swap", partner.player_id)):
+        cur.execute(f"UPDATE team_lineups_{year} SET player_id = ? WHERE player_id = ?", (new, old))
+    conn.commit()
+
+    assert bytes(builder.work) == modifier.build_rom(rom, conn, year)
+    assert modifier.verify_rom(bytes(builder.work), layout, modifier.load_season(cur, year)) == []
+    conn.close()
+
+def test_restore_puts_the_base_build_back(db_path, rom, year):
+    conn = sqlite3.connect(db_path)
+    base_season = modifier.load_season(conn.cursor(), year)
+    conn.close()
+    builder = variant_generator.VariantBuilder(rom, modifier.probe_rom_layout(rom), base_season)
+    team_stock = modifier.TEAMS_STOCK_ORDER[0]
+    builder.build(variant_generator.variant_season(base_season, {"name": "bump", "teams": {team_stock: {"rating_bat_bat": 3}}}))
+    assert bytes(builder.work) != builder.base_built
+    builder.restore()
+    assert bytes(builder.work) == builder.base_built